@@ -0,0 +1,59 @@
+"""
+Construction time and memory for the Indeed query classes.
+
+Compares building queries off of the class-level schemas against the old approach
+of creating a new subclass for every property of every instance.
+
+Run from the repository root with::
+
+    python -m benchmarks.construction
+"""
+import gc
+import timeit
+import tracemalloc
+
+from queries import Query, SimpleIndeedQuery, AdvancedIndeedQuery
+
+
+def legacy_construct(query_cls):
+    """
+    Build a query the way `Query.register_args` used to, with one runtime subclass per argument.
+    """
+    inst = Query.__new__(Query)
+    inst._args = dict()
+    inst.base_url = 'https://indeed.com/jobs'
+    for name, arg in query_cls._kwargs.items():
+        inst._args[name] = arg
+        prop = Query.make_property(name, arg.doc, getattr(arg, 'mutable', True))
+        child_class = type(inst.__class__.__name__ + 'Child', (inst.__class__,), {name : prop})
+        inst.__class__ = child_class
+    return inst
+
+
+def measure(label, build, number):
+    """
+    Print the per-construction time and the memory retained by `number` live objects.
+    """
+    gc.collect()
+    seconds = min(timeit.repeat(build, number=number, repeat=3)) / number
+
+    gc.collect()
+    tracemalloc.start()
+    live = [build() for _ in range(number)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del live
+    gc.collect()
+
+    print("%-40s %8.2f us/query %10.1f bytes/query"%(label, seconds*1e6, current/number))
+
+
+def main(number=2000):
+    for query_cls in (SimpleIndeedQuery, AdvancedIndeedQuery):
+        name = query_cls.__name__
+        measure(name + ' (legacy subclasses)', lambda: legacy_construct(query_cls), number)
+        measure(name + ' (class schema)', query_cls, number)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Synthetic Indeed pages shaped like the ones the parsers expect, for benchmarks that
+aren't given a directory of saved pages.
+"""
+import os
+
+BODY_SECTION = ('<p><b>%s</b></p><ul>' + '<li>Experience with Python, SQL and the usual suspects %i.</li>'*6 + '</ul>'
+                '<p>We are an equal opportunity employer and value diversity at our company. %s</p>')
+
+
+def posting_page(index, sections=8):
+    """
+    Get the html of a job posting, with a header followed by a large body.
+    """
+    body = ''.join(BODY_SECTION%((('Section %i'%section, ) + tuple(range(6)) + ('x'*200, )))
+                   for section in range(sections))
+    return (
+        '<html><head><title>Job %i</title><meta charset="utf-8"></head><body>'
+        '<div class="jobsearch-DesktopStickyContainer">'
+        '<h3 class="icl-u-xs-mb--xs jobsearch-JobInfoHeader-title">Python Developer %i</h3>'
+        '<div class="jobsearch-InlineCompanyRating icl-u-xs-mt--xs jobsearch-JobInfoHeader-subtitle">'
+        '<div class="icl-u-lg-mr--sm"><a href="/cmp/Company-%i">Company %i</a></div>'
+        '<div class="jobsearch-CompanyReview"><span>4.1</span></div>'
+        '<div>New York, NY 10001</div>'
+        '</div></div>'
+        '<div id="jobDescriptionText" class="jobsearch-jobDescriptionText">%s</div>'
+        '<div id="applyButtonLinkContainer"><a href="https://example.com/apply/%i">Apply On Company Site</a></div>'
+        '</body></html>'
+    )%(index, index, index, index, body, index)
+
+
+def results_page(start, total=95, step=10):
+    """
+    Get the html of a page of search results.
+    """
+    page = start//step + 1
+    cards = ''.join('<div class="jobsearch-SerpJobCard unifiedRow row result" data-jk="%016x">'
+                    '<h2 class="title"><a>Job %i</a></h2><span class="date">%i days ago</span></div>'%(i, i, i%30)
+                    for i in range(start, min(start + step, total)))
+    next_link = '<a href="#"><span class="pn"><span class="np">Next&nbsp;&raquo;</span></span></a>' if start + step < total else ''
+    return ('<html><body><div id="searchCountPages">Page %i of %i jobs</div>%s'
+            '<div class="pagination"><b>%i</b>%s</div></body></html>')%(page, total, cards, page, next_link)
+
+
+def load_pages(directory):
+    """
+    Get the contents of every saved .html page in a directory.
+    """
+    paths = sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.html'))
+    pages = []
+    for path in paths:
+        with open(path, 'rb') as page:
+            pages.append(page.read())
+    return pages
@@ -0,0 +1,59 @@
+"""
+Parsing logged search urls back into queries with `Query.from_url`, with a round trip
+check over randomly generated queries of both Indeed classes.
+
+Run from the repository root with::
+
+    python -m benchmarks.from_url
+"""
+import random
+import time
+
+from queries import SimpleIndeedQuery, AdvancedIndeedQuery
+
+WORDS = ('python', 'C++', 'data', 'engineer', 'C#', '.NET', 'senior', 'remote', 'a+b', 'R&D', '50%')
+
+
+def random_values(query_cls, rng):
+    """
+    Get random values for every mutable argument of a query class.
+    """
+    values = {}
+    for name, arg in query_cls._args.items():
+        if not arg.mutable or rng.random() < 0.4:
+            continue
+        if arg.choices:
+            values[name] = rng.choice(arg.choices)
+        elif arg.type is int:
+            values[name] = rng.randrange(0, 200000, 10)
+        else:
+            values[name] = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 3)))
+    values['where'] = 'City %i, ST'%rng.randrange(1000)
+    return values
+
+
+def round_trip(query_cls, number, rng):
+    """
+    Check that parsing a query's url gives back the same values and url.
+    """
+    for _ in range(number):
+        query = query_cls(**random_values(query_cls, rng))
+        parsed = query_cls.from_url(query.url)
+        assert parsed.url == query.url, (query.url, parsed.url)
+        assert parsed._values == query._values, (query._values, parsed._values)
+
+
+def main(number=50000):
+    rng = random.Random(0)
+    for query_cls in (SimpleIndeedQuery, AdvancedIndeedQuery):
+        round_trip(query_cls, 2000, rng)
+        urls = [query_cls(**random_values(query_cls, rng)).url for _ in range(number)]
+        begin = time.perf_counter()
+        for _ in query_cls.from_urls(urls):
+            pass
+        seconds = time.perf_counter() - begin
+        print("%-20s round trip ok %8i urls %8.3f s %9.0f urls/s"%(query_cls.__name__, number, seconds, number/seconds))
+
+
+if __name__ == '__main__':
+    main()
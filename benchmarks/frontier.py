@@ -0,0 +1,92 @@
+"""
+The crawl frontier against an in-process fake site: the time spent checkpointing as a
+share of the crawl, several worker processes sharing one frontier, and a worker that
+is killed partway through and resumed.
+
+Run from the repository root with::
+
+    python -m benchmarks.frontier [number of worker processes]
+"""
+import asyncio
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from queries import SimpleIndeedQuery
+from queries.crawler import Crawler
+from queries.frontier import Frontier, FrontierCrawler
+from queries.instrument import Metrics
+
+from .instrument import FakeSite
+
+
+def seed(path, number=100):
+    frontier = Frontier(path)
+    frontier.add_queries(SimpleIndeedQuery(what='python %i'%i, where='New York') for i in range(number))
+    frontier.close()
+
+
+def work(path, owner=None, metrics=None, lease=60.0, latency=0.05):
+    async def run():
+        frontier = Frontier(path, owner, lease=lease)
+        crawler = Crawler(FakeSite(latency), rate=1000.0, burst=50.0, max_connections=20, metrics=metrics)
+        try:
+            return await FrontierCrawler(crawler, frontier, poll=0.05).run()
+        finally:
+            await crawler.close()
+            frontier.close()
+    return asyncio.run(run())
+
+
+def attempts(path):
+    db = sqlite3.connect(path)
+    try:
+        return dict(db.execute('SELECT attempts, COUNT(*) FROM tasks GROUP BY attempts').fetchall())
+    finally:
+        db.close()
+
+
+def main(argv):
+    processes = int(argv[0]) if argv else 4
+    directory = tempfile.mkdtemp()
+
+    path = os.path.join(directory, 'single.sqlite')
+    seed(path)
+    metrics = Metrics()
+    begin = time.perf_counter()
+    done = work(path, metrics=metrics)
+    seconds = time.perf_counter() - begin
+    checkpoint = metrics.histograms['checkpoint']
+    print("1 worker: %i tasks in %.3f s; %i checkpoints took %.3f s, %.2f%% of the crawl"%(
+        done, seconds, checkpoint.count, checkpoint.total, 100*checkpoint.total/seconds))
+
+    path = os.path.join(directory, 'shared.sqlite')
+    seed(path)
+    begin = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        done = pool.map(work, [path]*processes)
+    seconds = time.perf_counter() - begin
+    print("%i workers: %s tasks in %.3f s; tasks by times claimed %s"%(processes, '+'.join(map(str, done)),
+                                                                      seconds, attempts(path)))
+
+    path = os.path.join(directory, 'resumed.sqlite')
+    seed(path)
+    worker = multiprocessing.Process(target=work, args=(path, 'worker-1'))
+    worker.start()
+    time.sleep(0.5)
+    worker.terminate()
+    worker.join()
+    frontier = Frontier(os.path.join(directory, 'resumed.sqlite'), owner='observer')
+    print("killed after 0.5 s: %s"%frontier.counts())
+    frontier.close()
+    done = work(path, 'worker-1')
+    frontier = Frontier(path, owner='observer')
+    print("resumed: %i more tasks; %s; tasks by times claimed %s"%(done, frontier.counts(), attempts(path)))
+    frontier.close()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
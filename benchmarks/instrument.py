@@ -0,0 +1,74 @@
+"""
+An instrumented crawl against an in-process fake site, printing the p50/p99 latency and
+throughput of each stage, and the cost of the instrumentation itself.
+
+Run from the repository root with::
+
+    python -m benchmarks.instrument [collapsed stack output path]
+
+Given a path, the crawl is also sampled into a collapsed stack file, which renders with
+e.g. `flamegraph.pl crawl.folded > crawl.svg` or by loading it into speedscope.
+"""
+import asyncio
+import sys
+import time
+from urllib.parse import urlsplit, parse_qsl
+
+from queries import SimpleIndeedQuery
+from queries.crawler import Crawler
+from queries.instrument import Metrics, profile
+from queries.transport import Response, Transport
+
+from .fixtures import results_page, posting_page
+
+
+class FakeSite(Transport):
+    """
+    Serves fixture pages after a fixed latency.
+    """
+    def __init__(self, latency=0.01, total=95):
+        self.latency = latency
+        self.total = total
+
+    async def fetch(self, url, headers=None):
+        await asyncio.sleep(self.latency)
+        parts = urlsplit(url)
+        params = dict(parse_qsl(parts.query))
+        if parts.path == '/viewjob':
+            body = posting_page(int(params['jk'], 16))
+        else:
+            body = results_page(int(params.get('start', 0)), self.total)
+        return Response(url, 200, {}, body.encode('utf-8'))
+
+
+async def run(queries, metrics):
+    crawler = Crawler(FakeSite(), rate=1000.0, burst=50.0, max_connections=20, metrics=metrics)
+    try:
+        keys = await crawler.crawl(queries)
+        await crawler.fetch_postings(key for query_keys in keys for key in query_keys)
+    finally:
+        await crawler.close()
+
+
+def main(argv):
+    queries = [SimpleIndeedQuery(what='python %i'%i, where='New York') for i in range(20)]
+
+    begin = time.perf_counter()
+    asyncio.run(run(queries, None))
+    bare = time.perf_counter() - begin
+
+    metrics = Metrics()
+    begin = time.perf_counter()
+    with profile(argv[0] if argv else None):
+        asyncio.run(run(queries, metrics))
+    instrumented = time.perf_counter() - begin
+
+    print(metrics.summary())
+    print()
+    print("uninstrumented %.3f s, instrumented %.3f s"%(bare, instrumented))
+    if argv:
+        print("collapsed stacks written to %s"%argv[0])
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
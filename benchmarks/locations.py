@@ -0,0 +1,59 @@
+"""
+Location lookups per second through the LocationNormalizer, with a warm memo and with
+every location new, and the queries saved by planning a grid of nearby cities and radii,
+alone and with a wide search around each hub.
+
+Run from the repository root with::
+
+    python -m benchmarks.locations [gazetteer path]
+"""
+import random
+import sys
+import time
+
+from queries import SimpleIndeedQuery
+from queries.locations import LocationNormalizer, DEFAULT_GAZETTEER
+
+SPELLINGS = ['New York City, New York', 'New York, NY', 'NYC', 'new york, ny 10001', 'San Francisco, CA, USA',
+             'SF', 'Seattle, Washington', 'seattle, wa', 'Austin, TX', 'Round Rock, Texas', 'Remote', 'Boston, MA',
+             'Cambridge, Massachusetts', 'Oakland, CA', 'San Jose, California', 'Palo Alto, CA', 'Nowhere, KS']
+NEARBY = ['San Francisco, CA', 'Oakland, CA', 'Berkeley, CA', 'San Jose, CA', 'Palo Alto, CA', 'Mountain View, CA',
+          'Sunnyvale, CA', 'Seattle, WA', 'Bellevue, WA', 'Redmond, WA', 'Boston, MA', 'Cambridge, MA']
+
+
+def lookups_per_second(normalize, texts):
+    begin = time.perf_counter()
+    for text in texts:
+        normalize(text)
+    return len(texts)/(time.perf_counter() - begin)
+
+
+def main(argv):
+    begin = time.perf_counter()
+    normalizer = LocationNormalizer(argv[0] if argv else DEFAULT_GAZETTEER)
+    print("loaded %i places, %i keys in %.1f ms"%(len(normalizer), len(normalizer._keys),
+                                                  (time.perf_counter() - begin)*1e3))
+
+    rand = random.Random(0)
+    texts = [rand.choice(SPELLINGS) for _ in range(500000)]
+    print("%10.0f lookups/s with a warm memo"%lookups_per_second(normalizer.normalize, texts))
+    unique = ['%s %i'%(rand.choice(SPELLINGS), i) for i in range(200000)]
+    print("%10.0f lookups/s with every location new"%lookups_per_second(normalizer.normalize, unique))
+
+    for text in SPELLINGS[:8]:
+        print("%-28r -> %s"%(text, normalizer.normalize(text)))
+
+    queries = [SimpleIndeedQuery(what='data engineer', where=where, radius=radius)
+               for where in NEARBY for radius in (5, 10, 25, 50)]
+    plan = normalizer.plan(queries)
+    print(plan)
+    #A wide search around each hub takes in the whole grid around it.
+    queries += [SimpleIndeedQuery(what='data engineer', where=where, radius=100) for where in ('SF', 'Seattle', 'Boston')]
+    plan = normalizer.plan(queries)
+    print(plan)
+    for query in plan.fetch:
+        print("  fetch %s within %s miles"%(query.where, query.radius))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
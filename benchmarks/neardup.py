@@ -0,0 +1,99 @@
+"""
+Near duplicate detection over synthetic postings, with reposts that change a few words,
+drop an item, or move to a nearby location under a new job key.
+
+Prints the time to add each posting as the index grows, which stays flat since each
+posting is only compared with those sharing a band, and the clusters found against the
+reposts that were made.
+
+Run from the repository root with::
+
+    python -m benchmarks.neardup [number of postings] [threshold]
+"""
+import random
+import sys
+import time
+
+from queries.dedup import NearDuplicateIndex, canonical_records
+
+WORDS = ('python sql data pipelines team customers build design develop maintain services cloud '
+         'platform experience years strong communication skills analytics reporting dashboards '
+         'stakeholders requirements testing deployment monitoring scale reliable secure modern '
+         'benefits health dental vision remote hybrid office salary bonus equity growth learning').split()
+CITIES = ['Austin, TX', 'Round Rock, TX', 'Denver, CO', 'Boulder, CO', 'Seattle, WA', 'Bellevue, WA']
+
+
+def make_posting(rand, index):
+    items = [' '.join(rand.choices(WORDS, k=rand.randint(8, 16))) for _ in range(rand.randint(8, 14))]
+    return {'job_key' : '%016x'%index, 'title' : 'Data Engineer %i'%(index%500),
+            'company_name' : 'Company %i'%(index%300), 'location' : rand.choice(CITIES),
+            'sections' : [{'heading' : 'Requirements', 'items' : items[:len(items)//2]},
+                          {'heading' : 'Benefits', 'items' : items[len(items)//2:]}]}
+
+
+def repost(rand, posting, job_key):
+    sections = []
+    for section in posting['sections']:
+        items = list(section['items'])
+        if len(items) > 3 and rand.random() < 0.5:
+            del items[rand.randrange(len(items))]
+        words = items[0].split()
+        words[rand.randrange(len(words))] = rand.choice(WORDS)
+        items[0] = ' '.join(words)
+        sections.append({'heading' : section['heading'], 'items' : items})
+    return dict(posting, job_key=job_key, location=rand.choice(CITIES), sections=sections)
+
+
+def make_postings(number, repost_rate=0.2, seed=0):
+    rand = random.Random(seed)
+    postings = []
+    sources = []
+    originals = {}
+    for index in range(number):
+        if sources and rand.random() < repost_rate:
+            original = rand.choice(sources)
+            posting = repost(rand, original, '%016x'%index)
+            originals[posting['job_key']] = original['job_key']
+        else:
+            posting = make_posting(rand, index)
+            sources.append(posting)
+        postings.append(posting)
+    return postings, originals
+
+
+def main(argv):
+    number = int(argv[0]) if argv else 20000
+    threshold = float(argv[1]) if len(argv) > 1 else 0.7
+    postings, originals = make_postings(number)
+    index = NearDuplicateIndex(threshold)
+    print("threshold %.2f, %i bands of %i rows"%(threshold, index.bands, index.rows))
+
+    kept = 0
+    batch = max(1, number//5)
+    begin = time.perf_counter()
+    for start in range(0, number, batch):
+        batch_begin = time.perf_counter()
+        kept += sum(1 for _ in canonical_records(postings[start:start + batch], index))
+        print("%8i postings  %6.3f ms per posting"%(len(index), (time.perf_counter() - batch_begin)/batch*1e3))
+    seconds = time.perf_counter() - begin
+
+    found = 0
+    for posting in postings:
+        job_key = posting['job_key']
+        if job_key in originals and index.canonical(job_key) == index.canonical(originals[job_key]):
+            found += 1
+    clusters = index.clusters()
+    merged = sum(len(keys) for keys in clusters.values())
+    wrong = sum(1 for keys in clusters.values() for key in keys
+                if originals.get(key, key) != originals.get(keys[0], keys[0]))
+    memory = index._signatures.itemsize*len(index._signatures)/number
+    buckets = sum(keys.itemsize*len(keys) + docs.itemsize*len(docs)
+                  for keys, docs in zip(index._bucket_keys, index._bucket_docs))/number
+    print("%i postings in %.2f s, %i kept, %i clusters of %i postings"%(number, seconds, kept, len(clusters), merged))
+    print("%i of %i reposts found, %i postings clustered with a different original, "
+          "%.0f bytes of signature and %.0f of merged buckets per posting"%(found, len(originals), wrong, memory,
+                                                                            buckets))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
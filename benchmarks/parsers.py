@@ -0,0 +1,74 @@
+"""
+Posting header extraction with the targeted parser against the BeautifulSoup path
+from the notebook, single process and across a process pool.
+
+Run from the repository root with::
+
+    python -m benchmarks.parsers [directory of saved posting .html pages]
+
+BeautifulSoup is only timed if it is installed.
+"""
+import sys
+import time
+from html.parser import HTMLParser
+
+from queries.parsers import parse_posting_header, parse_pages
+
+from .fixtures import posting_page, load_pages
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
+
+
+def soup_header(html):
+    """
+    The notebook's `get_header_information`, on BeautifulSoup's html.parser.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    header = soup.find('div', attrs={'class' : 'jobsearch-DesktopStickyContainer'})
+    title = header.find('h3', attrs={'class' : 'jobsearch-JobInfoHeader-title'}).text
+    subtitle = header.find('div', attrs={'class' : 'jobsearch-JobInfoHeader-subtitle'})
+    company_link = subtitle.find('a')
+    company_link_div = company_link.find_parent('div')
+    location = company_link_div.find_next_siblings('div')[-1].text
+    return {
+        'title' : title,
+        'company_name' : company_link.text,
+        'location' : location
+    }
+
+
+def full_pass(html):
+    """
+    A bare html.parser pass over the whole page, the floor for any full-tree parser.
+    """
+    parser = HTMLParser()
+    parser.feed(html.decode('utf-8'))
+    parser.close()
+
+
+def timed(label, func, pages):
+    begin = time.perf_counter()
+    results = func(pages)
+    seconds = time.perf_counter() - begin
+    print("%-32s %6i pages %8.3f s %9.0f pages/s"%(label, len(pages), seconds, len(pages)/seconds))
+    return results
+
+
+def main(argv):
+    pages = load_pages(argv[0]) if argv else [posting_page(i).encode() for i in range(2000)]
+
+    targeted = timed('targeted parser', lambda pages: [parse_posting_header(page) for page in pages], pages)
+    timed('targeted parser, process pool', parse_pages, pages)
+    timed('html.parser full pass, no tree', lambda pages: [full_pass(page) for page in pages], pages)
+    if BeautifulSoup is None:
+        print('BeautifulSoup is not installed; skipping the html.parser comparison.')
+        return
+    soup = timed('BeautifulSoup html.parser', lambda pages: [soup_header(page) for page in pages], pages)
+    print('results match: %s'%(targeted == soup))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
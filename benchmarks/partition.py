@@ -0,0 +1,97 @@
+"""
+Covering a query with more results than the site pages through, against a fake site
+with a fixed population of postings.
+
+Each posting has a job type, or none, an experience level, a distance and an age, and
+the site filters on `jt`, `explvl`, `radius` and `fromage` the way Indeed does, pages
+through at most `CAP` results of a query, and reports the full count in
+`#searchCountPages`. The plain walk of the query is compared with the Partitioner's.
+
+Run from the repository root with::
+
+    python -m benchmarks.partition [number of postings]
+"""
+import asyncio
+import random
+import sys
+import time
+from urllib.parse import urlsplit, parse_qsl
+
+from queries import AdvancedIndeedQuery
+from queries.crawler import Crawler
+from queries.partition import Partitioner
+from queries.transport import Response, Transport
+
+CAP = 1000
+STEP = 10
+JOB_TYPES = ('fulltime', 'parttime', 'contract', 'internship', 'temporary', 'commission')
+LEVELS = ('entry_level', 'mid_level', 'senior_level')
+
+
+class PopulationSite(Transport):
+    """
+    Serves search pages over a population of postings, filtered by the query.
+    """
+    def __init__(self, number, seed=0):
+        rand = random.Random(seed)
+        self.postings = []
+        for index in range(number):
+            #Most postings have a job type, and full time ones are the bulk of them.
+            job_type = rand.choices(JOB_TYPES + (None,), weights=(60, 10, 12, 3, 4, 1, 10))[0]
+            self.postings.append(('%016x'%index, job_type, rand.choice(LEVELS), rand.uniform(0, 100),
+                                  rand.uniform(0, 30)))
+        self.fetches = 0
+
+    def matches(self, params):
+        radius = int(params.get('radius', 25))
+        age = params.get('fromage', 'any')
+        age = float('inf') if age == 'any' else int(age)
+        return [key for key, job_type, level, distance, days in self.postings
+                if params.get('jt', job_type) == job_type and params.get('explvl', level) == level
+                and distance <= radius and days <= age]
+
+    async def fetch(self, url, headers=None):
+        self.fetches += 1
+        await asyncio.sleep(0)
+        params = dict(parse_qsl(urlsplit(url).query))
+        keys = self.matches(params)
+        start = min(int(params.get('start', 0)), CAP - STEP)
+        page = start//STEP + 1
+        cards = ''.join('<div class="jobsearch-SerpJobCard" data-jk="%s"></div>'%key
+                        for key in keys[start:start + STEP])
+        has_next = start + STEP < min(len(keys), CAP)
+        next_link = '<span class="np">Next</span>' if has_next else ''
+        body = ('<html><body><div id="searchCountPages">Page %i of %s jobs</div>%s'
+                '<div class="pagination"><b>%i</b>%s</div></body></html>')%(page, format(len(keys), ','), cards,
+                                                                           page, next_link)
+        return Response(url, 200, {}, body.encode('utf-8'))
+
+
+async def run(site, query):
+    crawler = Crawler(site, rate=1e6, burst=1e6, max_connections=50)
+    plain = await crawler.job_keys(query)
+    plain_fetches = site.fetches
+    site.fetches = 0
+    begin = time.perf_counter()
+    part = await Partitioner(crawler, cap=CAP).partition(query)
+    seconds = time.perf_counter() - begin
+    await crawler.close()
+    return plain, plain_fetches, part, seconds
+
+
+def main(argv):
+    number = int(argv[0]) if argv else 40000
+    site = PopulationSite(number)
+    query = AdvancedIndeedQuery(all_words='engineer', where='California', radius=50)
+    plain, plain_fetches, part, seconds = asyncio.run(run(site, query))
+    reachable = len(site.matches({'radius' : 50}))
+    found = set(part.all_job_keys())
+    print("%i matching postings; plain walk found %i with %i fetches"%(reachable, len(set(plain)), plain_fetches))
+    print(part.report())
+    print("partitioner found %i (%.1f%% of the matching postings) with %i fetches in %.2f s, %i fetched twice"%(
+        len(found), len(found)/reachable*100, site.fetches, seconds,
+        sum(len(p.job_keys) for p in part.walk()) - len(found)))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,46 @@
+"""
+Records per second through the extraction pipeline, from stored posting pages to
+parsed records to a chunked columnar sink.
+
+Run from the repository root with::
+
+    python -m benchmarks.pipeline [directory of saved posting .html pages]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from queries.pipeline import pages_from_files, parse_records, columnar_sink, write_records
+
+from .fixtures import posting_page
+
+
+def write_fixtures(directory, number):
+    paths = []
+    for index in range(number):
+        path = os.path.join(directory, '%016x.html'%index)
+        with open(path, 'w', encoding='utf-8') as page:
+            page.write(posting_page(index))
+        paths.append(path)
+    return paths
+
+
+def main(argv):
+    if argv:
+        paths = sorted(os.path.join(argv[0], name) for name in os.listdir(argv[0]) if name.endswith('.html'))
+    else:
+        paths = write_fixtures(tempfile.mkdtemp(), 2000)
+    output = tempfile.mkdtemp()
+
+    for processes in (0, os.cpu_count()):
+        sink = columnar_sink(os.path.join(output, 'postings-%i.parquet'%processes), rows=500)
+        begin = time.perf_counter()
+        count = write_records(parse_records(pages_from_files(paths), processes=processes), sink)
+        seconds = time.perf_counter() - begin
+        print("%2i processes, %-12s %6i records %8.3f s %9.0f records/s"%(processes, type(sink).__name__, count,
+                                                                          seconds, count/seconds))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,57 @@
+"""
+Generating a grid of search urls with `Query.product` against mutating a single
+query and reading its url for every combination.
+
+Run from the repository root with::
+
+    python -m benchmarks.product
+"""
+import time
+from itertools import product
+
+from queries import SimpleIndeedQuery
+
+JOB_TYPES = ('fulltime', 'parttime', 'contract', 'internship', 'temporary', 'commission')
+EXPERIENCE = ('entry_level', 'mid_level', 'senior_level')
+RADII = (0, 5, 10, 15, 25, 50, 100)
+
+
+def mutate_and_read(cities):
+    query = SimpleIndeedQuery(what='python')
+    urls = 0
+    for where, job_type, experience, radius in product(cities, JOB_TYPES, EXPERIENCE, RADII):
+        query.where = where
+        query.job_type = job_type
+        query.experience = experience
+        query.radius = radius
+        query.url
+        urls += 1
+    return urls
+
+
+def grid(cities):
+    query = SimpleIndeedQuery(what='python')
+    urls = 0
+    for _ in query.product(where=cities, job_type=JOB_TYPES, experience=EXPERIENCE, radius=RADII):
+        urls += 1
+    return urls
+
+
+def timed(label, func, cities):
+    begin = time.perf_counter()
+    urls = func(cities)
+    seconds = time.perf_counter() - begin
+    print("%-30s %9i urls %8.3f s %10.0f urls/s"%(label, urls, seconds, urls/seconds))
+
+
+def main():
+    cities = ['City %i, ST'%i for i in range(200)]
+    timed('mutate-and-read (200 cities)', mutate_and_read, cities)
+    timed('Query.product (200 cities)', grid, cities)
+
+    cities = ['City %i, ST'%i for i in range(8000)]
+    timed('Query.product (8000 cities)', grid, cities)
+
+
+if __name__ == '__main__':
+    main()
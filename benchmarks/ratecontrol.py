@@ -0,0 +1,123 @@
+"""
+The adaptive rate controller against a local server that throttles anything over a
+fixed number of requests per second with 429s and a Retry-After.
+
+The search pages and postings are fetched by one crawler, sharing the controller's
+rate for the host. The rate is sampled as the crawl runs, to show it climbing to the
+server's limit and then holding close under it.
+
+Run from the repository root with::
+
+    python -m benchmarks.ratecontrol [requests per second the server allows]
+"""
+import asyncio
+import sys
+import threading
+import time
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, urlunsplit, parse_qsl
+
+from queries import SimpleIndeedQuery
+from queries.crawler import Crawler
+from queries.instrument import Metrics
+from queries.ratecontrol import RateController
+from queries.transport import HTTPTransport
+
+from .fixtures import results_page, posting_page
+
+
+class ThrottlingHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    limit = 20
+    window = deque()
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        now = time.monotonic()
+        with self.lock:
+            while self.window and self.window[0] < now - 1:
+                self.window.popleft()
+            throttled = len(self.window) >= self.limit
+            if not throttled:
+                self.window.append(now)
+        if throttled:
+            self.send_response(429)
+            self.send_header('Retry-After', '1')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        parts = urlsplit(self.path)
+        params = dict(parse_qsl(parts.query))
+        if parts.path == '/viewjob':
+            body = posting_page(int(params['jk'], 16), sections=1)
+        else:
+            body = results_page(int(params.get('start', 0)))
+        body = body.encode('utf-8')
+        time.sleep(0.005)
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class LocalTransport(HTTPTransport):
+    """
+    Sends every request to the local server, while the crawler still sees Indeed's urls.
+    """
+    def __init__(self, netloc, **kwargs):
+        super().__init__(**kwargs)
+        self.netloc = netloc
+
+    def fetch_sync(self, url, headers=None):
+        parts = urlsplit(url)
+        response = super().fetch_sync(urlunsplit(('http', self.netloc, parts.path, parts.query, '')), headers)
+        response.url = url
+        return response
+
+
+async def run(crawler, queries, trace):
+    async def sample():
+        begin = time.monotonic()
+        while True:
+            trace.append((time.monotonic() - begin, crawler.controller.rates().get('indeed.com', 0.0)))
+            await asyncio.sleep(0.5)
+
+    sampler = asyncio.ensure_future(sample())
+    try:
+        keys = await crawler.crawl(queries)
+        await crawler.fetch_postings(key for query_keys in keys for key in query_keys)
+    finally:
+        sampler.cancel()
+        await crawler.close()
+
+
+def main(argv):
+    ThrottlingHandler.limit = int(argv[0]) if argv else 20
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ThrottlingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    queries = [SimpleIndeedQuery(what='python %i'%i, where='New York') for i in range(40)]
+    controller = RateController(rate=2.0, capacity=2.0, retries=5)
+    metrics = Metrics()
+    crawler = Crawler(LocalTransport('127.0.0.1:%i'%server.server_port, max_connections=20),
+                      max_connections=20, metrics=metrics, controller=controller)
+    trace = []
+    begin = time.perf_counter()
+    asyncio.run(run(crawler, queries, trace))
+    seconds = time.perf_counter() - begin
+    server.shutdown()
+
+    print("server limit %i requests/s"%ThrottlingHandler.limit)
+    for at, rate in trace[::2]:
+        print("%6.1f s  %6.1f requests/s  %s"%(at, rate, '#'*int(rate)))
+    ok = metrics.counters['status 200']
+    print("%i pages and postings in %.1f s, %.1f requests/s; %i throttled, %i retries"%(
+        ok, seconds, ok/seconds, metrics.counters['status 429'], metrics.counters['retries']))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,170 @@
+"""
+The multi-source scheduler against three local job boards with different pagination
+and latency:
+
+- an Indeed style board, offset by `start`, answering in 5 ms;
+- a JSON board numbered by `page`, answering in 50 ms;
+- a JSON feed linked by `cursor`, answering in 250 ms.
+
+Each board's pages are walked with its own parser and pagination, all at once. The
+boards count the most requests they saw in flight, which the per-host limit bounds,
+and the time each board finished shows the slow one didn't hold up the others.
+
+Run from the repository root with::
+
+    python -m benchmarks.scheduler
+"""
+import asyncio
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl
+
+from queries import Query, QueryArgument, SimpleIndeedQuery
+from queries.crawler import Crawler
+from queries.instrument import Metrics
+from queries.scheduler import Scheduler, ParsedPage, PageNumberPagination, CursorPagination, register_source
+from queries.transport import HTTPTransport
+
+from .fixtures import results_page
+
+TOTAL = 95
+PER_PAGE = 10
+
+
+class BoardQuery(Query):
+    _kwargs = {
+        'keywords' : QueryArgument('q', str, required=True),
+        'page' : QueryArgument('page', int, value=1),
+    }
+
+    def __init__(self, base_url, **kwargs):
+        super().__init__(base_url)
+        for key, val in kwargs.items():
+            self.set_value(key, val)
+
+
+class FeedQuery(Query):
+    _kwargs = {
+        'search' : QueryArgument('search', str, required=True),
+        'cursor' : QueryArgument('cursor', str),
+    }
+
+    def __init__(self, base_url, **kwargs):
+        super().__init__(base_url)
+        for key, val in kwargs.items():
+            self.set_value(key, val)
+
+
+def parse_board(body):
+    data = json.loads(body)
+    return ParsedPage([job['id'] for job in data['jobs']], data['page'] < data['pages'])
+
+
+def parse_feed(body):
+    data = json.loads(body)
+    return ParsedPage([item['key'] for item in data['items']], next_cursor=data.get('next'))
+
+
+register_source(BoardQuery, parse_board, PageNumberPagination('page'))
+register_source(FeedQuery, parse_feed, CursorPagination('cursor'))
+
+
+def board_handler(latency, render):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        lock = threading.Lock()
+        in_flight = 0
+        most_in_flight = 0
+        requests = 0
+        finished = None
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            cls = type(self)
+            with cls.lock:
+                cls.in_flight += 1
+                cls.requests += 1
+                cls.most_in_flight = max(cls.most_in_flight, cls.in_flight)
+            time.sleep(latency)
+            body = render(dict(parse_qsl(urlsplit(self.path).query))).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            with cls.lock:
+                cls.in_flight -= 1
+                cls.finished = time.perf_counter()
+    return Handler
+
+
+def render_indeed(params):
+    return results_page(int(params.get('start', 0)), TOTAL, PER_PAGE)
+
+
+def render_board(params):
+    page = int(params.get('page', 1))
+    pages = -(-TOTAL//PER_PAGE)
+    ids = range((page - 1)*PER_PAGE, min(page*PER_PAGE, TOTAL))
+    return json.dumps({'page' : page, 'pages' : pages, 'jobs' : [{'id' : 'b%i'%i} for i in ids]})
+
+
+def render_feed(params):
+    offset = int(params.get('cursor') or 0)
+    items = [{'key' : 'f%i'%i} for i in range(offset, min(offset + PER_PAGE, TOTAL))]
+    return json.dumps({'items' : items, 'next' : str(offset + PER_PAGE) if offset + PER_PAGE < TOTAL else None})
+
+
+def serve(handler):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    boards = [('indeed', board_handler(0.005, render_indeed)), ('board', board_handler(0.05, render_board)),
+              ('feed', board_handler(0.25, render_feed))]
+    servers = {name : serve(handler) for name, handler in boards}
+    base = {name : 'http://127.0.0.1:%i'%server.server_port for name, server in servers.items()}
+
+    queries = []
+    for i in range(10):
+        query = SimpleIndeedQuery(what='python %i'%i, where='New York')
+        query.base_url = base['indeed'] + '/jobs'
+        queries.append(query)
+        queries.append(BoardQuery(base['board'] + '/search', keywords='python %i'%i))
+        queries.append(FeedQuery(base['feed'] + '/api/feed', search='python %i'%i))
+
+    max_per_host = 4
+    metrics = Metrics()
+    crawler = Crawler(HTTPTransport(max_per_host, max_workers=12), rate=1000.0, burst=100.0, max_connections=12,
+                      metrics=metrics)
+    scheduler = Scheduler(crawler, max_per_host)
+
+    async def run():
+        try:
+            return await scheduler.crawl(queries)
+        finally:
+            await scheduler.close()
+
+    begin = time.perf_counter()
+    keys = asyncio.run(run())
+    seconds = time.perf_counter() - begin
+
+    print("%i queries, %i pages, %i job keys in %.2f s"%(len(queries), metrics.histograms['fetch'].count,
+                                                         sum(map(len, keys)), seconds))
+    for name, handler in boards:
+        print("%-7s %3i requests, at most %i in flight, finished after %.2f s"%(
+            name, handler.requests, handler.most_in_flight, handler.finished - begin))
+    serial = sum(handler.requests*latency for (name, handler), latency in zip(boards, (0.005, 0.05, 0.25)))
+    print("%.2f s of server time over %.2f s, %.1f of %i connections busy on average"%(
+        serial, seconds, serial/seconds, crawler.max_connections))
+    for server in servers.values():
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Building a local PostingIndex and answering AdvancedIndeedQuery keywords from it.
+
+Synthetic postings are indexed in batches, as they would arrive from a crawl, then a
+set of queries is answered from the index and, to check the results, by a plain scan
+over the records.
+
+Run from the repository root with::
+
+    python -m benchmarks.search [number of postings]
+"""
+import random
+import sys
+import time
+
+from queries import AdvancedIndeedQuery
+from queries.search import PostingIndex
+from queries.text import tokenize, segments
+
+TITLES = ['Software Engineer', 'Senior Data Scientist', 'Machine Learning Engineer', 'Data Analyst',
+          'Backend Developer', 'DevOps Engineer', 'Product Manager', 'QA Engineer']
+COMPANIES = ['Acme Corp', 'Globex', 'Initech', 'Umbrella Research', 'Hooli', 'Stark Industries']
+SKILLS = ['python', 'sql', 'c++', 'java', 'go', 'rust', 'kubernetes', 'aws', 'spark', 'pandas', 'react',
+          'machine learning', 'data pipelines', 'distributed systems', 'unit testing']
+FILLER = ('we are looking for a motivated team member with strong communication skills and experience '
+          'in building reliable products for our customers across the world').split()
+
+QUERIES = [
+    {'all_words' : 'python sql'},
+    {'exact_phrase' : 'machine learning'},
+    {'any_words' : 'rust go', 'none_words' : 'java'},
+    {'title_words' : 'senior scientist'},
+    {'from_company' : 'umbrella research', 'all_words' : 'kubernetes'},
+    {'exact_phrase' : 'distributed systems', 'title_words' : 'engineer', 'none_words' : 'react'},
+]
+
+
+def make_record(rand, index):
+    items = []
+    for _ in range(rand.randint(6, 20)):
+        words = rand.sample(FILLER, 8)
+        words.insert(rand.randrange(9), rand.choice(SKILLS))
+        items.append(' '.join(words).capitalize() + '.')
+    return {'job_key' : '%016x'%index, 'title' : rand.choice(TITLES), 'company_name' : rand.choice(COMPANIES),
+            'sections' : [{'heading' : 'Requirements', 'items' : items}]}
+
+
+def scan(records, query):
+    """
+    Match a query against every record directly, to check the index.
+    """
+    conditions = PostingIndex().conditions(query)
+    matches = []
+    for record in records:
+        fields = {'text' : ' ' + ' | '.join(' '.join(tokenize(seg)) for seg in segments(record)) + ' ',
+                  'title' : ' ' + ' '.join(tokenize(record['title'])) + ' ',
+                  'company' : ' ' + ' '.join(tokenize(record['company_name'])) + ' '}
+        keep = True
+        for field, operator, words in conditions:
+            text = fields[field]
+            found = [' %s '%word in text for word in words]
+            if operator == 'all':
+                keep = all(found)
+            elif operator == 'any':
+                keep = any(found)
+            elif operator == 'none':
+                keep = not any(found)
+            else:
+                keep = ' %s '%' '.join(words) in text
+            if not keep:
+                break
+        if keep:
+            matches.append(record['job_key'])
+    return matches
+
+
+def main(argv):
+    number = int(argv[0]) if argv else 20000
+    rand = random.Random(0)
+    records = [make_record(rand, index) for index in range(number)]
+
+    index = PostingIndex()
+    begin = time.perf_counter()
+    for start in range(0, number, 1000):
+        index.extend(records[start:start + 1000])
+    seconds = time.perf_counter() - begin
+    print("indexed %i postings in %.2f s, %.0f postings/s, %i words"%(
+        number, seconds, number/seconds, len(index._postings['text'])))
+
+    for values in QUERIES:
+        query = AdvancedIndeedQuery(where='Remote', **values)
+        begin = time.perf_counter()
+        keys = index.search(query)
+        indexed = time.perf_counter() - begin
+        begin = time.perf_counter()
+        expected = scan(records, query)
+        scanned = time.perf_counter() - begin
+        print("%-90s %6i matches  index %8.2f ms  scan %8.1f ms  %s"%(
+            values, len(keys), indexed*1e3, scanned*1e3, 'ok' if keys == expected else 'MISMATCH'))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,68 @@
+"""
+Saving and loading a batch of queries in the columnar format against JSON lines of urls.
+
+Run from the repository root with::
+
+    python -m benchmarks.serialize
+"""
+import json
+import os
+import random
+import tempfile
+import time
+
+from queries import SimpleIndeedQuery
+from queries.serialize import save, load
+
+JOB_TYPES = (None, 'fulltime', 'parttime', 'contract', 'internship', 'temporary', 'commission')
+EXPERIENCE = (None, 'entry_level', 'mid_level', 'senior_level')
+RADII = (None, 0, 5, 10, 15, 25, 50, 100)
+
+
+def make_queries(number, rng):
+    cities = ['City %i, ST'%i for i in range(500)]
+    titles = ['python', 'data engineer', 'C++ developer', 'analyst', None]
+    return [SimpleIndeedQuery(where=rng.choice(cities), what=rng.choice(titles), radius=rng.choice(RADII),
+                              job_type=rng.choice(JOB_TYPES), experience=rng.choice(EXPERIENCE),
+                              start=rng.randrange(0, 100, 10))
+            for _ in range(number)]
+
+
+def timed(label, func):
+    begin = time.perf_counter()
+    result = func()
+    print("%-36s %8.3f s"%(label, time.perf_counter() - begin))
+    return result
+
+
+def main(number=200000):
+    queries = make_queries(number, random.Random(0))
+    directory = tempfile.mkdtemp()
+    batch_path = os.path.join(directory, 'queries.jsqb')
+    jsonl_path = os.path.join(directory, 'queries.jsonl')
+
+    timed('save columnar', lambda: save(queries, batch_path))
+
+    def save_jsonl():
+        with open(jsonl_path, 'w') as out:
+            for query in queries:
+                out.write(json.dumps(query.url) + '\n')
+    timed('save json lines of urls', save_jsonl)
+    print("%-36s %8.1f MB"%('columnar size', os.path.getsize(batch_path)/1e6))
+    print("%-36s %8.1f MB"%('json lines size', os.path.getsize(jsonl_path)/1e6))
+
+    batch = timed('open columnar (memory mapped)', lambda: load(batch_path))
+    timed('read one column', lambda: batch.column('job_type'))
+    loaded = timed('materialize every row', lambda: list(batch))
+    assert [query.url for query in loaded[:1000]] == [query.url for query in queries[:1000]]
+    del loaded
+    batch.close()
+
+    def load_jsonl():
+        with open(jsonl_path) as lines:
+            return [SimpleIndeedQuery.from_url(json.loads(line)) for line in lines]
+    timed('load json lines with from_url', load_jsonl)
+
+
+if __name__ == '__main__':
+    main()
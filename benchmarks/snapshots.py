@@ -0,0 +1,72 @@
+"""
+Daily crawls of synthetic postings through a SnapshotStore, with a small share of the
+postings added, edited or taken down each day.
+
+Prints the time of each crawl's diff and the changes it found, then reads the postings
+back as of an earlier day.
+
+Run from the repository root with::
+
+    python -m benchmarks.snapshots [number of postings] [days]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from queries.snapshots import SnapshotStore
+
+DAY = 24*60*60
+
+
+def make_record(rand, index):
+    return {'job_key' : '%016x'%index, 'title' : 'Engineer %i'%rand.randrange(1000),
+            'company_name' : 'Company %i'%rand.randrange(500), 'location' : 'Austin, TX',
+            'apply_type' : 'indeed', 'apply_url' : None,
+            'sections' : [{'heading' : 'Requirements', 'items' : ['Item %i'%rand.randrange(10**6)
+                                                                 for _ in range(8)]}]}
+
+
+def next_day(rand, postings, next_index, churn):
+    postings = dict(postings)
+    for job_key in rand.sample(sorted(postings), int(len(postings)*churn)):
+        del postings[job_key]
+    for job_key in rand.sample(sorted(postings), int(len(postings)*churn)):
+        postings[job_key] = dict(postings[job_key], title=postings[job_key]['title'] + ' (updated)')
+    for index in range(next_index, next_index + int(len(postings)*churn)):
+        record = make_record(rand, index)
+        postings[record['job_key']] = record
+    return postings, next_index + int(len(postings)*churn)
+
+
+def main(argv):
+    number = int(argv[0]) if argv else 50000
+    days = int(argv[1]) if len(argv) > 1 else 5
+    rand = random.Random(0)
+    postings = {record['job_key'] : record for record in (make_record(rand, i) for i in range(number))}
+    next_index = number
+    store = SnapshotStore(os.path.join(tempfile.mkdtemp(), 'snapshots.sqlite'))
+
+    start = 1.6e9
+    for day in range(days):
+        if day:
+            postings, next_index = next_day(rand, postings, next_index, 0.01)
+        begin = time.perf_counter()
+        changes = len(store.diff(postings.values(), at=start + day*DAY))
+        seconds = time.perf_counter() - begin
+        crawl = store.crawls()[-1]
+        print("day %i: %i postings, %i changes (%i added, %i modified, %i removed) in %.2f s, %.1f us per posting"%(
+            day, crawl['seen'], changes, crawl['added'], crawl['modified'], crawl['removed'], seconds,
+            seconds/crawl['seen']*1e6))
+
+    begin = time.perf_counter()
+    first = sum(1 for _ in store.as_of(at=start + DAY/2))
+    print("%i postings as of day 0, read in %.2f s"%(first, time.perf_counter() - begin))
+    removed = sum(1 for _ in store.changes(since=start, kinds=['removed']))
+    print("%i postings removed since day 0, %i postings now"%(removed, len(store)))
+    store.close()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,80 @@
+"""
+Import time and construction time for the queries package, against a budget.
+
+Each import is timed in a fresh interpreter from compiled bytecode, taking the best
+of several runs, and the construction times are the per-query mean over a loop. The
+run fails with a non zero exit status if anything is over its budget.
+
+Run from the repository root with::
+
+    python -m benchmarks.startup [budget multiplier, e.g. 2 on a slow machine]
+"""
+import compileall
+import os
+import subprocess
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#The budget for each measurement, in milliseconds.
+BUDGETS = {
+    'import queries' : 5.0,
+    'first use of SimpleIndeedQuery' : 30.0,
+    'first SimpleIndeedQuery url' : 32.0,
+    'SimpleIndeedQuery()' : 0.01,
+    'AdvancedIndeedQuery()' : 0.015,
+}
+
+IMPORT_SCRIPT = '''
+import time
+begin = time.perf_counter()
+import queries
+imported = time.perf_counter()
+queries.SimpleIndeedQuery
+used = time.perf_counter()
+queries.SimpleIndeedQuery(what='python', where='New York').url
+built = time.perf_counter()
+print(imported - begin, used - begin, built - begin)
+'''
+
+
+def import_times(runs=7):
+    #Time imports from up to date bytecode, as an installed package would have.
+    compileall.compile_dir(os.path.join(ROOT, 'queries'), quiet=1)
+    best = None
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT], cwd=ROOT, check=True,
+                                capture_output=True, text=True).stdout
+        times = [float(val)*1e3 for val in output.split()]
+        best = times if best is None else [min(pair) for pair in zip(best, times)]
+    return dict(zip(('import queries', 'first use of SimpleIndeedQuery', 'first SimpleIndeedQuery url'), best))
+
+
+def construction_times(number=20000):
+    from queries import SimpleIndeedQuery, AdvancedIndeedQuery
+    times = {}
+    for name, build in (('SimpleIndeedQuery()', lambda: SimpleIndeedQuery(what='python', where='New York')),
+                        ('AdvancedIndeedQuery()', lambda: AdvancedIndeedQuery(all_words='python', where='New York'))):
+        times[name] = min(timeit.repeat(build, number=number, repeat=5))/number*1e3
+    return times
+
+
+def main(argv):
+    scale = float(argv[0]) if argv else 1.0
+    times = import_times()
+    times.update(construction_times())
+    over = []
+    for name, budget in BUDGETS.items():
+        budget *= scale
+        status = 'ok' if times[name] <= budget else 'OVER'
+        if status != 'ok':
+            over.append(name)
+        print("%-32s %10.4f ms   budget %10.4f ms   %s"%(name, times[name], budget, status))
+    if over:
+        print("Over budget: %s"%', '.join(over))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
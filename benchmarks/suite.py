@@ -0,0 +1,209 @@
+"""
+A benchmark suite for the query classes, with saved baselines to compare against.
+
+Every scenario runs for both SimpleIndeedQuery and AdvancedIndeedQuery:
+
+- construct: building a query with a few values.
+- setter churn: setting a value through its property.
+- url cached: reading the url of an unchanged query.
+- url after set: setting a value and reading the new url.
+- grid expansion: each url of a `Query.product` grid.
+- error path: reading the url of an invalid query and formatting the error.
+- repr invalid: the repr of a query whose url can't be built.
+- memory per query: the bytes held by each of many live queries.
+
+Times are the process's CPU time, the best of several repeats over several runs of the
+suite, in microseconds per operation, which keeps a busy machine's noise out of the
+comparisons. Run from the
+repository root with::
+
+    python -m benchmarks.suite                         # print the results
+    python -m benchmarks.suite --save baseline.json    # save them as a baseline
+    python -m benchmarks.suite --compare baseline.json # fail on a regression
+
+A comparison exits with status 1 if any scenario is slower, or uses more memory, than
+the baseline by more than the tolerance.
+"""
+import argparse
+import gc
+import json
+import platform
+import sys
+import timeit
+import tracemalloc
+from itertools import cycle
+from time import process_time
+
+from queries import SimpleIndeedQuery, AdvancedIndeedQuery
+from queries.query import QueryException
+
+CITIES = ['City %i'%i for i in range(50)]
+
+CLASSES = {
+    'simple' : (SimpleIndeedQuery, {'what' : 'python', 'where' : 'New York', 'radius' : 25},
+                {'where' : CITIES, 'radius' : [0, 5, 10, 25], 'job_type' : ['fulltime', 'contract']}),
+    'advanced' : (AdvancedIndeedQuery, {'all_words' : 'python', 'where' : 'New York', 'limit' : 50},
+                  {'where' : CITIES, 'radius' : [0, 5, 10, 25], 'age' : [1, 7, 'any']}),
+}
+
+
+def scenarios(query_cls, values, grid):
+    """
+    Yield the name, function, and operations per call of each timed scenario for a class.
+    """
+    yield 'construct', lambda: query_cls(**values), 1
+
+    query = query_cls(**values)
+    radii = cycle([0, 5, 10, 15, 25, 50, 100])
+    def churn():
+        query.radius = next(radii)
+    yield 'setter churn', churn, 1
+
+    cached = query_cls(**values)
+    cached.url
+    yield 'url cached', lambda: cached.url, 1
+
+    changing = query_cls(**values)
+    def url_after_set():
+        changing.radius = next(radii)
+        return changing.url
+    yield 'url after set', url_after_set, 1
+
+    size = 1
+    for choices in grid.values():
+        size *= len(choices)
+    yield 'grid expansion', lambda: list(query.product(**grid)), size
+
+    invalid = query_cls(**{name : val for name, val in values.items() if name != 'where'})
+    def error_path():
+        try:
+            invalid.url
+        except QueryException as error:
+            return str(error)
+    yield 'error path', error_path, 1
+
+    yield 'repr invalid', lambda: repr(invalid), 1
+
+
+def time_scenario(func, per_call, budget=0.02, repeat=5):
+    """
+    Get the best microseconds per operation, with each repeat taking about `budget` seconds.
+    """
+    timer = timeit.Timer(func, timer=process_time)
+    number, seconds = timer.autorange()
+    number = max(1, int(number*budget/seconds)) if seconds else number
+    return min(timer.repeat(repeat=repeat, number=number))/(number*per_call)*1e6
+
+
+def memory_per_query(query_cls, values, number=10000):
+    """
+    Get the bytes held by each of many live queries, each with its own values.
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    queries = [query_cls(**values) for _ in range(number)]
+    for i, query in enumerate(queries):
+        query.radius = (0, 5, 10)[i%3]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    held = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    del queries
+    return held/number
+
+
+def measurements():
+    """
+    Get a function that measures each scenario, and its unit, by name.
+    """
+    measures = {}
+    for label, (query_cls, values, grid) in CLASSES.items():
+        for name, func, per_call in scenarios(query_cls, values, grid):
+            measures['%s %s'%(label, name)] = ((lambda func=func, per_call=per_call: time_scenario(func, per_call)),
+                                               'us')
+        measures['%s memory per query'%label] = ((lambda query_cls=query_cls, values=values:
+                                                  memory_per_query(query_cls, values)), 'bytes')
+    return measures
+
+
+def run(measures, runs=3, names=None):
+    """
+    Get the best result of each scenario over a number of runs of the whole suite.
+    """
+    results = {}
+    for _ in range(runs):
+        for name, (measure, unit) in measures.items():
+            if names is not None and name not in names:
+                continue
+            val = measure()
+            if name not in results or val < results[name]['value']:
+                results[name] = {'value' : val, 'unit' : unit}
+    return results
+
+
+def regressed(results, baseline, tolerance, memory_tolerance):
+    """
+    Get the names of the results that are over their baseline by more than the tolerance.
+    """
+    names = []
+    for name, result in results.items():
+        if name in baseline and baseline[name]['value']:
+            limit = memory_tolerance if result['unit'] == 'bytes' else tolerance
+            if result['value']/baseline[name]['value'] - 1 > limit:
+                names.append(name)
+    return names
+
+
+def report(results, baseline, regressions):
+    for name, result in results.items():
+        if name not in baseline:
+            print("%-34s %12.3f %-5s   (no baseline)"%(name, result['value'], result['unit']))
+            continue
+        base = baseline[name]['value']
+        change = result['value']/base - 1 if base else 0.0
+        print("%-34s %12.3f %-5s   baseline %12.3f   %+7.1f%%   %s"%(name, result['value'], result['unit'], base,
+                                                                  change*100,
+                                                                  'REGRESSION' if name in regressions else 'ok'))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the query classes.")
+    parser.add_argument('--save', metavar='PATH', help="Save the results as a baseline.")
+    parser.add_argument('--compare', metavar='PATH', help="Compare the results to a saved baseline.")
+    parser.add_argument('--runs', type=int, default=3,
+                        help="The runs of the suite to take the best results of. Defaults to 3.")
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help="The allowed slowdown as a fraction of the baseline. Defaults to 0.15.")
+    parser.add_argument('--memory-tolerance', type=float, default=0.05,
+                        help="The allowed growth in memory as a fraction of the baseline. Defaults to 0.05.")
+    args = parser.parse_args(argv)
+
+    measures = measurements()
+    results = run(measures, args.runs)
+    regressions = []
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)['results']
+        regressions = regressed(results, baseline, args.tolerance, args.memory_tolerance)
+        if regressions:
+            #Measure anything that looks slower again, so a burst of load isn't a regression.
+            for name, result in run(measures, args.runs*2, regressions).items():
+                if result['value'] < results[name]['value']:
+                    results[name] = result
+            regressions = regressed(results, baseline, args.tolerance, args.memory_tolerance)
+        report(results, baseline, regressions)
+    else:
+        for name, result in results.items():
+            print("%-34s %12.3f %s"%(name, result['value'], result['unit']))
+
+    if args.save:
+        with open(args.save, 'w') as baseline_file:
+            json.dump({'python' : platform.python_version(), 'machine' : platform.machine(), 'results' : results},
+                      baseline_file, indent=2)
+    if regressions:
+        print("Regressed: %s"%', '.join(regressions))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -1,2 +1,24 @@
-from .query import Query, QueryArgument
-from .indeed import SimpleIndeedQuery, AdvancedIndeedQuery
\ No newline at end of file
+#The package's names are imported on first use, so `import queries` stays cheap for short lived runs.
+_lazy = {
+    'Query' : '.query',
+    'QueryArgument' : '.query',
+    'SimpleIndeedQuery' : '.indeed',
+    'AdvancedIndeedQuery' : '.indeed',
+}
+
+__all__ = list(_lazy)
+
+
+def __getattr__(name):
+    try:
+        module = _lazy[name]
+    except KeyError:
+        raise AttributeError("module %r has no attribute %r"%(__name__, name)) from None
+    from importlib import import_module
+    val = getattr(import_module(module, __name__), name)
+    globals()[name] = val
+    return val
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy))
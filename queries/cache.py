@@ -0,0 +1,299 @@
+import asyncio
+import json
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import time
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+from .query import Query
+from .transport import Response, Transport
+
+
+def canonical_url(query):
+    """
+    Get the canonical form of a query's url, for use as a cache key.
+
+    The parameters are sorted, a `start` of 0 is dropped since it's the same page as no
+    `start`, and the host is lower cased without any leading 'www.'.
+
+    Parameters
+    ----------
+    query: Query or str
+        A query, or a url.
+
+    Returns
+    -------
+    str
+    """
+    if isinstance(query, Query):
+        base = urlsplit(query.base_url)
+        query.check_parameters()
+        params = parse_qsl(base.query, keep_blank_values=True) + list(query._merged_params().items())
+    else:
+        base = urlsplit(query)
+        params = parse_qsl(base.query, keep_blank_values=True)
+    host = base.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    params = sorted((key, val) for key, val in params if not (key == 'start' and val in ('', '0')))
+    return '%s://%s%s%s'%(base.scheme.lower(), host, base.path or '/', '?' + urlencode(params) if params else '')
+
+
+class CacheMiss(KeyError):
+    """
+    Raised in offline mode when a url isn't in the cache.
+    """
+
+
+class ResponseCache(object):
+    """
+    A SQLite store of responses keyed by canonical url, with a time to live for
+    freshness and least recently used eviction once the stored bodies go over a size.
+
+    A hit only notes its access time in memory, so reads don't write. The access times
+    are written in one batch before anything is evicted, once `access_batch` of them
+    are pending, and on close.
+
+    Attributes
+    ----------
+    path: str
+        The path of the SQLite file, or ':memory:'.
+    ttl: float
+        The seconds that a stored response is fresh for.
+    max_bytes: int
+        The most bytes of bodies kept before evicting the least recently used.
+    size: int
+        The bytes of bodies currently stored.
+    access_batch: int
+        The access times kept in memory before they're written.
+
+    Methods
+    -------
+    get(url)
+        Get a stored response and whether it's still fresh.
+    put(url, response)
+        Store a response.
+    refresh(url)
+        Mark a stored response as fresh again, after a successful revalidation.
+    delete(url)
+        Remove a stored response.
+    close()
+        Close the database.
+    """
+    def __init__(self, path, ttl=24*60*60, max_bytes=1 << 30, access_batch=1024):
+        """
+        Parameters
+        ----------
+        path: str
+            The path of the SQLite file, or ':memory:'.
+        ttl: float, optional
+            The seconds that a stored response is fresh for. Defaults to a day.
+        max_bytes: int, optional
+            The most bytes of bodies to keep. Defaults to 1 GiB.
+        access_batch: int, optional
+            The access times kept in memory before they're written. Defaults to 1024.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.access_batch = access_batch
+        self._accessed = {}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS responses ('
+                         'key TEXT PRIMARY KEY, url TEXT, status INTEGER, headers TEXT, body BLOB, '
+                         'stored_at REAL, accessed_at REAL, size INTEGER)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)')
+        self._db.commit()
+        self.size = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def get(self, url):
+        """
+        Parameters
+        ----------
+        url: Query or str
+
+        Returns
+        -------
+        tuple[Response, bool]
+            The stored response and True if it's still fresh, or (None, False) if there
+            isn't one.
+        """
+        key = canonical_url(url)
+        with self._lock:
+            row = self._db.execute('SELECT url, status, headers, body, stored_at FROM responses WHERE key = ?',
+                                   (key, )).fetchone()
+            if row is None:
+                return None, False
+            now = time()
+            self._accessed[key] = now
+            if len(self._accessed) >= self.access_batch:
+                self._write_accessed()
+                self._db.commit()
+        stored_url, status, headers, body, stored_at = row
+        return Response(stored_url, status, json.loads(headers), body), now - stored_at < self.ttl
+
+    def put(self, url, response):
+        """
+        Parameters
+        ----------
+        url: Query or str
+        response: Response
+        """
+        key = canonical_url(url)
+        size = len(response.body)
+        now = time()
+        with self._lock:
+            old = self._db.execute('SELECT size FROM responses WHERE key = ?', (key, )).fetchone()
+            self._db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                             (key, response.url, response.status, json.dumps(response.headers),
+                              response.body, now, now, size))
+            self.size += size - (old[0] if old else 0)
+            self._accessed.pop(key, None)
+            self._evict()
+            self._db.commit()
+
+    def refresh(self, url):
+        """
+        Parameters
+        ----------
+        url: Query or str
+        """
+        key = canonical_url(url)
+        now = time()
+        with self._lock:
+            self._accessed.pop(key, None)
+            self._db.execute('UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?', (now, now, key))
+            self._db.commit()
+
+    def delete(self, url):
+        """
+        Parameters
+        ----------
+        url: Query or str
+        """
+        key = canonical_url(url)
+        with self._lock:
+            old = self._db.execute('SELECT size FROM responses WHERE key = ?', (key, )).fetchone()
+            if old:
+                self._db.execute('DELETE FROM responses WHERE key = ?', (key, ))
+                self.size -= old[0]
+                self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._write_accessed()
+            self._db.commit()
+            self._db.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    def _write_accessed(self):
+        """
+        Write the pending access times, without committing.
+        """
+        if self._accessed:
+            self._db.executemany('UPDATE responses SET accessed_at = ? WHERE key = ?',
+                                 [(at, key) for key, at in self._accessed.items()])
+            self._accessed.clear()
+
+    def _evict(self):
+        """
+        Delete the least recently used responses until the size is under max_bytes.
+        """
+        if self.size > self.max_bytes:
+            self._write_accessed()
+        while self.size > self.max_bytes:
+            rows = self._db.execute('SELECT key, size FROM responses ORDER BY accessed_at LIMIT 64').fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self._db.execute('DELETE FROM responses WHERE key = ?', (key, ))
+                self.size -= size
+                if self.size <= self.max_bytes:
+                    break
+
+
+class CachingTransport(Transport):
+    """
+    A transport that answers from a ResponseCache when it can.
+
+    Fresh responses are returned without touching the network. Stale responses are
+    revalidated with If-None-Match/If-Modified-Since when the server gave an ETag or
+    Last-Modified header, and kept on a 304. In offline mode the network is never used,
+    stale responses are returned as is, and a url that isn't cached raises CacheMiss,
+    which lets the parsing stage be re-run from the cache alone.
+
+    The cache is read and written on a thread of the transport's own, so its SQLite
+    calls don't block the event loop.
+
+    Attributes
+    ----------
+    transport: Transport
+        The transport for anything that isn't answered by the cache. Can be None offline.
+    cache: ResponseCache
+        The response store.
+    offline: bool
+        True to never use the network.
+    hits: int
+        Requests answered from the cache, including revalidated ones.
+    misses: int
+        Requests that needed a full fetch.
+    """
+    def __init__(self, transport, cache, offline=False):
+        """
+        Parameters
+        ----------
+        transport: Transport
+            The transport for anything that isn't answered by the cache.
+        cache: ResponseCache
+            The response store.
+        offline: bool, optional
+            True to never use the network. Defaults to False.
+        """
+        if transport is None and not offline:
+            raise ValueError("A transport is required unless running offline.")
+        self.transport = transport
+        self.cache = cache
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        #The cache's calls hold its lock, so a single thread is all they can use.
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def fetch(self, url, headers=None):
+        cached, fresh = await self._run(self.cache.get, url)
+        if cached is not None and (fresh or self.offline):
+            self.hits += 1
+            return cached
+        if self.offline:
+            raise CacheMiss(url)
+
+        request_headers = dict(headers or {})
+        if cached is not None:
+            if 'etag' in cached.headers:
+                request_headers['If-None-Match'] = cached.headers['etag']
+            if 'last-modified' in cached.headers:
+                request_headers['If-Modified-Since'] = cached.headers['last-modified']
+        response = await self.transport.fetch(url, request_headers)
+        if response.status == 304 and cached is not None:
+            self.hits += 1
+            await self._run(self.cache.refresh, url)
+            return cached
+
+        self.misses += 1
+        if response.ok:
+            await self._run(self.cache.put, url, response)
+        return response
+
+    async def close(self):
+        if self.transport is not None:
+            await self.transport.close()
+        self._executor.shutdown(wait=True)
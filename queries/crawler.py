@@ -0,0 +1,435 @@
+import asyncio
+import http.client
+from collections import deque
+from dataclasses import dataclass, field
+from time import monotonic
+from typing import Any, List, Optional
+from urllib.parse import urlsplit
+
+from .indeed import posting_url
+from .instrument import NO_METRICS
+from .parsers import parse_search_page, parse_posting_header
+from .ratecontrol import THROTTLED_STATUSES
+from .transport import HTTPTransport, TokenBucket
+
+
+@dataclass
+class Page:
+    """
+    A single fetched page of search results.
+
+    Attributes
+    ----------
+    query: Query
+        The query for the page, with `start` set to the page's offset.
+    url: str
+        The url of the page.
+    status: int
+        The http status code of the response, or 0 if there wasn't one.
+    job_keys: list[str]
+        The job keys of the postings on the page.
+    has_next: bool
+        True if the pagination on the page links to a next page.
+    job_ages: list[float]
+        The age in days of each posting, or None where the page doesn't say.
+    total_count: int
+        The number of results the page reports for the query, or None if it doesn't say.
+    next_query: Query
+        The query of the next page, for pages walked with a pagination like the
+        Scheduler's, otherwise None.
+    error: Exception
+        What stopped the page from being fetched, with a status of 0, or None.
+    job_locations: list[str]
+        The location of each posting, or None where the page doesn't say.
+    """
+    query : Any
+    url : str
+    status : int
+    job_keys : List[str] = field(default_factory=list)
+    has_next : bool = False
+    job_ages : List[Optional[float]] = field(default_factory=list)
+    total_count : Optional[int] = None
+    next_query : Any = None
+    error : Optional[Exception] = None
+    job_locations : List[Optional[str]] = field(default_factory=list)
+
+
+class Crawler(object):
+    """
+    An asyncio crawler for walking the `start`/`limit` pages of queries.
+
+    Requests are limited per host by a token bucket, or by the adaptive rate of a
+    RateController, and limited overall by the number of connections. With a controller,
+    throttled and failed requests are retried with backoff. Each query keeps a window of
+    pages in flight ahead of the one being read, and stops once a page's pagination no
+    longer links to a next page.
+
+    Attributes
+    ----------
+    transport: Transport
+        What the crawler fetches urls with.
+    rate: float
+        The requests per second allowed for each host, without a controller.
+    burst: float
+        The most requests that can be made at once for a host after being idle.
+    window: int
+        The pages of a single query that can be in flight at once. Anything over 1
+        prefetches pages that might turn out to be past the last page.
+    max_connections: int
+        The most requests that can be in flight at once across every query.
+    parser: callable
+        Gets the job keys and pagination from a page, see `parsers.parse_search_page`.
+    metrics: Metrics
+        Where the time spent in each stage of the crawl is recorded, see `instrument.Metrics`.
+    controller: RateController
+        Adapts the rate of each host to its responses, see `ratecontrol.RateController`,
+        or None for fixed rates.
+
+    Methods
+    -------
+    bucket(host)
+        Get the rate limit of a host.
+    fetch(url)
+        Fetch a url, respecting the rate and connection limits.
+    fetch_page(query, parser=None, pagination=None)
+        Fetch and parse the page of a query at its `start`.
+    pages(query)
+        Asynchronously iterate over the pages of a query.
+    job_keys(query)
+        Get the job keys from every page of a query.
+    search_records(query)
+        Get the job key and age of each posting on every page of a query.
+    crawl(queries)
+        Get the job keys from every page of several queries at once.
+    fetch_postings(job_keys, seen=None, query=None, parse=parse_posting_header)
+        Fetch and parse the postings for job keys, skipping any that were already fetched.
+    close()
+        Close the transport.
+    """
+    def __init__(self, transport=None, rate=2.0, burst=1.0, window=2, max_connections=10,
+                 parser=parse_search_page, metrics=None, controller=None):
+        """
+        Parameters
+        ----------
+        transport: Transport, optional
+            What to fetch urls with. Defaults to an HTTPTransport.
+        rate: float, optional
+            The requests per second allowed for each host. Defaults to 2.
+        burst: float, optional
+            The largest burst of requests for a host. Defaults to 1.
+        window: int, optional
+            The pages of a single query that can be in flight at once. Defaults to 2.
+        max_connections: int, optional
+            The most requests in flight at once. Defaults to 10.
+        parser: callable, optional
+            Gets the job keys and pagination from a page. Defaults to parse_search_page.
+        metrics: Metrics, optional
+            Records the time spent in each stage of the crawl. Defaults to None, which
+            records nothing.
+        controller: RateController, optional
+            Adapts the rate of each host, in place of the fixed rate and burst. It can be
+            shared with other crawlers to keep one rate per host. Defaults to None.
+        """
+        if window < 1:
+            raise ValueError("Expected a window of at least 1; got %s"%window)
+        self.transport = transport if transport is not None else HTTPTransport(max_connections)
+        self.rate = rate
+        self.burst = burst
+        self.window = window
+        self.max_connections = max_connections
+        self.parser = parser
+        self.metrics = metrics if metrics is not None else NO_METRICS
+        self.controller = controller
+        self._buckets = {}
+        self._semaphore = None
+
+    def bucket(self, host):
+        """
+        Get the rate limit of a host.
+
+        Parameters
+        ----------
+        host: str
+
+        Returns
+        -------
+        TokenBucket or AdaptiveRate
+            The host's AdaptiveRate from the controller, if there is one.
+        """
+        if self.controller is not None:
+            return self.controller.for_host(host)
+        try:
+            return self._buckets[host]
+        except KeyError:
+            bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+            return bucket
+
+    async def fetch(self, url):
+        """
+        Fetch a url, respecting the rate and connection limits.
+
+        With a controller, each response adjusts the host's rate, and throttled (429/5xx) or
+        failed requests are retried up to the controller's retries, after a jittered backoff
+        and any Retry-After.
+
+        Parameters
+        ----------
+        url: str
+
+        Returns
+        -------
+        Response
+            The last response, which can still be throttled once out of retries.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_connections)
+        limiter = self.bucket(urlsplit(url).netloc)
+        attempt = 0
+        while True:
+            with self.metrics.timer('throttle'):
+                await limiter.acquire()
+            async with self._semaphore:
+                begin = monotonic()
+                try:
+                    with self.metrics.timer('fetch'):
+                        response = await self.transport.fetch(url)
+                except (http.client.HTTPException, OSError) as exc:
+                    if self.controller is None:
+                        raise
+                    limiter.record(None, monotonic() - begin)
+                    response, error = None, exc
+                latency = monotonic() - begin
+            if response is not None:
+                self.metrics.count('status %i'%response.status)
+                if self.controller is None:
+                    return response
+                limiter.record(response.status, latency, response.headers)
+                if response.status not in THROTTLED_STATUSES:
+                    return response
+            if attempt >= self.controller.retries:
+                if response is None:
+                    raise error
+                return response
+            self.metrics.count('retries')
+            await asyncio.sleep(self.controller.backoff_delay(attempt))
+            attempt += 1
+
+    async def fetch_page(self, query, parser=None, pagination=None):
+        """
+        Fetch and parse the single page of a query at its `start`, or at wherever its
+        pagination points.
+
+        Parameters
+        ----------
+        query: Query
+        parser: callable, optional
+            Parses the page in place of the crawler's parser. Defaults to None.
+        pagination: PageNumberPagination or CursorPagination, optional
+            Gets the query of the next page, in place of the `start`/`limit` offsets,
+            see `scheduler.Source`. Defaults to None.
+
+        Returns
+        -------
+        Page
+            With a `next_query` if there's a pagination.
+        """
+        step = page_size(query) if pagination is None else None
+        return await self._fetch_page(query, step, parser, pagination)
+
+    async def pages(self, query):
+        """
+        Asynchronously iterate over the pages of a query, in order, starting from its `start`.
+
+        Parameters
+        ----------
+        query: Query
+            A query with a `start` argument. The query itself isn't modified.
+
+        Yields
+        ------
+        Page
+        """
+        step = page_size(query)
+        next_start = query.start or 0
+        pending = deque()
+        try:
+            while True:
+                while len(pending) < self.window:
+                    page_query = query.copy(start=next_start)
+                    pending.append(asyncio.ensure_future(self._fetch_page(page_query, step)))
+                    next_start += step
+                page = await pending.popleft()
+                yield page
+                if not page.has_next:
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def job_keys(self, query):
+        """
+        Get the job keys from every page of a query.
+
+        Parameters
+        ----------
+        query: Query
+
+        Returns
+        -------
+        list[str]
+        """
+        keys = []
+        async for page in self.pages(query):
+            keys.extend(page.job_keys)
+        return keys
+
+    async def search_records(self, query):
+        """
+        Get a record for each posting on every page of a query, with what its search
+        page shows about it.
+
+        Parameters
+        ----------
+        query: Query
+
+        Returns
+        -------
+        list[dict]
+            The 'job_key', 'age' in days and 'location' of each posting, with None where
+            the page doesn't show them.
+        """
+        records = []
+        async for page in self.pages(query):
+            records.extend({'job_key' : key, 'age' : age, 'location' : location}
+                           for key, age, location in zip(page.job_keys, page.job_ages, page.job_locations))
+        return records
+
+    async def crawl(self, queries):
+        """
+        Get the job keys from every page of several queries at once.
+
+        Parameters
+        ----------
+        queries: Iterable[Query]
+
+        Returns
+        -------
+        list[list[str]]
+            The job keys of each query, in the same order as the queries.
+        """
+        return list(await asyncio.gather(*(self.job_keys(query) for query in queries)))
+
+    async def fetch_postings(self, job_keys, seen=None, query=None, parse=parse_posting_header):
+        """
+        Fetch and parse the postings for job keys.
+
+        Parameters
+        ----------
+        job_keys: Iterable[str]
+        seen: SeenIndex, optional
+            Postings in the index are skipped, and fetched postings are added to it. The
+            index is flushed once the postings are fetched. Defaults to None.
+        query: Query, optional
+            The query the job keys came from, for the index's hit and miss counts.
+            Defaults to None.
+        parse: callable, optional
+            Parses a posting page. Defaults to parse_posting_header.
+
+        Returns
+        -------
+        dict
+            The parsed posting for each fetched job key.
+        """
+        keys = seen.unseen(job_keys, query) if seen is not None else list(dict.fromkeys(job_keys))
+
+        async def fetch_posting(key):
+            response = await self.fetch(posting_url(key))
+            if not response.ok:
+                return key, None
+            with self.metrics.timer('parse'):
+                posting = parse(response.body)
+            if seen is not None:
+                with self.metrics.timer('store'):
+                    seen.add(key)
+            return key, posting
+
+        try:
+            results = await asyncio.gather(*(fetch_posting(key) for key in keys))
+        finally:
+            if seen is not None and keys:
+                #The index only keeps its keys across runs once they're committed.
+                with self.metrics.timer('store'):
+                    await asyncio.get_running_loop().run_in_executor(None, seen.flush)
+        return {key : posting for key, posting in results if posting is not None}
+
+    async def close(self):
+        await self.transport.close()
+
+    async def _fetch_page(self, query, step, parser=None, pagination=None):
+        """
+        Fetch and parse a page, with the crawler's parser and the `start`/`limit` offsets,
+        or with a Scheduler source's parser and pagination.
+        """
+        with self.metrics.timer('encode'):
+            url = query.url
+        response = await self.fetch(url)
+        if not response.ok:
+            return Page(query, url, response.status)
+        with self.metrics.timer('parse'):
+            parsed = (parser or self.parser)(response.body)
+        next_query = None
+        if pagination is not None:
+            next_query = pagination.next_query(query, parsed)
+            has_next = next_query is not None
+        else:
+            #A page numbered for another offset isn't the one asked for, like the last page
+            #served again for an offset past it.
+            on_page = parsed.page_number is not None and parsed.page_number - 1 == (query.start or 0)//step
+            has_next = parsed.has_next_page and on_page
+        job_ages = getattr(parsed, 'job_ages', None) or [None]*len(parsed.job_keys)
+        job_locations = getattr(parsed, 'job_locations', None) or [None]*len(parsed.job_keys)
+        return Page(query, url, response.status, parsed.job_keys, has_next, job_ages,
+                    getattr(parsed, 'total_count', None), next_query, job_locations=job_locations)
+
+
+def page_size(query):
+    """
+    Get the number of results per page for a query.
+
+    Parameters
+    ----------
+    query: Query
+
+    Returns
+    -------
+    int
+        The query's `limit` if it has one set, otherwise 10.
+    """
+    try:
+        return query.arg_value('limit') or 10
+    except ValueError:
+        return 10
+
+
+def crawl(queries, **kwargs):
+    """
+    Get the job keys from every page of several queries, blocking until done.
+
+    Parameters
+    ----------
+    queries: Iterable[Query]
+    kwargs:
+        Any keyword arguments for the Crawler.
+
+    Returns
+    -------
+    list[list[str]]
+        The job keys of each query, in the same order as the queries.
+    """
+    async def run():
+        crawler = Crawler(**kwargs)
+        try:
+            return await crawler.crawl(queries)
+        finally:
+            await crawler.close()
+    return asyncio.run(run())
@@ -0,0 +1,661 @@
+import json
+import math
+import os
+import random
+import sqlite3
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from hashlib import blake2b
+
+from .query import Query
+from .serialize import encode_array, decode_array
+from .text import tokenize, segments
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_MASK = (1 << 64) - 1
+
+#The fewest postings whose buckets wait in a dict before they're merged into the sorted arrays.
+MERGE_SIZE = 4096
+
+
+class BloomFilter(object):
+    """
+    A Bloom filter over strings, sized for an expected number of keys and false positive rate.
+
+    Attributes
+    ----------
+    num_bits: int
+        The size of the bit array.
+    num_hashes: int
+        The number of bit positions set for each key.
+    """
+    def __init__(self, capacity, error_rate=0.01, bits=None):
+        """
+        Parameters
+        ----------
+        capacity: int
+            The number of keys expected.
+        error_rate: float, optional
+            The false positive rate at capacity. Defaults to 0.01.
+        bits: bytearray, optional
+            Existing bits of a filter with the same capacity and error_rate. Defaults to None.
+        """
+        num_bits = max(8, int(-capacity*math.log(error_rate)/(math.log(2)**2)))
+        self.num_bits = num_bits
+        self.num_hashes = max(1, int(round(num_bits/capacity*math.log(2))))
+        if bits is None:
+            bits = bytearray((num_bits + 7)//8)
+        elif len(bits) != (num_bits + 7)//8:
+            raise ValueError("Expected %i bytes of bits; got %i"%((num_bits + 7)//8, len(bits)))
+        self.bits = bits
+
+    def _positions(self, key):
+        digest = blake2b(key.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i*second)%self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        """
+        Parameters
+        ----------
+        key: str
+        """
+        bits = self.bits
+        for pos in self._positions(key):
+            bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class SeenIndex(object):
+    """
+    A persistent set of job keys, with a Bloom filter in front of an exact SQLite set.
+
+    Keys that the filter hasn't seen are answered from memory. Only the filter's
+    positives go to disk to rule out false positives, so the memory stays at the size of
+    the filter however many keys are stored.
+
+    Attributes
+    ----------
+    path: str
+        The path of the SQLite file. The filter is kept next to it with a '.bloom' suffix.
+    stats: dict
+        The [hits, misses] for each query label passed to `check`.
+
+    Methods
+    -------
+    add(key)
+        Add a key.
+    check(key, query=None)
+        Check if a key was seen, counting the hit or miss against a query.
+    unseen(keys, query=None)
+        Get the keys that weren't seen, in order and without duplicates.
+    flush()
+        Write the filter and commit the set.
+    close()
+        Flush and close the index.
+    """
+    def __init__(self, path, capacity=10**7, error_rate=0.01):
+        """
+        Parameters
+        ----------
+        path: str
+            The path of the SQLite file.
+        capacity: int, optional
+            The number of keys the filter is sized for. Defaults to 10 million.
+        error_rate: float, optional
+            The filter's false positive rate at capacity. Defaults to 0.01.
+        """
+        self.path = path
+        self.stats = defaultdict(lambda: [0, 0])
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS seen (key TEXT PRIMARY KEY) WITHOUT ROWID')
+        self._db.commit()
+
+        bits = None
+        if os.path.exists(self._bloom_path):
+            with open(self._bloom_path, 'rb') as bloom_file:
+                bits = bytearray(bloom_file.read())
+        try:
+            self.bloom = BloomFilter(capacity, error_rate, bits)
+        except ValueError:
+            self.bloom = BloomFilter(capacity, error_rate)
+            bits = None
+        if bits is None:
+            for (key, ) in self._db.execute('SELECT key FROM seen'):
+                self.bloom.add(key)
+
+    @property
+    def _bloom_path(self):
+        return self.path + '.bloom'
+
+    def __contains__(self, key):
+        if key not in self.bloom:
+            return False
+        with self._lock:
+            return self._db.execute('SELECT 1 FROM seen WHERE key = ?', (key, )).fetchone() is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM seen').fetchone()[0]
+
+    def add(self, key):
+        """
+        Parameters
+        ----------
+        key: str
+        """
+        with self._lock:
+            self._db.execute('INSERT OR IGNORE INTO seen VALUES (?)', (key, ))
+        self.bloom.add(key)
+
+    def check(self, key, query=None):
+        """
+        Check if a key was seen.
+
+        Parameters
+        ----------
+        key: str
+        query: Query or str, optional
+            What to count the hit or miss against. Defaults to None.
+
+        Returns
+        -------
+        bool
+        """
+        seen = key in self
+        self.stats[_label(query)][0 if seen else 1] += 1
+        return seen
+
+    def unseen(self, keys, query=None):
+        """
+        Get the keys that weren't seen, in order and without duplicates.
+
+        Parameters
+        ----------
+        keys: Iterable[str]
+        query: Query or str, optional
+            What to count the hits and misses against. Defaults to None.
+
+        Returns
+        -------
+        list[str]
+        """
+        batch = set()
+        unseen = []
+        for key in keys:
+            if key in batch or self.check(key, query):
+                continue
+            batch.add(key)
+            unseen.append(key)
+        return unseen
+
+    def flush(self):
+        """
+        Write the filter, then commit the set, so a stored filter never misses a stored key.
+        """
+        with self._lock:
+            with open(self._bloom_path + '.tmp', 'wb') as bloom_file:
+                bloom_file.write(self.bloom.bits)
+            os.replace(self._bloom_path + '.tmp', self._bloom_path)
+            self._db.commit()
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._db.close()
+
+
+def _label(query):
+    """
+    Get the label that stats are kept under for a query, the same for all of its pages.
+    """
+    if isinstance(query, Query):
+        if 'start' in query._positions:
+            query = query.copy(start=0)
+        return query.url
+    return query
+
+
+def lsh_bands(threshold, num_perm, miss_weight=0.7, steps=100):
+    """
+    Get the bands and rows per band of an LSH index that best separate the pairs above a
+    threshold from those below it, among the rows that divide num_perm.
+
+    A pair with Jaccard similarity s shares a band with probability
+    `1 - (1 - s**rows)**bands`. The bands and rows are those that minimize the weighted
+    area of that curve below the threshold, the pairs compared for nothing, and above it
+    under 1, the near duplicates missed. Every candidate's similarity is checked anyway,
+    so misses are weighted more by default.
+
+    Parameters
+    ----------
+    threshold: float
+        The Jaccard similarity that counts as a near duplicate.
+    num_perm: int
+        The length of the signatures.
+    miss_weight: float, optional
+        The weight of the missed near duplicates, with the rest on the needless
+        comparisons. Defaults to 0.7.
+    steps: int, optional
+        The steps of the numeric integrals. Defaults to 100.
+
+    Returns
+    -------
+    tuple[int, int]
+        (bands, rows), with bands*rows equal to num_perm.
+    """
+    grid = [(i + 0.5)/steps for i in range(steps)]
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm%rows:
+            continue
+        bands = num_perm//rows
+        wasted = missed = 0.0
+        for s in grid:
+            shared = 1 - (1 - s**rows)**bands
+            if s < threshold:
+                wasted += shared
+            else:
+                missed += 1 - shared
+        cost = ((1 - miss_weight)*wasted + miss_weight*missed)/steps
+        if best is None or cost < best[0]:
+            best = (cost, bands, rows)
+    return best[1], best[2]
+
+
+class NearDuplicateIndex(object):
+    """
+    Groups postings that are reposts of each other under different job keys, by the
+    similarity of their text.
+
+    Each posting's title, company, location and body sections are split into word
+    shingles, and summarized by a MinHash signature, whose matching positions estimate
+    the Jaccard similarity of two postings' shingles. The signatures are cut into bands
+    that are hashed into buckets, so a new posting is only compared to the postings it
+    shares a bucket with, rather than to every stored posting, and only those whose
+    estimated similarity reaches the threshold count as near duplicates.
+
+    Near duplicates are grouped into clusters with a union find, merging clusters when
+    a posting matches more than one. The canonical posting of a cluster is the first of
+    it that was added.
+
+    The memory is the signatures, `num_perm` 8 byte values for each posting, and 12
+    bytes for each band of each posting: the band's hashed bucket key and the posting,
+    in a pair of arrays sorted by key that a binary search looks up. The latest
+    postings' buckets wait in a dict, which is merged into the arrays once it holds an
+    eighth as many postings as they do, so the merges stay a constant share of the adds.
+    The text itself isn't kept.
+
+    Attributes
+    ----------
+    threshold: float
+        The estimated Jaccard similarity that makes postings near duplicates.
+    num_perm: int
+        The length of each signature.
+    bands: int
+        The number of bands each signature is cut into.
+    rows: int
+        The signature values in each band.
+    shingle: int
+        The number of words in each shingle.
+    job_keys: list[str]
+        The job key of each posting, by the order they were added.
+
+    Methods
+    -------
+    signature(record)
+        Get the MinHash signature of a posting.
+    candidates(signature)
+        Get the postings that share a band with a signature.
+    similar(record)
+        Get the stored postings that are near duplicates of a posting.
+    add(record)
+        Add a posting, and get the canonical job key of its cluster.
+    canonical(job_key)
+        Get the canonical job key of a posting's cluster.
+    clusters()
+        Get the job keys of each cluster with more than one posting.
+    save(path)
+    load(path)
+    """
+    def __init__(self, threshold=0.8, num_perm=128, bands=None, shingle=3, seed=1):
+        """
+        Parameters
+        ----------
+        threshold: float, optional
+            The estimated Jaccard similarity that makes postings near duplicates.
+            Defaults to 0.8.
+        num_perm: int, optional
+            The length of each signature. Longer signatures estimate the similarity
+            more closely, at 8 bytes per value per posting. Defaults to 128.
+        bands: int, optional
+            The number of bands, which must divide num_perm. Defaults to None, which
+            picks the bands that best match the threshold.
+        shingle: int, optional
+            The number of words in each shingle. Defaults to 3.
+        seed: int, optional
+            Seeds the hash functions. Postings are only comparable under the same seed.
+            Defaults to 1.
+        """
+        if not 0 < threshold <= 1:
+            raise ValueError("Expected a threshold in (0, 1]; got %s"%threshold)
+        if bands is None:
+            bands, rows = lsh_bands(threshold, num_perm)
+        elif num_perm%bands:
+            raise ValueError("Expected bands that divide num_perm %i; got %s"%(num_perm, bands))
+        else:
+            rows = num_perm//bands
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = rows
+        self.shingle = shingle
+        self.seed = seed
+        self.job_keys = []
+        rand = random.Random(seed)
+        #Each hash function is a*x + b over 64 bits, with an odd multiplier.
+        self._perms = [(rand.getrandbits(64) | 1, rand.getrandbits(64)) for _ in range(num_perm)]
+        if numpy is not None:
+            self._perm_arrays = tuple(numpy.array(vals, dtype=numpy.uint64) for vals in zip(*self._perms))
+        self._signatures = array('Q')
+        self._bucket_keys = [array('q') for _ in range(bands)]
+        self._bucket_docs = [array('I') for _ in range(bands)]
+        self._pending = [{} for _ in range(bands)]
+        self._pending_docs = 0
+        self._parents = array('I')
+        self._docs = {}
+
+    def __len__(self):
+        return len(self.job_keys)
+
+    def __contains__(self, job_key):
+        return job_key in self._docs
+
+    def _shingles(self, record):
+        words = []
+        for segment in segments(record) + [record.get('location')]:
+            words.extend(tokenize(segment))
+        size = min(self.shingle, len(words))
+        return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)} if words else set()
+
+    def signature(self, record):
+        """
+        Parameters
+        ----------
+        record: dict
+            A parsed posting, like those of `parsers.parse_posting`, with any of 'title',
+            'company_name', 'location' and 'sections'.
+
+        Returns
+        -------
+        array.array
+            The MinHash signature, of num_perm unsigned 64 bit values, or None if the
+            posting doesn't have any text.
+        """
+        hashes = [int.from_bytes(blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little')
+                  for shingle in self._shingles(record)]
+        if not hashes:
+            return None
+        if numpy is not None:
+            mults, adds = self._perm_arrays
+            values = numpy.array(hashes, dtype=numpy.uint64)
+            #Unsigned integer arithmetic wraps around, the same as the & _MASK below.
+            mins = (numpy.outer(mults, values) + adds[:, None]).min(axis=1)
+            signature = array('Q')
+            signature.frombytes(mins.astype('<u8').tobytes())
+            return signature
+        return array('Q', [min([(mult*val + add) & _MASK for val in hashes]) for mult, add in self._perms])
+
+    def _band_keys(self, signature):
+        #The keys are saved, so they're digests of the little endian values rather than hash().
+        if sys.byteorder == 'big':
+            signature = array('Q', signature)
+            signature.byteswap()
+        data = signature.tobytes()
+        size = self.rows*8
+        return [int.from_bytes(blake2b(data[start:start + size], digest_size=8).digest(), 'little', signed=True)
+                for start in range(0, len(data), size)]
+
+    def _stored(self, doc):
+        return self._signatures[doc*self.num_perm:(doc + 1)*self.num_perm]
+
+    def candidates(self, signature):
+        """
+        Parameters
+        ----------
+        signature: array.array
+
+        Returns
+        -------
+        set[int]
+            The ids of the stored postings that share at least one band with the signature.
+        """
+        docs = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            keys, band_docs = self._bucket_keys[band], self._bucket_docs[band]
+            pos = bisect_left(keys, key)
+            while pos < len(keys) and keys[pos] == key:
+                docs.add(band_docs[pos])
+                pos += 1
+            bucket = self._pending[band].get(key)
+            if bucket is None:
+                continue
+            if isinstance(bucket, int):
+                docs.add(bucket)
+            else:
+                docs.update(bucket)
+        return docs
+
+    def _merge(self):
+        """
+        Merge the pending buckets into the sorted arrays.
+        """
+        for band, pending in enumerate(self._pending):
+            keys, docs = list(self._bucket_keys[band]), list(self._bucket_docs[band])
+            for key, bucket in pending.items():
+                if isinstance(bucket, int):
+                    keys.append(key)
+                    docs.append(bucket)
+                else:
+                    keys.extend([key]*len(bucket))
+                    docs.extend(bucket)
+            order = sorted(range(len(keys)), key=keys.__getitem__)
+            self._bucket_keys[band] = array('q', [keys[i] for i in order])
+            self._bucket_docs[band] = array('I', [docs[i] for i in order])
+            pending.clear()
+        self._pending_docs = 0
+
+    def _similar(self, signature):
+        matches = []
+        for doc in self.candidates(signature):
+            stored = self._stored(doc)
+            similarity = sum(a == b for a, b in zip(signature, stored))/self.num_perm
+            if similarity >= self.threshold:
+                matches.append((doc, similarity))
+        return matches
+
+    def similar(self, record):
+        """
+        Get the stored postings that are near duplicates of a posting, without adding it.
+
+        Parameters
+        ----------
+        record: dict
+
+        Returns
+        -------
+        list[tuple[str, float]]
+            The job key and estimated similarity of each near duplicate, most similar first.
+        """
+        signature = self.signature(record)
+        if signature is None:
+            return []
+        matches = sorted(self._similar(signature), key=lambda match: (-match[1], match[0]))
+        return [(self.job_keys[doc], similarity) for doc, similarity in matches]
+
+    def _find(self, doc):
+        parents = self._parents
+        while parents[doc] != doc:
+            parents[doc] = parents[parents[doc]]
+            doc = parents[doc]
+        return doc
+
+    def _union(self, first, second):
+        first, second = self._find(first), self._find(second)
+        if first != second:
+            #The earlier posting stays the root, so it's the canonical one.
+            if second < first:
+                first, second = second, first
+            self._parents[second] = first
+
+    def add(self, record):
+        """
+        Add a posting, joining it to the clusters of any near duplicates.
+
+        Parameters
+        ----------
+        record: dict
+            A parsed posting with a 'job_key'. A job key that was already added isn't
+            added again.
+
+        Returns
+        -------
+        str
+            The canonical job key of the posting's cluster, which is its own job key if
+            it isn't a near duplicate of an earlier posting.
+        """
+        job_key = record['job_key']
+        if job_key in self._docs:
+            return self.canonical(job_key)
+        signature = self.signature(record)
+        doc = len(self.job_keys)
+        self.job_keys.append(job_key)
+        self._docs[job_key] = doc
+        self._parents.append(doc)
+        if signature is None:
+            #Postings without text are never near duplicates; keep a placeholder signature.
+            self._signatures.extend([0]*self.num_perm)
+            return job_key
+        for other, _ in self._similar(signature):
+            self._union(other, doc)
+        self._signatures.extend(signature)
+        for pending, key in zip(self._pending, self._band_keys(signature)):
+            bucket = pending.get(key)
+            if bucket is None:
+                pending[key] = doc
+            elif isinstance(bucket, int):
+                pending[key] = [bucket, doc]
+            else:
+                bucket.append(doc)
+        self._pending_docs += 1
+        if self._pending_docs >= max(MERGE_SIZE, len(self._bucket_keys[0])//8):
+            self._merge()
+        return self.job_keys[self._find(doc)]
+
+    def canonical(self, job_key):
+        """
+        Parameters
+        ----------
+        job_key: str
+
+        Returns
+        -------
+        str
+            The job key of the first posting added to the cluster of the posting.
+
+        Raises
+        ------
+        KeyError: If the job key wasn't added.
+        """
+        return self.job_keys[self._find(self._docs[job_key])]
+
+    def clusters(self):
+        """
+        Returns
+        -------
+        dict
+            The job keys of each cluster with more than one posting, in the order they
+            were added, by the canonical job key.
+        """
+        members = defaultdict(list)
+        for doc, job_key in enumerate(self.job_keys):
+            members[self._find(doc)].append(job_key)
+        return {self.job_keys[root] : keys for root, keys in members.items() if len(keys) > 1}
+
+    def save(self, path):
+        """
+        Write the index to a JSON file, with its arrays as base64 encoded little endian bytes.
+
+        Parameters
+        ----------
+        path: str
+        """
+        self._merge()
+        state = {'threshold' : self.threshold, 'num_perm' : self.num_perm, 'bands' : self.bands,
+                 'shingle' : self.shingle, 'seed' : self.seed, 'job_keys' : self.job_keys,
+                 'signatures' : encode_array(self._signatures), 'parents' : encode_array(self._parents),
+                 'bucket_keys' : [encode_array(keys) for keys in self._bucket_keys],
+                 'bucket_docs' : [encode_array(docs) for docs in self._bucket_docs]}
+        with open(path, 'w', encoding='utf-8') as index_file:
+            json.dump(state, index_file)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read an index written by `save`. More postings can be added to it.
+
+        Parameters
+        ----------
+        path: str
+
+        Returns
+        -------
+        NearDuplicateIndex
+        """
+        with open(path, encoding='utf-8') as index_file:
+            state = json.load(index_file)
+        index = cls(state['threshold'], state['num_perm'], state['bands'], state['shingle'], state['seed'])
+        index.job_keys = state['job_keys']
+        index._signatures = decode_array('Q', state['signatures'])
+        index._parents = decode_array('I', state['parents'])
+        index._bucket_keys = [decode_array('q', keys) for keys in state['bucket_keys']]
+        index._bucket_docs = [decode_array('I', docs) for docs in state['bucket_docs']]
+        index._docs = {job_key : doc for doc, job_key in enumerate(index.job_keys)}
+        return index
+
+
+def canonical_records(records, index):
+    """
+    Keep only the first posting of each cluster of near duplicates.
+
+    Parameters
+    ----------
+    records: Iterable[dict]
+        Parsed postings with a 'job_key', like those of `pipeline.parse_records`.
+    index: NearDuplicateIndex
+        Every record is added to it, so it also holds the clusters of those dropped.
+
+    Yields
+    ------
+    dict
+        The records that aren't near duplicates of an earlier one, skipping any whose
+        job key was already added.
+    """
+    for record in records:
+        if record['job_key'] in index:
+            continue
+        if index.add(record) == record['job_key']:
+            yield record
@@ -0,0 +1,496 @@
+import asyncio
+import http.client
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from time import time
+from typing import Any
+
+from .cache import canonical_url
+from .crawler import page_size
+from .indeed import posting_url
+from .parsers import parse_posting_header
+from .serialize import class_path, load_class
+
+logger = logging.getLogger(__name__)
+
+PENDING, CLAIMED, DONE, FAILED = 0, 1, 2, 3
+STATUS_NAMES = ('pending', 'claimed', 'done', 'failed')
+
+PAGE = 'page'
+POSTING = 'posting'
+
+#The errors a task is retried after, since fetching it again might work.
+TRANSPORT_ERRORS = (http.client.HTTPException, OSError)
+
+
+@dataclass
+class Task:
+    """
+    A page or posting claimed from a Frontier.
+
+    Attributes
+    ----------
+    id: int
+        The task's row in the frontier.
+    kind: str
+        'page' for a page of search results, or 'posting' for a job posting.
+    key: str
+        The canonical url of a page, or the job key of a posting.
+    url: str
+        The url to fetch.
+    query_cls: type
+        The Query class of a page, or None for a posting.
+    attempts: int
+        The number of times the task has been claimed, including this one.
+    """
+    id : int
+    kind : str
+    key : str
+    url : str
+    query_cls : Any = None
+    attempts : int = 1
+
+    @property
+    def query(self):
+        """
+        Query: The query of a page, decoded from its url.
+        """
+        return self.query_cls.from_url(self.url)
+
+
+class Frontier(object):
+    """
+    A persistent frontier of the pages and postings left to crawl, in a SQLite file.
+
+    Every task is pending, claimed, done or failed. A claim leases tasks to one worker
+    until the lease runs out, and is made in a single write transaction, so workers in
+    several processes can share a frontier without two of them claiming the same task.
+    Completing a task records it, and any pages and postings it led to, in one
+    transaction, so a worker that is killed loses at most the tasks it had in flight.
+    Those are claimed again once their lease runs out, or straight away when a worker
+    with the same owner name opens the frontier. A worker only records a task while it
+    still holds the lease, so a slow worker can't overwrite what the task's next owner
+    did with it.
+
+    Attributes
+    ----------
+    path: str
+        The path of the SQLite file.
+    owner: str
+        The name this worker claims tasks under. Defaults to the host and process id.
+    lease: float
+        The seconds a claim lasts before another worker can take the task.
+    max_attempts: int
+        The most times a task is tried before it's marked failed.
+    completed: int
+        The finished tasks this worker recorded.
+    lost: int
+        The finished or failed tasks this worker didn't record, because their lease had
+        run out.
+
+    Methods
+    -------
+    add_queries(queries)
+        Add the pages of queries at their `start`.
+    add_postings(job_keys)
+        Add postings to fetch.
+    claim(limit=1, kind=None)
+        Claim pending tasks.
+    complete(task, result=None, queries=(), job_keys=())
+        Record a finished task and what it led to.
+    complete_many(completions)
+        Record several finished tasks in one transaction.
+    fail(task, retry=True)
+        Give a task back to be retried, or mark it failed once out of attempts.
+    checkpoint(completions=(), failures=(), limit=0, kind=None, dropped=())
+        Record finished and failed tasks, then claim more, in one transaction.
+    counts()
+        Get the number of tasks of each kind by status.
+    results(kind='posting')
+        Iterate over the results of finished tasks.
+    """
+    def __init__(self, path, owner=None, lease=60.0, max_attempts=3):
+        """
+        Parameters
+        ----------
+        path: str
+            The path of the SQLite file.
+        owner: str, optional
+            The name this worker claims tasks under. Defaults to '<host>:<pid>'.
+        lease: float, optional
+            The seconds a claim lasts. Defaults to 60.
+        max_attempts: int, optional
+            The most times a task is tried. Defaults to 3.
+        """
+        self.path = path
+        self.owner = owner if owner is not None else '%s:%i'%(socket.gethostname(), os.getpid())
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.completed = 0
+        self.lost = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=60.0)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS tasks ('
+                         'id INTEGER PRIMARY KEY, kind TEXT, key TEXT, url TEXT, class TEXT, '
+                         'status INTEGER DEFAULT 0, owner TEXT, lease_until REAL, attempts INTEGER DEFAULT 0, '
+                         'result TEXT, UNIQUE (kind, key))')
+        self._db.execute('CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, kind, id)')
+        with self._transaction():
+            self._db.execute('UPDATE tasks SET status = ?, owner = NULL, lease_until = NULL '
+                             'WHERE status = ? AND owner = ?', (PENDING, CLAIMED, self.owner))
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Hold the lock and a write transaction, taken up front so that other processes wait
+        for it instead of failing partway through.
+        """
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                yield
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+
+    def _insert_pages(self, queries):
+        self._db.executemany('INSERT OR IGNORE INTO tasks (kind, key, url, class) VALUES (?, ?, ?, ?)',
+                             [(PAGE, canonical_url(query), query.url, class_path(type(query))) for query in queries])
+
+    def _insert_postings(self, job_keys):
+        self._db.executemany('INSERT OR IGNORE INTO tasks (kind, key) VALUES (?, ?)',
+                             [(POSTING, key) for key in set(job_keys)])
+
+    def add_queries(self, queries):
+        """
+        Add the pages of queries at their `start`. Pages already in the frontier, in any
+        status, aren't added again.
+
+        Parameters
+        ----------
+        queries: Iterable[Query]
+
+        Raises
+        ------
+        TypeError: If a query's class can't be imported back, see `serialize.class_path`.
+            None of the queries are added then.
+        """
+        with self._transaction():
+            self._insert_pages(queries)
+
+    def add_postings(self, job_keys):
+        """
+        Parameters
+        ----------
+        job_keys: Iterable[str]
+            Job keys already in the frontier aren't added again.
+        """
+        with self._transaction():
+            self._insert_postings(job_keys)
+
+    def claim(self, limit=1, kind=None):
+        """
+        Claim pending tasks, pages before postings, oldest first. Claimed tasks whose lease
+        ran out are claimed again.
+
+        Parameters
+        ----------
+        limit: int, optional
+            The most tasks to claim. Defaults to 1.
+        kind: str, optional
+            Only claim 'page' or 'posting' tasks. Defaults to either.
+
+        Returns
+        -------
+        list[Task]
+        """
+        return self.checkpoint(limit=limit, kind=kind)
+
+    def complete(self, task, result=None, queries=(), job_keys=()):
+        """
+        Parameters
+        ----------
+        task: Task
+        result: optional
+            Anything JSON serializable to store with the task, e.g. a parsed posting.
+            Defaults to None.
+        queries: Iterable[Query], optional
+            The pages the task led to, e.g. the next page of results. Defaults to none.
+        job_keys: Iterable[str], optional
+            The postings the task led to. Defaults to none.
+        """
+        self.checkpoint([(task, result, queries, job_keys)])
+
+    def complete_many(self, completions):
+        """
+        Record several finished tasks, and everything they led to, in one transaction.
+
+        Parameters
+        ----------
+        completions: Iterable[tuple]
+            The (task, result, queries, job_keys) of each finished task, as for `complete`.
+        """
+        self.checkpoint(completions)
+
+    def fail(self, task, retry=True):
+        """
+        Give a task back to be claimed again, or mark it failed once it's used up its attempts.
+
+        Parameters
+        ----------
+        task: Task
+        retry: bool, optional
+            False to mark the task failed straight away, for errors that trying again
+            won't fix. Defaults to True.
+        """
+        if retry:
+            self.checkpoint(failures=[task])
+        else:
+            self.checkpoint(dropped=[task])
+
+    def _release(self, task, status, now, result=None):
+        """
+        Set the status of a task this worker holds the lease of.
+
+        Returns
+        -------
+        bool
+            True if the task was updated, or False if the lease ran out.
+        """
+        return bool(self._db.execute('UPDATE tasks SET status = ?, result = ?, owner = NULL, lease_until = NULL '
+                                     'WHERE id = ? AND status = ? AND owner = ? AND lease_until >= ?',
+                                     (status, result, task.id, CLAIMED, self.owner, now)).rowcount)
+
+    def checkpoint(self, completions=(), failures=(), limit=0, kind=None, dropped=()):
+        """
+        Record finished and failed tasks, then claim more, all in one transaction.
+
+        A task is only recorded while this worker holds its lease. Any whose lease ran
+        out are left as they are, along with the pages and postings they led to, and
+        counted in `lost`. The others that finished are counted in `completed`, once the
+        transaction commits.
+
+        Parameters
+        ----------
+        completions: Iterable[tuple], optional
+            The (task, result, queries, job_keys) of each finished task, as for `complete`.
+            Defaults to none.
+        failures: Iterable[Task], optional
+            The tasks that failed, as for `fail`. Defaults to none.
+        limit: int, optional
+            The most tasks to claim, as for `claim`. Defaults to 0.
+        kind: str, optional
+            Only claim 'page' or 'posting' tasks. Defaults to either.
+        dropped: Iterable[Task], optional
+            The tasks to mark failed without another attempt. Defaults to none.
+
+        Returns
+        -------
+        list[Task]
+            The claimed tasks.
+        """
+        now = time()
+        completed = lost = 0
+        rows = []
+        with self._transaction():
+            for task, result, queries, job_keys in completions:
+                if not self._release(task, DONE, now, None if result is None else json.dumps(result)):
+                    lost += 1
+                    continue
+                completed += 1
+                if queries:
+                    self._insert_pages(queries)
+                if job_keys:
+                    self._insert_postings(job_keys)
+            for task in failures:
+                lost += not self._release(task, FAILED if task.attempts >= self.max_attempts else PENDING, now)
+            for task in dropped:
+                lost += not self._release(task, FAILED, now)
+            if limit:
+                rows = self._claim(limit, kind, now)
+        self.completed += completed
+        self.lost += lost
+        return [Task(row_id, row_kind, key, url or posting_url(key), load_class(cls) if cls else None, attempts + 1)
+                for row_id, row_kind, key, url, cls, attempts in rows]
+
+    def _claim(self, limit, kind, now):
+        """
+        Lease up to limit pending or expired tasks to this worker, in the caller's transaction.
+        """
+        where = '(status = ? OR (status = ? AND lease_until < ?))'
+        args = [PENDING, CLAIMED, now]
+        if kind is not None:
+            where += ' AND kind = ?'
+            args.append(kind)
+        rows = self._db.execute('SELECT id, kind, key, url, class, attempts FROM tasks WHERE %s '
+                                'ORDER BY kind, id LIMIT ?'%where, args + [limit]).fetchall()
+        self._db.executemany('UPDATE tasks SET status = ?, owner = ?, lease_until = ?, '
+                             'attempts = attempts + 1 WHERE id = ?',
+                             [(CLAIMED, self.owner, now + self.lease, row[0]) for row in rows])
+        return rows
+
+    def counts(self):
+        """
+        Returns
+        -------
+        dict
+            The number of tasks of each status name, for each kind.
+        """
+        with self._lock:
+            rows = self._db.execute('SELECT kind, status, COUNT(*) FROM tasks GROUP BY kind, status').fetchall()
+        counts = {}
+        for kind, status, count in rows:
+            counts.setdefault(kind, dict.fromkeys(STATUS_NAMES, 0))[STATUS_NAMES[status]] = count
+        return counts
+
+    def unfinished(self):
+        """
+        Returns
+        -------
+        int
+            The number of pending or claimed tasks.
+        """
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM tasks WHERE status IN (?, ?)',
+                                    (PENDING, CLAIMED)).fetchone()[0]
+
+    def results(self, kind=POSTING):
+        """
+        Parameters
+        ----------
+        kind: str, optional
+            Defaults to 'posting'.
+
+        Yields
+        ------
+        tuple[str, Any]
+            The key and stored result of each finished task of the kind.
+        """
+        with self._lock:
+            rows = self._db.execute('SELECT key, result FROM tasks WHERE kind = ? AND status = ? ORDER BY id',
+                                    (kind, DONE)).fetchall()
+        for key, result in rows:
+            yield key, None if result is None else json.loads(result)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class FrontierCrawler(object):
+    """
+    Works through a Frontier with a Crawler, until no tasks are left.
+
+    Tasks are claimed a batch at a time and fetched concurrently, then the whole batch is
+    checkpointed, along with claiming the next batch, in one transaction. Each page adds
+    the next page of its query, and the postings on it. Several FrontierCrawlers, in one
+    process or many, can work through the same frontier file.
+
+    A task that gets an error status, or a transport error, is retried up to the
+    frontier's attempts, and one that raises anything else, like a page the parser can't
+    handle, is logged and marked failed.
+
+    Attributes
+    ----------
+    crawler: Crawler
+    frontier: Frontier
+    batch: int
+        The most tasks claimed at a time.
+    parse: callable
+        Parses a posting page into the result stored for it.
+    postings: bool
+        True to add and fetch the postings found on pages.
+    poll: float
+        The seconds to wait for other workers' tasks when nothing is left to claim.
+
+    Methods
+    -------
+    run()
+        Work through the frontier.
+    """
+    def __init__(self, crawler, frontier, batch=20, parse=parse_posting_header, postings=True, poll=0.5):
+        """
+        Parameters
+        ----------
+        crawler: Crawler
+            Fetches the tasks. Its metrics record the checkpoints under 'checkpoint'.
+        frontier: Frontier
+        batch: int, optional
+            The most tasks claimed at a time. Defaults to 20.
+        parse: callable, optional
+            Parses a posting page. Defaults to parse_posting_header.
+        postings: bool, optional
+            True to add and fetch the postings found on pages. Defaults to True.
+        poll: float, optional
+            The seconds to wait for other workers' tasks. Defaults to 0.5.
+        """
+        self.crawler = crawler
+        self.frontier = frontier
+        self.batch = batch
+        self.parse = parse
+        self.postings = postings
+        self.poll = poll
+
+    async def run(self):
+        """
+        Claim and fetch tasks until every task in the frontier is done or failed.
+
+        Returns
+        -------
+        int
+            The number of tasks this worker completed.
+        """
+        metrics = self.crawler.metrics
+        completed = self.frontier.completed
+        done, failed, dropped = [], [], []
+        while True:
+            with metrics.timer('checkpoint'):
+                tasks = self.frontier.checkpoint(done, failed, self.batch, dropped=dropped)
+            if not tasks:
+                if not self.frontier.unfinished():
+                    return self.frontier.completed - completed
+                done, failed, dropped = [], [], []
+                await asyncio.sleep(self.poll)
+                continue
+            outcomes = await asyncio.gather(*(self._run_task(task) for task in tasks), return_exceptions=True)
+            done, failed, dropped = [], [], []
+            for task, outcome in zip(tasks, outcomes):
+                if isinstance(outcome, TRANSPORT_ERRORS):
+                    logger.warning("Fetching %s failed on attempt %i: %r", task.url, task.attempts, outcome)
+                    failed.append(task)
+                elif isinstance(outcome, Exception):
+                    logger.error("Task %s %s failed", task.kind, task.key, exc_info=outcome)
+                    dropped.append(task)
+                elif isinstance(outcome, BaseException):
+                    raise outcome
+                elif outcome is None:
+                    failed.append(task)
+                else:
+                    done.append(outcome)
+
+    async def _run_task(self, task):
+        """
+        Fetch a task, returning its completion for the frontier, or None if it failed.
+        """
+        if task.kind == PAGE:
+            query = task.query
+            page = await self.crawler.fetch_page(query)
+            if not 200 <= page.status < 300:
+                return None
+            next_pages = [query.copy(start=(query.start or 0) + page_size(query))] if page.has_next else []
+            return task, page.job_keys, next_pages, page.job_keys if self.postings else ()
+        response = await self.crawler.fetch(task.url)
+        if not response.ok:
+            return None
+        with self.crawler.metrics.timer('parse'):
+            posting = self.parse(response.body)
+        return task, posting, (), ()
@@ -0,0 +1,280 @@
+import json
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from time import time
+from typing import List, Optional
+from urllib.parse import urlsplit, parse_qsl, urlencode, urlunsplit
+
+from .cache import canonical_url
+from .query import find_arg
+
+DAY = 24*60*60
+
+#The arg_names that don't change which postings a query is watching.
+UNWATCHED_ARG_NAMES = ('start', 'limit', 'sort', 'fromage')
+
+
+@dataclass
+class Watermark:
+    """
+    How far a query has been crawled.
+
+    Attributes
+    ----------
+    last_run: float
+        The timestamp of the last crawl.
+    newest_key: str
+        The job key of the newest posting seen.
+    newest_date: float
+        The estimated timestamp of the newest posting seen, or None if unknown.
+    recent_keys: list[str]
+        The most recently seen job keys, newest first.
+    """
+    last_run : float
+    newest_key : Optional[str] = None
+    newest_date : Optional[float] = None
+    recent_keys : List[str] = field(default_factory=list)
+
+
+class WatermarkStore(object):
+    """
+    A SQLite store of the Watermark for each query.
+
+    Methods
+    -------
+    get(query)
+        Get the watermark of a query.
+    put(query, watermark)
+        Store the watermark of a query.
+    close()
+        Close the database.
+    """
+    def __init__(self, path):
+        """
+        Parameters
+        ----------
+        path: str
+            The path of the SQLite file, or ':memory:'.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('CREATE TABLE IF NOT EXISTS watermarks ('
+                         'key TEXT PRIMARY KEY, last_run REAL, newest_key TEXT, newest_date REAL, recent_keys TEXT)')
+        self._db.commit()
+
+    def get(self, query):
+        """
+        Parameters
+        ----------
+        query: Query
+
+        Returns
+        -------
+        Watermark
+            The watermark, or None if the query hasn't been crawled.
+        """
+        with self._lock:
+            row = self._db.execute('SELECT last_run, newest_key, newest_date, recent_keys FROM watermarks '
+                                   'WHERE key = ?', (watermark_key(query), )).fetchone()
+        if row is None:
+            return None
+        return Watermark(row[0], row[1], row[2], json.loads(row[3]))
+
+    def put(self, query, watermark):
+        """
+        Parameters
+        ----------
+        query: Query
+        watermark: Watermark
+        """
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?, ?, ?)',
+                             (watermark_key(query), watermark.last_run, watermark.newest_key,
+                              watermark.newest_date, json.dumps(watermark.recent_keys)))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def watermark_key(query):
+    """
+    Get the key a query's watermark is stored under, which ignores paging, sorting and age.
+
+    Parameters
+    ----------
+    query: Query
+
+    Returns
+    -------
+    str
+    """
+    parts = urlsplit(canonical_url(query))
+    params = [(key, val) for key, val in parse_qsl(parts.query, keep_blank_values=True)
+              if key not in UNWATCHED_ARG_NAMES]
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(params), ''))
+
+
+class IncrementalCrawler(object):
+    """
+    Crawls only the postings that are new since a query's last run.
+
+    The query's pages are walked sorted by date, with the smallest `fromage` choice that
+    covers the time since the last run. The walk stops at the first page with a posting
+    that was already seen, or one older than the newest posting seen last time. A query
+    without a watermark is crawled in full to set one.
+
+    Attributes
+    ----------
+    crawler: Crawler
+        The crawler for the pages.
+    store: WatermarkStore
+        The watermarks for each query.
+    recent_limit: int
+        The number of recent job keys kept in a watermark.
+    slack_days: float
+        The extra days allowed on the age cutoffs, for the coarse dates on the cards.
+
+    Methods
+    -------
+    age_for(query, watermark, now)
+        Get the fromage value for crawling a query since its watermark.
+    new_job_keys(query, now=None)
+        Get the job keys of the postings that are new since the last run.
+    """
+    def __init__(self, crawler, store, recent_limit=1000, slack_days=1.0):
+        """
+        Parameters
+        ----------
+        crawler: Crawler
+        store: WatermarkStore
+        recent_limit: int, optional
+            The number of recent job keys kept in a watermark. Defaults to 1000.
+        slack_days: float, optional
+            The extra days allowed on the age cutoffs. Defaults to 1.
+        """
+        self.crawler = crawler
+        self.store = store
+        self.recent_limit = recent_limit
+        self.slack_days = slack_days
+
+    def age_for(self, query, watermark, now):
+        """
+        Parameters
+        ----------
+        query: Query
+        watermark: Watermark
+        now: float
+
+        Returns
+        -------
+        int
+            The smallest numeric `fromage` choice that covers the time since the last run,
+            or None if none of them do.
+        """
+        name = find_arg(query, 'fromage')
+        if name is None or watermark is None:
+            return None
+        days = (now - watermark.last_run)/DAY + self.slack_days
+        choices = sorted(choice for choice in query._args[name].choices
+                         if isinstance(choice, int) and not isinstance(choice, bool))
+        for choice in choices:
+            if choice >= days:
+                return choice
+        return None
+
+    async def new_job_keys(self, query, now=None):
+        """
+        Get the job keys of the postings that are new since the query's last run, and move
+        its watermark forward.
+
+        The watermark only moves once the walk reaches the old watermark or the last page.
+        If a page fails, the keys found before it are returned and the watermark is left
+        as it was, so the next run finds them again along with those behind the failure.
+        A `fromage` set on the query is kept when it's smaller than the one the watermark
+        needs.
+
+        Parameters
+        ----------
+        query: Query
+            A query with `sort` and `fromage` arguments, like an AdvancedIndeedQuery.
+        now: float, optional
+            The current timestamp. Defaults to the current time.
+
+        Returns
+        -------
+        list[str]
+            The new job keys, newest first.
+
+        Raises
+        ------
+        ValueError: If the query can't be sorted by date.
+        """
+        now = time() if now is None else now
+        sort_name, age_name = find_arg(query, 'sort'), find_arg(query, 'fromage')
+        if sort_name is None:
+            raise ValueError("Incremental crawls need a query that can be sorted by date.")
+        watermark = self.store.get(query)
+        values = {sort_name : 'date'}
+        start_name = find_arg(query, 'start')
+        if start_name is not None:
+            values[start_name] = 0
+        if age_name is not None:
+            values[age_name] = _smaller_age(query.arg_value(age_name), self.age_for(query, watermark, now))
+        dated = query.copy(**values)
+
+        recent = set(watermark.recent_keys) if watermark else set()
+        max_age = None
+        if watermark is not None and watermark.newest_date is not None:
+            max_age = (now - watermark.newest_date)/DAY + self.slack_days
+
+        new_keys = []
+        seen = set()
+        min_age = None
+        failed = False
+        pages = self.crawler.pages(dated)
+        try:
+            async for page in pages:
+                if not 200 <= page.status < 300:
+                    #The pages stop at a failed one, so anything behind it wasn't seen.
+                    failed = True
+                    break
+                reached = False
+                for key, age in zip(page.job_keys, page.job_ages):
+                    if key in recent or (max_age is not None and age is not None and age > max_age):
+                        reached = True
+                        continue
+                    if key not in seen:
+                        seen.add(key)
+                        new_keys.append(key)
+                        if age is not None and (min_age is None or age < min_age):
+                            min_age = age
+                if reached:
+                    break
+        finally:
+            await pages.aclose()
+        if failed:
+            #Keep the old watermark, so the next run walks back past the failed page.
+            return new_keys
+
+        newest_date = watermark.newest_date if watermark else None
+        if min_age is not None:
+            newest_date = max(newest_date or 0, now - min_age*DAY)
+        recent_keys = (new_keys + (watermark.recent_keys if watermark else []))[:self.recent_limit]
+        newest_key = new_keys[0] if new_keys else (watermark.newest_key if watermark else None)
+        self.store.put(query, Watermark(now, newest_key, newest_date, recent_keys))
+        return new_keys
+
+
+def _smaller_age(age, other):
+    """
+    Get the narrower of two `fromage` values, where None, 'any' and 'last' are no narrower
+    than a number of days.
+    """
+    numeric = [val for val in (age, other) if isinstance(val, int) and not isinstance(val, bool)]
+    if numeric:
+        return min(numeric)
+    return age if age is not None else other
@@ -1,5 +1,24 @@
+from urllib.parse import urlencode
+
 from .query import Query, QueryArgument
 
+posting_base_url = 'https://indeed.com/viewjob'
+
+def posting_url(job_key):
+    """
+    Get the url of a job posting from its job key.
+    
+    Parameters
+    ----------
+    job_key: str
+        The `data-jk` key of the job card.
+    
+    Returns
+    -------
+    str
+    """
+    return posting_base_url + '?' + urlencode({'jk' : job_key})
+
 what = QueryArgument('q', str, disp_name='What')
 where = QueryArgument('l', str, required=True, disp_name='Where')
 radius = QueryArgument('radius', int, choices=(0, 5, 10, 15, 25, 50, 100), disp_name="Miles away")
@@ -23,13 +42,13 @@ class SimpleIndeedQuery(Query):
         'start' : start
     }
     def __init__(self, **kwargs):
-        super(SimpleIndeedQuery, self).__init__('https://indeed.com/jobs', **SimpleIndeedQuery._kwargs)
+        super(SimpleIndeedQuery, self).__init__('https://indeed.com/jobs')
         self._init_kwargs(**kwargs)
     
     def _init_kwargs(self, **kwargs):
         for key, val in kwargs.items():
             if key in SimpleIndeedQuery._kwargs:
-                self._args[key].value = val
+                self.set_value(key, val)
             else:
                 raise NotImplementedError("The following keyword is not valid for the SimpleIndeedQuery: %s"%key)
 
@@ -82,12 +101,12 @@ class AdvancedIndeedQuery(Query):
         'searched_from': searched_from
     }
     def __init__(self, **kwargs):
-        super(AdvancedIndeedQuery, self).__init__('https://indeed.com/jobs', **AdvancedIndeedQuery._kwargs)
+        super(AdvancedIndeedQuery, self).__init__('https://indeed.com/jobs')
         self._init_kwargs(**kwargs)
     
     def _init_kwargs(self, **kwargs):
         for key, val in kwargs.items():
             if key in AdvancedIndeedQuery._kwargs:
-                self._args[key].value = val
+                self.set_value(key, val)
             else:
                 raise NotImplementedError("The following keyword is not valid for the AdvancedIndeedQuery: %s"%key)
\ No newline at end of file
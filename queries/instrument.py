@@ -0,0 +1,434 @@
+import math
+import os
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from time import perf_counter
+
+#The stages that the crawler and pipeline time.
+STAGES = ('encode', 'throttle', 'fetch', 'parse', 'store')
+
+
+class Histogram(object):
+    """
+    A log bucketed histogram of durations in seconds.
+
+    Each bucket is 2**(1/resolution) times as wide as the one before it, starting at
+    `lowest`, so a percentile is off by at most that ratio (about 9% at the default
+    resolution) however many values are recorded.
+
+    Attributes
+    ----------
+    count: int
+        The number of values recorded.
+    total: float
+        The sum of the values recorded.
+    min: float
+        The smallest value recorded, or None.
+    max: float
+        The largest value recorded, or None.
+
+    Methods
+    -------
+    record(val)
+        Record a value.
+    percentile(pct)
+        Get an upper bound on a percentile of the recorded values.
+    buckets()
+        Get the upper bound and count of each non-empty bucket.
+    """
+    def __init__(self, lowest=1e-6, resolution=8):
+        """
+        Parameters
+        ----------
+        lowest: float, optional
+            The upper bound of the first bucket. Defaults to a microsecond.
+        resolution: int, optional
+            The number of buckets for every doubling. Defaults to 8.
+        """
+        self.lowest = lowest
+        self.resolution = resolution
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self._counts = {}
+        self._scale = resolution/math.log(2)
+        self._lock = threading.Lock()
+
+    def _index(self, val):
+        if val <= self.lowest:
+            return 0
+        return math.ceil(math.log(val/self.lowest)*self._scale)
+
+    def _bound(self, index):
+        return self.lowest*2**(index/self.resolution)
+
+    def record(self, val):
+        """
+        Parameters
+        ----------
+        val: float
+        """
+        index = self._index(val)
+        with self._lock:
+            self._counts[index] = self._counts.get(index, 0) + 1
+            self.count += 1
+            self.total += val
+            if self.min is None or val < self.min:
+                self.min = val
+            if self.max is None or val > self.max:
+                self.max = val
+
+    def percentile(self, pct):
+        """
+        Parameters
+        ----------
+        pct: float
+            The percentile, from 0 to 100.
+
+        Returns
+        -------
+        float
+            The upper bound of the bucket holding the percentile, capped at the largest value,
+            or None if nothing was recorded.
+        """
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count*pct/100))
+        seen = 0
+        for index in sorted(self._counts):
+            seen += self._counts[index]
+            if seen >= rank:
+                return min(self._bound(index), self.max)
+        return self.max
+
+    def buckets(self):
+        """
+        Returns
+        -------
+        list[tuple[float, int]]
+            The upper bound and count of each non-empty bucket, smallest first.
+        """
+        with self._lock:
+            return [(self._bound(index), self._counts[index]) for index in sorted(self._counts)]
+
+    def merge(self, other):
+        """
+        Add the values recorded in another histogram with the same buckets.
+
+        Parameters
+        ----------
+        other: Histogram
+        """
+        if (other.lowest, other.resolution) != (self.lowest, self.resolution):
+            raise ValueError("Can only merge histograms with the same buckets.")
+        with self._lock:
+            for index, count in other._counts.items():
+                self._counts[index] = self._counts.get(index, 0) + count
+            self.count += other.count
+            self.total += other.total
+            for val in (other.min, other.max):
+                if val is not None:
+                    self.min = val if self.min is None else min(self.min, val)
+                    self.max = val if self.max is None else max(self.max, val)
+
+
+class _Timer(object):
+    """
+    A reusable context manager that records the time spent inside it.
+    """
+    __slots__ = ('histogram', 'begin')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.begin = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.record(perf_counter() - self.begin)
+
+
+class _NullTimer(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class Metrics(object):
+    """
+    Timings and counters for each stage of a crawl.
+
+    The crawler times `encode` (building a query's url), `throttle` (waiting on the rate
+    limit), `fetch`, `parse` and `store` (recording what was fetched), and counts responses
+    by status. Anything else can be timed or counted under its own name.
+
+    Attributes
+    ----------
+    histograms: dict
+        The Histogram of the durations of each stage, by name.
+    counters: Counter
+        The counts of events, by name.
+
+    Methods
+    -------
+    timer(stage)
+        Get a context manager that times a stage.
+    observe(stage, seconds)
+        Record a duration for a stage.
+    count(name, n=1)
+        Add to a counter.
+    export()
+        Get the histograms and counters as plain data.
+    summary()
+        Get a table of the latency and throughput of each stage.
+    """
+    def __init__(self):
+        self.histograms = {}
+        self.counters = Counter()
+        self._began = perf_counter()
+        self._lock = threading.Lock()
+
+    def histogram(self, stage):
+        """
+        Parameters
+        ----------
+        stage: str
+
+        Returns
+        -------
+        Histogram
+            The histogram of a stage, created the first time it is asked for.
+        """
+        try:
+            return self.histograms[stage]
+        except KeyError:
+            with self._lock:
+                return self.histograms.setdefault(stage, Histogram())
+
+    def timer(self, stage):
+        """
+        Parameters
+        ----------
+        stage: str
+
+        Returns
+        -------
+        context manager
+            Records the time spent inside it for the stage. Works around awaits as well,
+            where it measures the wall time including any waiting.
+        """
+        return _Timer(self.histogram(stage))
+
+    def observe(self, stage, seconds):
+        """
+        Parameters
+        ----------
+        stage: str
+        seconds: float
+        """
+        self.histogram(stage).record(seconds)
+
+    def count(self, name, n=1):
+        """
+        Parameters
+        ----------
+        name: str
+        n: int, optional
+            Defaults to 1.
+        """
+        with self._lock:
+            self.counters[name] += n
+
+    @property
+    def elapsed(self):
+        """
+        float: The seconds since the metrics were created.
+        """
+        return perf_counter() - self._began
+
+    def export(self):
+        """
+        Returns
+        -------
+        dict
+            'elapsed', 'counters', and 'histograms' with the count, sum, min, max, p50, p99
+            and (upper bound, count) buckets of each stage, ready for JSON.
+        """
+        histograms = {}
+        for stage, hist in sorted(self.histograms.items()):
+            histograms[stage] = {'count' : hist.count, 'sum' : hist.total, 'min' : hist.min, 'max' : hist.max,
+                                 'p50' : hist.percentile(50), 'p99' : hist.percentile(99),
+                                 'buckets' : hist.buckets()}
+        return {'elapsed' : self.elapsed, 'counters' : dict(self.counters), 'histograms' : histograms}
+
+    def summary(self):
+        """
+        Returns
+        -------
+        str
+            A table of each stage's count, p50 and p99 latency in milliseconds, the total
+            seconds spent in it, and its throughput over the whole run, followed by the counters.
+        """
+        elapsed = self.elapsed
+        lines = ['%-10s %8s %10s %10s %10s %10s'%('stage', 'count', 'p50 ms', 'p99 ms', 'total s', 'per s')]
+        stages = [stage for stage in STAGES if stage in self.histograms]
+        stages += sorted(stage for stage in self.histograms if stage not in STAGES)
+        for stage in stages:
+            hist = self.histograms[stage]
+            if not hist.count:
+                continue
+            lines.append('%-10s %8i %10.3f %10.3f %10.3f %10.1f'%(stage, hist.count, hist.percentile(50)*1e3,
+                                                                    hist.percentile(99)*1e3, hist.total,
+                                                                    hist.count/elapsed))
+        lines.append('elapsed %.3f s'%elapsed)
+        for name, count in sorted(self.counters.items()):
+            lines.append('%s: %i'%(name, count))
+        return '\n'.join(lines)
+
+
+class NullMetrics(object):
+    """
+    Metrics that record nothing, for when a crawl isn't instrumented.
+    """
+    _timer = _NullTimer()
+
+    def timer(self, stage):
+        return self._timer
+
+    def observe(self, stage, seconds):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+
+NO_METRICS = NullMetrics()
+
+
+class SamplingProfiler(object):
+    """
+    A sampling profiler that writes collapsed stacks, the input format of flamegraph.pl,
+    speedscope and inferno.
+
+    A background thread samples the stack of every other thread at an interval, so the
+    overhead is the same however deep or busy the profiled code is. Use it as a context
+    manager around the code to profile::
+
+        with SamplingProfiler('crawl.folded'):
+            crawl(queries)
+
+    Attributes
+    ----------
+    path: str
+        The file the collapsed stacks are written to when the profiler stops.
+    interval: float
+        The seconds between samples.
+    samples: Counter
+        The number of samples of each collapsed stack.
+
+    Methods
+    -------
+    start()
+        Start sampling.
+    stop()
+        Stop sampling and write the collapsed stacks.
+    """
+    def __init__(self, path, interval=0.005):
+        """
+        Parameters
+        ----------
+        path: str
+        interval: float, optional
+            The seconds between samples. Defaults to 5 ms.
+        """
+        self.path = path
+        self.interval = interval
+        self.samples = Counter()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            raise RuntimeError("The profiler is already running.")
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='SamplingProfiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+        self.write(self.path)
+
+    def write(self, path):
+        """
+        Write the collapsed stacks, one 'frame;frame;frame count' line per stack.
+
+        Parameters
+        ----------
+        path: str
+        """
+        with open(path, 'w', encoding='utf-8') as out:
+            for stack, count in sorted(self.samples.items()):
+                out.write('%s %i\n'%(stack, count))
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stopping.wait(self.interval):
+            threads = {thread.ident : thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                self.samples[self._collapse(threads.get(ident, 'thread'), frame, names)] += 1
+
+    @staticmethod
+    def _collapse(thread_name, frame, names):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            try:
+                stack.append(names[code])
+            except KeyError:
+                name = names[code] = '%s (%s:%i)'%(code.co_name, os.path.basename(code.co_filename),
+                                                   code.co_firstlineno)
+                stack.append(name)
+            frame = frame.f_back
+        stack.append(thread_name)
+        return ';'.join(reversed(stack))
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+@contextmanager
+def profile(path=None, interval=0.005):
+    """
+    Sample a block of code into a collapsed stack file, if given a path.
+
+    Parameters
+    ----------
+    path: str, optional
+        Where to write the collapsed stacks. Defaults to None, which doesn't profile.
+    interval: float, optional
+        The seconds between samples. Defaults to 5 ms.
+    """
+    if path is None:
+        yield None
+        return
+    with SamplingProfiler(path, interval) as profiler:
+        yield profiler
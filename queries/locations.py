@@ -0,0 +1,390 @@
+import math
+import os
+import re
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
+
+from .query import find_arg
+from .planner import FetchPlan, LocalFilter, ORDER_ARG_NAMES
+
+#The gazetteer that ships with the package: US states, larger cities, and 'Remote'.
+DEFAULT_GAZETTEER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gazetteer.tsv')
+
+#The radius Indeed searches when a query doesn't set one, in miles.
+DEFAULT_RADIUS = 25
+
+EARTH_RADIUS_MILES = 3958.8
+
+_zip_code = re.compile(r'\s+\d{5}(?:-\d{4})?$')
+_country = re.compile(r',\s*(?:us|usa|united states)$')
+_spaces = re.compile(r'\s+')
+
+
+class Place(namedtuple('Place', ('name', 'region', 'country', 'latitude', 'longitude', 'population'))):
+    """
+    A row of a gazetteer.
+
+    Attributes
+    ----------
+    name: str
+    region: str
+        The region code, like a state's 'NY', or '' for a region itself.
+    country: str
+    latitude: float
+        None for a place without coordinates, like 'Remote'.
+    longitude: float
+    population: int
+    """
+    __slots__ = ()
+
+    @property
+    def canonical(self):
+        """
+        str: The form Indeed uses for the place, like 'New York, NY' or 'California'.
+        """
+        return '%s, %s'%(self.name, self.region) if self.region else self.name
+
+
+def location_key(text):
+    """
+    Get the form of a location that gazetteer names are matched in: lower case, without
+    periods, a trailing zip code or country, and with single spaces after commas.
+
+    Parameters
+    ----------
+    text: str
+
+    Returns
+    -------
+    str
+    """
+    text = _spaces.sub(' ', text.lower().replace('.', '')).strip()
+    text = _country.sub('', _zip_code.sub('', text))
+    return ', '.join(part.strip() for part in text.split(',') if part.strip())
+
+
+def distance(latitude, longitude, other_latitude, other_longitude):
+    """
+    Get the great circle distance between two points with the haversine formula.
+
+    Parameters
+    ----------
+    latitude: float
+    longitude: float
+    other_latitude: float
+    other_longitude: float
+
+    Returns
+    -------
+    float
+        The distance in miles.
+    """
+    lat, other_lat = math.radians(latitude), math.radians(other_latitude)
+    half_dlat = (other_lat - lat)/2
+    half_dlon = math.radians(other_longitude - longitude)/2
+    a = math.sin(half_dlat)**2 + math.cos(lat)*math.cos(other_lat)*math.sin(half_dlon)**2
+    return 2*EARTH_RADIUS_MILES*math.asin(min(1.0, math.sqrt(a)))
+
+
+class DistanceFilter(object):
+    """
+    Keeps the records located within a distance of a point, for recovering the results of
+    a query from those of a wider query around a nearby place.
+
+    Attributes
+    ----------
+    latitude: float
+    longitude: float
+    miles: float
+    normalizer: LocationNormalizer
+        Locates each record's 'location'. Records at a place that isn't a point, like
+        'Remote' or a whole state, are kept, since the site can't have ruled them out by
+        distance either. Records without a location, or with one missing from the
+        gazetteer, are dropped, since they can't be told to be inside the distance.
+    """
+    def __init__(self, latitude, longitude, miles, normalizer):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.miles = miles
+        self.normalizer = normalizer
+
+    def __call__(self, record):
+        """
+        Parameters
+        ----------
+        record: dict
+
+        Returns
+        -------
+        bool
+            True if the record's location is within the distance, or is a known place
+            that isn't a point.
+        """
+        location = record.get('location')
+        place = self.normalizer.lookup(location) if location else None
+        if place is None:
+            return False
+        if place.latitude is None or not place.region:
+            return True
+        return distance(self.latitude, self.longitude, place.latitude, place.longitude) <= self.miles
+
+    def __bool__(self):
+        return True
+
+    def __repr__(self):
+        return 'DistanceFilter(%r, %r, %r)'%(self.latitude, self.longitude, self.miles)
+
+
+class LocationNormalizer(object):
+    """
+    Maps free form locations to the canonical places of an offline gazetteer.
+
+    The gazetteer is a tab separated file with a row for each place: its name, region
+    code, country, latitude, longitude, population, and any comma separated aliases.
+    Lines starting with '#' are skipped. A place is matched by its name or an alias,
+    alone or followed by its region's code or name, like 'NYC', 'New York, NY' or 'New
+    York City, New York', and a name that more than one place has goes to the most
+    populous.
+
+    The matching keys are kept sorted in a list, next to an array of the places they
+    map to, which a binary search looks up and walks for prefixes. Lookups are memoized
+    in an LRU cache, since a batch of queries repeats the same few locations.
+
+    Attributes
+    ----------
+    path: str
+        The path of the gazetteer.
+    places: list[Place]
+        Every place in the gazetteer, by their order in it.
+    radius_arg_name: str
+    where_arg_name: str
+
+    Methods
+    -------
+    lookup(text)
+        Get the place of a location.
+    normalize(text)
+        Get the canonical form of a location.
+    complete(prefix, limit=10)
+        Get the places whose names start with a prefix.
+    canonical_query(query)
+        Get a copy of a query with its location in canonical form.
+    plan(queries)
+        Get the fetch plan that covers queries around nearby places with fewer queries.
+    """
+    def __init__(self, path=DEFAULT_GAZETTEER, memo_size=65536, where_arg_name='l', radius_arg_name='radius'):
+        """
+        Parameters
+        ----------
+        path: str, optional
+            The path of the gazetteer. Defaults to the one shipped with the package.
+        memo_size: int, optional
+            The locations kept in the LRU cache of lookups. Defaults to 65536.
+        where_arg_name: str, optional
+            The arg_name of a query's location. Defaults to 'l'.
+        radius_arg_name: str, optional
+            The arg_name of a query's radius in miles. Defaults to 'radius'.
+        """
+        self.path = path
+        self.where_arg_name = where_arg_name
+        self.radius_arg_name = radius_arg_name
+        self.places = []
+        with open(path, encoding='utf-8') as gazetteer:
+            for line in gazetteer:
+                if not line.strip() or line.startswith('#'):
+                    continue
+                fields = line.rstrip('\n').split('\t')
+                fields += [''] * (7 - len(fields))
+                name, region, country, latitude, longitude, population, aliases = fields[:7]
+                self.places.append((Place(name, region, country, float(latitude) if latitude else None,
+                                          float(longitude) if longitude else None, int(population or 0)),
+                                    [alias.strip() for alias in aliases.split(',') if alias.strip()]))
+
+        #A region's code and name both match it in the second part of a location.
+        region_names = {}
+        for place, aliases in self.places:
+            if not place.region:
+                for alias in aliases:
+                    region_names.setdefault(alias, []).append(place.name)
+
+        best = {}
+        for index, (place, aliases) in enumerate(self.places):
+            names = [location_key(name) for name in [place.name] + aliases]
+            keys = set(names)
+            if place.region:
+                for region in [place.region] + region_names.get(place.region, []):
+                    region = location_key(region)
+                    keys.update('%s, %s'%(name, region) for name in names)
+            for key in keys:
+                if key not in best or place.population > self.places[best[key]][0].population:
+                    best[key] = index
+        self._keys = sorted(best)
+        self._indexes = array('I', [best[key] for key in self._keys])
+        self.places = [place for place, _ in self.places]
+        self.lookup = lru_cache(maxsize=memo_size)(self._lookup)
+
+    def __len__(self):
+        return len(self.places)
+
+    def _lookup(self, text):
+        """
+        Get the place of a location.
+
+        Parameters
+        ----------
+        text: str
+
+        Returns
+        -------
+        Place
+            The place, or None if the gazetteer doesn't have it.
+        """
+        key = location_key(text)
+        keys = self._keys
+        pos = bisect_left(keys, key)
+        if pos < len(keys) and keys[pos] == key:
+            return self.places[self._indexes[pos]]
+        return None
+
+    def normalize(self, text):
+        """
+        Parameters
+        ----------
+        text: str
+
+        Returns
+        -------
+        str
+            The canonical form of the location's place, like 'New York, NY', or the
+            location with its spaces tidied if the gazetteer doesn't have it.
+        """
+        place = self.lookup(text)
+        return place.canonical if place is not None else _spaces.sub(' ', text).strip()
+
+    def complete(self, prefix, limit=10):
+        """
+        Parameters
+        ----------
+        prefix: str
+        limit: int, optional
+            The most places to get. Defaults to 10.
+
+        Returns
+        -------
+        list[Place]
+            The places with a name or alias starting with the prefix, most populous first.
+        """
+        prefix = location_key(prefix)
+        keys = self._keys
+        found = set()
+        pos = bisect_left(keys, prefix)
+        while pos < len(keys) and keys[pos].startswith(prefix):
+            found.add(self._indexes[pos])
+            pos += 1
+        return sorted((self.places[index] for index in found), key=lambda place: -place.population)[:limit]
+
+    def canonical_query(self, query):
+        """
+        Parameters
+        ----------
+        query: Query
+
+        Returns
+        -------
+        Query
+            The query itself if its location is already canonical or unset, otherwise a
+            copy with the canonical location, so equal places encode to the same url.
+        """
+        name = find_arg(query, self.where_arg_name)
+        val = query.arg_value(name) if name is not None else None
+        if not isinstance(val, str):
+            return query
+        canonical = self.normalize(val)
+        return query if canonical == val else query.copy(**{name : canonical})
+
+    def _area(self, query):
+        """
+        Get the place and radius a query searches, or None if it can't be located. A
+        region like 'California' is searched as a whole rather than around its centroid,
+        so it isn't located either.
+        """
+        name = find_arg(query, self.where_arg_name)
+        place = self.lookup(query.arg_value(name)) if name is not None and query.arg_value(name) else None
+        if place is None or place.latitude is None or not place.region:
+            return None
+        radius_name = find_arg(query, self.radius_arg_name)
+        radius = query.arg_value(radius_name) if radius_name is not None else None
+        return place, (DEFAULT_RADIUS if radius is None else radius), radius_name
+
+    def _group_key(self, query):
+        return (type(query), query.base_url) + tuple(
+            query.arg_value(name) for name, arg in query._args.items()
+            if arg.arg_name not in ORDER_ARG_NAMES and arg.arg_name not in (self.where_arg_name, self.radius_arg_name))
+
+    def plan(self, queries):
+        """
+        Get the fetch plan that covers queries around nearby places with fewer queries.
+
+        Every location is made canonical first, so the same place written differently
+        is fetched once. Then a query whose whole circle lies inside the circle of
+        another query, with every other argument the same, is recovered from that
+        query's results with a DistanceFilter on the records' locations. That holds when
+        the distance between the two places plus the smaller radius is within the
+        larger radius. The records have to carry a 'location', like those of
+        `Crawler.search_records`: records at a known place that isn't a point are kept
+        for every query recovered this way, and records that can't be located are
+        dropped. Queries for a whole region, and queries at different offsets, are only
+        merged when their urls are the same.
+
+        Parameters
+        ----------
+        queries: Iterable[Query]
+
+        Returns
+        -------
+        planner.FetchPlan
+            The plan, whose `fetch` queries have canonical locations.
+        """
+        queries = list(queries)
+        canonical = [self.canonical_query(query) for query in queries]
+        groups = OrderedDict()
+        for index, query in enumerate(canonical):
+            groups.setdefault(self._group_key(query), []).append(index)
+
+        sources = [None]*len(queries)
+        filters = [None]*len(queries)
+        fetch = []
+        fetched = {}
+        for indexes in groups.values():
+            areas = {index : self._area(canonical[index]) for index in indexes}
+            #The widest circles go first, so they're the roots the others fall inside.
+            ordered = sorted(indexes, key=lambda index: -areas[index][1] if areas[index] else 0)
+            roots = []
+            for index in ordered:
+                query, area = canonical[index], areas[index]
+                url = query.url
+                if url in fetched:
+                    sources[index], filters[index] = fetched[url], LocalFilter()
+                    continue
+                root = None
+                if area is not None:
+                    place, radius, _ = area
+                    for root_index in roots:
+                        root_place, root_radius, _ = areas[root_index]
+                        if distance(root_place.latitude, root_place.longitude, place.latitude,
+                                     place.longitude) + radius <= root_radius:
+                            root = root_index
+                            break
+                if root is None:
+                    fetched[url] = len(fetch)
+                    fetch.append(query)
+                    sources[index], filters[index] = fetched[url], LocalFilter()
+                    if area is not None:
+                        roots.append(index)
+                else:
+                    place, radius, _ = area
+                    sources[index] = fetched[canonical[root].url]
+                    filters[index] = DistanceFilter(place.latitude, place.longitude, radius, self)
+        return FetchPlan(queries, fetch, sources, filters)
@@ -0,0 +1,498 @@
+import re
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+
+HEADER_TARGET = ('div', 'class', 'jobsearch-DesktopStickyContainer')
+BODY_TARGET = ('div', 'id', 'jobDescriptionText')
+APPLY_TARGET = ('div', 'id', 'applyButtonLinkContainer')
+INDEED_APPLY_TARGET = ('div', 'id', 'indeedApplyButtonContainer')
+
+_age_pattern = re.compile(r'(\d+)\+?\s*(minute|hour|day)')
+_count_pattern = re.compile(r'of\s+([\d,.]+)\s+job')
+
+
+def has_class(attrs, name):
+    """
+    Check if a tag's class attribute contains a class name.
+
+    Parameters
+    ----------
+    attrs: dict
+        The attributes of the tag.
+    name: str
+        The class name.
+
+    Returns
+    -------
+    bool
+    """
+    classes = attrs.get('class')
+    return bool(classes) and name in classes.split()
+
+
+def parse_age(text):
+    """
+    Get the age in days of a job card's date text, e.g. 'Just posted', 'Today' or '30+ days ago'.
+
+    Parameters
+    ----------
+    text: str
+
+    Returns
+    -------
+    float
+        The age in days, or None if the text isn't recognized.
+    """
+    text = text.strip().lower()
+    if text.startswith(('just posted', 'today', 'active today')):
+        return 0.0
+    match = _age_pattern.search(text)
+    if match is None:
+        return None
+    count, unit = int(match.group(1)), match.group(2)
+    if unit == 'minute':
+        return count/(24*60)
+    if unit == 'hour':
+        return count/24
+    return float(count)
+
+
+class SearchPageParser(HTMLParser):
+    """
+    A parser for the job keys and pagination of an Indeed search results page.
+
+    Attributes
+    ----------
+    job_keys: list[str]
+        The `data-jk` keys of the job cards on the page.
+    job_ages: list[float]
+        The age in days of each job card, or None if it doesn't have a recognized date.
+    job_locations: list[str]
+        The location shown on each job card, or None if it doesn't show one.
+    has_next_page: bool
+        True if the pagination has a next page link.
+    page_number: int
+        The page number highlighted in the pagination, or None if there isn't one.
+    total_count: int
+        The number of results reported in `#searchCountPages`, e.g. 'Page 1 of 1,234 jobs',
+        or None if the page doesn't say.
+    """
+    def __init__(self):
+        super(SearchPageParser, self).__init__(convert_charrefs=True)
+        self.job_keys = []
+        self.job_ages = []
+        self.job_locations = []
+        self.has_next_page = False
+        self.page_number = None
+        self.total_count = None
+        self._pagination_depth = 0
+        self._count_text = None
+        self._page_text = None
+        self._date_text = None
+        self._location_text = None
+        self._location_tag = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'div':
+            if self._pagination_depth:
+                self._pagination_depth += 1
+                return
+            attrs = dict(attrs)
+            if has_class(attrs, 'jobsearch-SerpJobCard') and attrs.get('data-jk'):
+                self.job_keys.append(attrs['data-jk'])
+                self.job_ages.append(None)
+                self.job_locations.append(None)
+            elif self.job_keys and has_class(attrs, 'location'):
+                self._location_text, self._location_tag = [], tag
+            elif has_class(attrs, 'pagination'):
+                self._pagination_depth = 1
+            elif attrs.get('id') == 'searchCountPages':
+                self._count_text = []
+        elif tag == 'span' and self.job_keys and not self._pagination_depth:
+            attrs = dict(attrs)
+            if has_class(attrs, 'date'):
+                self._date_text = []
+            elif has_class(attrs, 'location'):
+                self._location_text, self._location_tag = [], tag
+        elif self._pagination_depth:
+            if tag == 'span' and has_class(dict(attrs), 'np'):
+                self.has_next_page = True
+            elif tag == 'b' and self.page_number is None:
+                self._page_text = []
+
+    def handle_endtag(self, tag):
+        if tag == 'span' and self._date_text is not None:
+            self.job_ages[-1] = parse_age(''.join(self._date_text))
+            self._date_text = None
+        elif tag == self._location_tag and self._location_text is not None:
+            self.job_locations[-1] = ' '.join(''.join(self._location_text).split()) or None
+            self._location_text = self._location_tag = None
+        elif tag == 'div' and self._count_text is not None:
+            match = _count_pattern.search(''.join(self._count_text))
+            if match is not None:
+                self.total_count = int(match.group(1).replace(',', '').replace('.', ''))
+            self._count_text = None
+        if not self._pagination_depth:
+            return
+        if tag == 'div':
+            self._pagination_depth -= 1
+        elif tag == 'b' and self._page_text is not None:
+            try:
+                self.page_number = int(''.join(self._page_text).strip())
+            except ValueError:
+                pass
+            self._page_text = None
+
+    def handle_data(self, data):
+        if self._page_text is not None:
+            self._page_text.append(data)
+        elif self._date_text is not None:
+            self._date_text.append(data)
+        elif self._location_text is not None:
+            self._location_text.append(data)
+        elif self._count_text is not None:
+            self._count_text.append(data)
+
+
+def parse_search_page(html):
+    """
+    Parse the job keys and pagination from a search results page.
+
+    Parameters
+    ----------
+    html: str or bytes
+        The page content. Bytes are decoded as utf-8.
+
+    Returns
+    -------
+    SearchPageParser
+        The parser, with the job_keys, job_ages, job_locations, has_next_page, page_number
+        and total_count of the page.
+    """
+    if isinstance(html, bytes):
+        html = html.decode('utf-8', errors='replace')
+    parser = SearchPageParser()
+    parser.feed(html)
+    parser.close()
+    return parser
+
+
+class _StopParsing(Exception):
+    """
+    Raised inside a parser once it has everything it needs.
+    """
+
+
+class _Node(object):
+    """
+    A minimal element for the small subtrees the targeted parsers keep.
+    """
+    __slots__ = ('tag', 'attrs', 'parent', 'children')
+
+    def __init__(self, tag, attrs, parent):
+        self.tag = tag
+        self.attrs = attrs
+        self.parent = parent
+        self.children = []
+
+    @property
+    def text(self):
+        parts = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                parts.append(node)
+            else:
+                stack.extend(reversed(node.children))
+        return ''.join(parts)
+
+    def find(self, tag, class_name=None):
+        """
+        Get the first descendant with a tag, and class if given, in document order.
+        """
+        stack = list(reversed(self.children))
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                continue
+            if node.tag == tag and (class_name is None or has_class(node.attrs, class_name)):
+                return node
+            stack.extend(reversed(node.children))
+        return None
+
+
+class SubtreeParser(HTMLParser):
+    """
+    A parser that only keeps the subtrees of the first elements matching some targets,
+    and stops as soon as every target has been found and closed.
+
+    Each target is a (tag, attribute, value) where the attribute is 'class', matching any
+    one of the element's classes, or any other attribute matching exactly.
+
+    Attributes
+    ----------
+    targets: dict
+        The targets by name.
+    roots: dict
+        The matched element for each target name, or None where it wasn't found.
+    """
+    void_tags = frozenset(('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+                           'link', 'meta', 'param', 'source', 'track', 'wbr'))
+
+    def __init__(self, **targets):
+        """
+        Parameters
+        ----------
+        targets:
+            The (tag, attribute, value) of each element to keep, by name.
+        """
+        super(SubtreeParser, self).__init__(convert_charrefs=True)
+        self.targets = targets
+        self.roots = dict.fromkeys(targets)
+        self._remaining = dict(targets)
+        self._tags = frozenset(tag for tag, _, _ in targets.values())
+        self._current = None
+
+    def _match(self, tag, attrs):
+        for name, (target_tag, attribute, value) in self._remaining.items():
+            if tag != target_tag:
+                continue
+            if attrs.get(attribute) == value or (attribute == 'class' and has_class(attrs, value)):
+                return name
+        return None
+
+    def handle_starttag(self, tag, attrs):
+        if self._current is None and tag not in self._tags:
+            return
+        attrs = dict(attrs)
+        name = self._match(tag, attrs) if self._remaining else None
+        node = _Node(tag, attrs, self._current)
+        if name is not None:
+            self.roots[name] = node
+            del self._remaining[name]
+            self._tags = frozenset(tag for tag, _, _ in self._remaining.values())
+        elif self._current is None:
+            return
+        if self._current is not None:
+            self._current.children.append(node)
+        if tag not in self.void_tags:
+            self._current = node
+
+    def handle_startendtag(self, tag, attrs):
+        if self._current is not None:
+            self._current.children.append(_Node(tag, dict(attrs), self._current))
+
+    def handle_endtag(self, tag):
+        node = self._current
+        while node is not None and node.tag != tag:
+            node = node.parent
+        if node is None:
+            return
+        self._current = node.parent
+        if self._current is None and not self._remaining:
+            raise _StopParsing()
+
+    def handle_data(self, data):
+        if self._current is not None:
+            self._current.children.append(data)
+
+    def parse(self, html):
+        """
+        Feed the html until every target has been closed, or the html runs out.
+
+        Parameters
+        ----------
+        html: str or bytes
+            The page content. Bytes are decoded as utf-8.
+
+        Returns
+        -------
+        dict
+            The matched element for each target name, or None where it wasn't found.
+        """
+        if isinstance(html, bytes):
+            html = html.decode('utf-8', errors='replace')
+        try:
+            self.feed(html)
+            self.close()
+        except _StopParsing:
+            pass
+        return self.roots
+
+
+def parse_posting_header(html):
+    """
+    Get the title, company name and location from the header of a job posting.
+
+    Only the `jobsearch-DesktopStickyContainer` subtree is kept, and parsing stops as
+    soon as it is closed rather than building a tree for the whole page.
+
+    Parameters
+    ----------
+    html: str or bytes
+        The posting page content. Bytes are decoded as utf-8.
+
+    Returns
+    -------
+    dict
+        The 'title', 'company_name' and 'location' of the posting, or None if the page
+        doesn't have the expected header.
+    """
+    header = SubtreeParser(header=HEADER_TARGET).parse(html)['header']
+    return _header_fields(header)
+
+
+def _header_fields(header):
+    """
+    Get the title, company name and location from a posting's header element.
+    """
+    if header is None:
+        return None
+    title = header.find('h3', 'jobsearch-JobInfoHeader-title')
+    subtitle = header.find('div', 'jobsearch-JobInfoHeader-subtitle')
+    if title is None or subtitle is None:
+        return None
+    company_link = subtitle.find('a')
+    if company_link is None:
+        return None
+
+    company_link_div = company_link.parent
+    while company_link_div is not None and company_link_div.tag != 'div':
+        company_link_div = company_link_div.parent
+    location = None
+    if company_link_div is not None and company_link_div.parent is not None:
+        siblings = company_link_div.parent.children
+        following = siblings[siblings.index(company_link_div) + 1:]
+        divs = [node for node in following if not isinstance(node, str) and node.tag == 'div']
+        if divs:
+            location = divs[-1].text
+    return {
+        'title' : title.text,
+        'company_name' : company_link.text,
+        'location' : location
+    }
+
+
+def _sections(body):
+    """
+    Split a posting body into sections at each bold heading, with the text of each
+    `<li>` and `<p>`, or loose line of text, as the section's items.
+    """
+    sections = [{'heading' : None, 'items' : []}]
+    
+    def add_item(text):
+        text = ' '.join(text.split())
+        if text:
+            sections[-1]['items'].append(text)
+    
+    def walk(node):
+        for child in node.children:
+            if isinstance(child, str):
+                add_item(child)
+            elif child.tag in ('b', 'strong'):
+                heading = ' '.join(child.text.split())
+                if heading:
+                    sections.append({'heading' : heading.rstrip(':'), 'items' : []})
+            elif child.tag == 'li':
+                add_item(child.text)
+            elif child.tag == 'p' and child.find('b') is None and child.find('strong') is None:
+                add_item(child.text)
+            else:
+                walk(child)
+    
+    if body is not None:
+        walk(body)
+    return [section for section in sections if section['heading'] or section['items']]
+
+
+def parse_posting(html):
+    """
+    Get the header fields, body sections and apply link of a job posting in one pass.
+
+    Parameters
+    ----------
+    html: str or bytes
+        The posting page content. Bytes are decoded as utf-8.
+
+    Returns
+    -------
+    dict
+        The 'title', 'company_name' and 'location' of the header, the 'sections' of the
+        body as a list of {'heading', 'items'}, the 'apply_type' ('indeed' for Apply Now
+        on Indeed, 'company' for a link to the company's site, or None), and the
+        'apply_url' for a company link. None if the page doesn't have the expected header.
+    """
+    roots = SubtreeParser(header=HEADER_TARGET, body=BODY_TARGET, apply=APPLY_TARGET,
+                          indeed_apply=INDEED_APPLY_TARGET).parse(html)
+    record = _header_fields(roots['header'])
+    if record is None:
+        return None
+    record['sections'] = _sections(roots['body'])
+    record['apply_type'] = None
+    record['apply_url'] = None
+    if roots['indeed_apply'] is not None:
+        record['apply_type'] = 'indeed'
+    elif roots['apply'] is not None:
+        link = roots['apply'].find('a')
+        if link is not None and link.attrs.get('href'):
+            record['apply_type'] = 'company'
+            record['apply_url'] = link.attrs['href']
+    return record
+
+
+def _read_and_parse(args):
+    """
+    Read a stored page and parse it. Defined at the module level so it can be pickled.
+    """
+    path, parse = args
+    with open(path, 'rb') as page:
+        return parse(page.read())
+
+
+def parse_pages(pages, parse=parse_posting_header, max_workers=None, chunksize=16):
+    """
+    Parse many pages across processes.
+
+    Parameters
+    ----------
+    pages: Iterable[str or bytes]
+        The page contents.
+    parse: callable, optional
+        A module level function that parses a single page. Defaults to parse_posting_header.
+    max_workers: int, optional
+        The number of processes. Defaults to the number of cores.
+    chunksize: int, optional
+        The number of pages sent to a process at a time. Defaults to 16.
+
+    Returns
+    -------
+    list
+        The parsed result of each page, in the same order as the pages.
+    """
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(parse, pages, chunksize=chunksize))
+
+
+def parse_files(paths, parse=parse_posting_header, max_workers=None, chunksize=16):
+    """
+    Parse many stored pages across processes, with each page read in its worker.
+
+    Parameters
+    ----------
+    paths: Iterable[str]
+        The paths of the stored pages.
+    parse: callable, optional
+        A module level function that parses a single page. Defaults to parse_posting_header.
+    max_workers: int, optional
+        The number of processes. Defaults to the number of cores.
+    chunksize: int, optional
+        The number of pages sent to a process at a time. Defaults to 16.
+
+    Returns
+    -------
+    list
+        The parsed result of each page, in the same order as the paths.
+    """
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_read_and_parse, ((path, parse) for path in paths), chunksize=chunksize))
@@ -0,0 +1,292 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, List, Optional
+
+from .crawler import page_size
+from .query import find_arg
+
+#Arguments whose choices split results into disjoint sets, by arg_name, in the order they are tried.
+DISJOINT = ('jt', 'explvl')
+
+#Arguments whose choices are nested, widest first, by arg_name, with the value that
+#leaving them unset means. A narrower choice only ever holds a subset of the results.
+NESTED = {
+    'radius' : ((100, 50, 25, 15, 10, 5, 0), 25),
+    'fromage' : (('any', 15, 7, 3, 1), 'any'),
+}
+
+
+@dataclass
+class Partition:
+    """
+    A part of a query's results, and how it was covered.
+
+    Attributes
+    ----------
+    query: Query
+        The query of the partition.
+    count: int
+        The number of results the site reports for the query, or None if it doesn't say.
+    status: str
+        'complete' if every page was walked, 'truncated' if the pages were walked up to
+        the cap and the rest can't be reached, 'split' if only the children were walked, or
+        'failed' if one of its pages couldn't be fetched, so the results on it and any
+        after it are missing.
+    split_on: str
+        The name of the argument the children split the query on, or None.
+    job_keys: list[str]
+        The job keys found on the partition's own pages.
+    fetches: int
+        The pages read for the partition itself, including probes of narrower queries. A
+        crawler with a window over 1 also fetches a page past the last, which isn't counted.
+    residual: int
+        For a split on disjoint choices, the results the parent reports that no child does,
+        like postings without a job type.
+    children: list[Partition]
+    """
+    query : Any
+    count : Optional[int] = None
+    status : str = 'complete'
+    split_on : Optional[str] = None
+    job_keys : List[str] = field(default_factory=list)
+    fetches : int = 0
+    residual : int = 0
+    children : List['Partition'] = field(default_factory=list)
+
+    def walk(self):
+        """
+        Iterate over the partition and every partition under it, depth first.
+        """
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def all_job_keys(self):
+        """
+        Returns
+        -------
+        list[str]
+            The unique job keys of the partition and every partition under it, in the
+            order they were found.
+        """
+        return list(dict.fromkeys(key for part in self.walk() for key in part.job_keys))
+
+    def coverage(self):
+        """
+        Returns
+        -------
+        dict
+            'reported', the results the site reports for the query; 'found', the unique
+            job keys found; 'coverage', found over reported; 'fetches', every page fetched;
+            'partitions', the partitions walked; 'truncated', the partitions that were
+            still over the cap; 'failed', the partitions with a page that failed; and
+            'residual', the results no disjoint choice reports.
+        """
+        parts = list(self.walk())
+        found = len(self.all_job_keys())
+        return {
+            'reported' : self.count,
+            'found' : found,
+            'coverage' : found/self.count if self.count else 1.0,
+            'fetches' : sum(part.fetches for part in parts),
+            'partitions' : sum(part.status in ('complete', 'truncated') for part in parts),
+            'failed' : sum(part.status == 'failed' for part in parts),
+            'truncated' : sum(part.status == 'truncated' for part in parts),
+            'residual' : sum(part.residual for part in parts),
+        }
+
+    def report(self):
+        """
+        Returns
+        -------
+        str
+            The coverage summary followed by a line for each partition, indented under
+            its parent.
+        """
+        stats = self.coverage()
+        lines = ["found %(found)i of %(reported)s reported results (%(coverage).1f%%) with %(fetches)i fetches, "
+                 "%(partitions)i partitions walked, %(truncated)i truncated, %(failed)i failed, %(residual)i "
+                 "results in no partition"%dict(stats, coverage=stats['coverage']*100)]
+
+        def add(part, depth):
+            label = '%s=%r'%(part.split_on, part.query.arg_value(part.split_on)) if depth else 'query'
+            lines.append("%s%-*s %8s reported %6i found %4i fetches  %s%s"%(
+                '  '*depth, 32 - 2*depth, label, part.count, len(part.job_keys), part.fetches, part.status,
+                '  (%i in no child)'%part.residual if part.residual else ''))
+            for child in part.children:
+                add(child, depth + 1)
+        add(self, 0)
+        return '\n'.join(lines)
+
+
+class Partitioner(object):
+    """
+    Covers the results of queries that have more results than the site will page through.
+
+    The first page of a query gives its reported result count. A query within the cap
+    has its pages walked as usual. A query over the cap is split on the first argument
+    that it leaves unset among the disjoint ones, like `job_type` and `experience`, with
+    a child query for each choice, and each child over the cap is split again on the
+    arguments after it. Only the first page of a query that gets split is fetched, so the
+    pages walked are those of the largest partitions that fit.
+
+    Once the disjoint arguments run out, a nested argument like `radius` or `age` is
+    narrowed, one choice at a time, to the widest choice that fits, which is walked
+    along with the capped pages of the query itself. A narrower choice only holds a
+    subset of the results, so this improves coverage without making it complete, and
+    the partitions it leaves are reported as truncated.
+
+    Attributes
+    ----------
+    crawler: Crawler
+        Fetches the pages, with its rate limits, retries and metrics.
+    cap: int
+        The most results the site pages through for a query.
+    disjoint: tuple[str]
+        The arg_names of the disjoint arguments to split on, in order.
+    nested: dict
+        The widest first choices, and the unset value, of each nested argument to narrow,
+        by arg_name, in order.
+
+    Methods
+    -------
+    partition(query)
+        Cover the results of a query, splitting it as needed.
+    job_keys(query)
+        Get the unique job keys of every partition of a query.
+    """
+    def __init__(self, crawler, cap=1000, disjoint=DISJOINT, nested=None):
+        """
+        Parameters
+        ----------
+        crawler: Crawler
+        cap: int, optional
+            The most results the site pages through for a query. Defaults to 1000.
+        disjoint: tuple[str], optional
+            Defaults to `job_type` and `experience`.
+        nested: dict, optional
+            Defaults to `radius` and then `age`.
+        """
+        self.crawler = crawler
+        self.cap = cap
+        self.disjoint = tuple(disjoint)
+        self.nested = dict(NESTED if nested is None else nested)
+
+    @staticmethod
+    def _failed(page):
+        return not 200 <= page.status < 300
+
+    def _fits(self, page):
+        return page.total_count is None or page.total_count <= self.cap
+
+    async def _walk(self, part, first):
+        """
+        Walk the pages of a partition after its first page, up to the cap.
+        """
+        part.job_keys.extend(first.job_keys)
+        if not first.has_next:
+            return
+        step = page_size(part.query)
+        start = (part.query.start or 0) + step
+        if start >= self.cap:
+            return
+        async for page in self.crawler.pages(part.query.copy(start=start)):
+            part.fetches += 1
+            if self._failed(page):
+                part.status = 'failed'
+                break
+            part.job_keys.extend(page.job_keys)
+            if page.query.start + step >= self.cap:
+                break
+
+    async def _probe(self, query, split_on):
+        page = await self.crawler.fetch_page(query)
+        return Partition(query, page.total_count, split_on=split_on, fetches=1), page
+
+    async def _cover(self, part, first, arg_names):
+        """
+        Cover a partition from its first page with the splits in arg_names.
+        """
+        if self._failed(first):
+            part.status = 'failed'
+            return
+        if self._fits(first):
+            part.status = 'complete'
+            await self._walk(part, first)
+            return
+        for index, arg_name in enumerate(arg_names):
+            name = find_arg(part.query, arg_name)
+            if name is None:
+                continue
+            rest = arg_names[index + 1:]
+            if arg_name in self.nested:
+                choices, unset = self.nested[arg_name]
+                current = part.query.arg_value(name)
+                current = unset if current is None else current
+                narrower = choices[choices.index(current) + 1:] if current in choices else ()
+                if narrower:
+                    await self._narrow(part, first, name, narrower, rest)
+                    return
+            elif part.query.arg_value(name) is None:
+                await self._split(part, first, name, rest)
+                return
+        part.status = 'truncated'
+        await self._walk(part, first)
+
+    async def _split(self, part, first, name, rest):
+        part.status = 'split'
+        part.job_keys.extend(first.job_keys)
+        choices = part.query._args[name].choices
+        probes = await asyncio.gather(*(self._probe(part.query.copy(**{name : choice}), name) for choice in choices))
+        part.children = [child for child, _ in probes]
+        if part.count is not None:
+            part.residual = max(0, part.count - sum(child.count or 0 for child in part.children))
+        await asyncio.gather(*(self._cover(child, page, rest) for child, page in probes))
+
+    async def _narrow(self, part, first, name, narrower, rest):
+        part.status = 'truncated'
+        walked = asyncio.ensure_future(self._walk(part, first))
+        try:
+            for choice in narrower:
+                child, page = await self._probe(part.query.copy(**{name : choice}), name)
+                if self._fits(page) or choice == narrower[-1]:
+                    part.children.append(child)
+                    await self._cover(child, page, rest)
+                    break
+                #Too wide; its first page still counts toward the parent.
+                part.fetches += 1
+                part.job_keys.extend(page.job_keys)
+        finally:
+            await walked
+
+    async def partition(self, query):
+        """
+        Cover the results of a query, splitting it as needed.
+
+        Parameters
+        ----------
+        query: Query
+            A query with a `start` argument. The query itself isn't modified.
+
+        Returns
+        -------
+        Partition
+            The query's partition, with the partitions it was split into as children,
+            see `Partition.report` for its coverage.
+        """
+        part, first = await self._probe(query, None)
+        await self._cover(part, first, self.disjoint + tuple(self.nested))
+        return part
+
+    async def job_keys(self, query):
+        """
+        Parameters
+        ----------
+        query: Query
+
+        Returns
+        -------
+        list[str]
+            The unique job keys of every partition of the query.
+        """
+        return (await self.partition(query)).all_job_keys()
@@ -0,0 +1,285 @@
+import csv
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .indeed import posting_url
+from .instrument import NO_METRICS
+from .parsers import parse_posting
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+#The columns of a parsed posting record, with the sections stored as JSON.
+RECORD_FIELDS = ('job_key', 'title', 'company_name', 'location', 'apply_type', 'apply_url', 'sections')
+
+
+def pages_from_files(paths):
+    """
+    Read stored posting pages, named by their job keys.
+
+    Parameters
+    ----------
+    paths: Iterable[str]
+        The paths of the pages, e.g. '<job key>.html'.
+
+    Yields
+    ------
+    tuple[str, bytes]
+        The job key and content of each page.
+    """
+    for path in paths:
+        with open(path, 'rb') as page:
+            yield os.path.splitext(os.path.basename(path))[0], page.read()
+
+
+def pages_from_cache(cache, job_keys):
+    """
+    Read fetched posting pages out of a ResponseCache, skipping any that aren't cached.
+
+    Parameters
+    ----------
+    cache: ResponseCache
+    job_keys: Iterable[str]
+
+    Yields
+    ------
+    tuple[str, bytes]
+        The job key and content of each page.
+    """
+    for key in job_keys:
+        response, _ = cache.get(posting_url(key))
+        if response is not None and response.ok:
+            yield key, response.body
+
+
+def _parse_chunk(args):
+    """
+    Parse a chunk of pages in a worker process. Defined at the module level so it can be pickled.
+    """
+    parse, chunk = args
+    return [(key, parse(page)) for key, page in chunk]
+
+
+def _chunks(pages, size):
+    chunk = []
+    for page in pages:
+        chunk.append(page)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def parse_records(pages, parse=parse_posting, processes=0, chunksize=64, metrics=None):
+    """
+    Parse pages into posting records, lazily.
+
+    With processes, chunks of pages are parsed across a process pool, with only a couple
+    of chunks per process in flight at once so the memory stays bounded however many
+    pages there are.
+
+    Parameters
+    ----------
+    pages: Iterable[tuple[str, bytes]]
+        The job key and content of each page.
+    parse: callable, optional
+        A module level function that parses a page into a dict. Defaults to parse_posting.
+    processes: int, optional
+        The number of worker processes, or 0 to parse in this process. Defaults to 0.
+    chunksize: int, optional
+        The number of pages sent to a process at a time. Defaults to 64.
+    metrics: Metrics, optional
+        Records the time spent parsing each page under 'parse', or with processes, the time
+        spent waiting on each chunk under 'parse wait'. Defaults to None.
+
+    Yields
+    ------
+    dict
+        The record of each page that parsed, with its 'job_key', in the same order as the pages.
+    """
+    metrics = metrics if metrics is not None else NO_METRICS
+    if not processes:
+        for key, page in pages:
+            with metrics.timer('parse'):
+                record = parse(page)
+            if record is not None:
+                record['job_key'] = key
+                yield record
+        return
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        pending = deque()
+        chunks = _chunks(pages, chunksize)
+        while True:
+            for chunk in chunks:
+                pending.append(executor.submit(_parse_chunk, (parse, chunk)))
+                if len(pending) >= 2*processes:
+                    break
+            if not pending:
+                break
+            with metrics.timer('parse wait'):
+                results = pending.popleft().result()
+            for key, record in results:
+                if record is not None:
+                    record['job_key'] = key
+                    yield record
+
+
+def _row(record, fields):
+    row = []
+    for name in fields:
+        val = record.get(name)
+        row.append(json.dumps(val) if isinstance(val, (list, dict)) else val)
+    return row
+
+
+class CsvSink(object):
+    """
+    Writes records to numbered CSV files, starting a new file every chunk_rows records.
+
+    Attributes
+    ----------
+    prefix: str
+        The files are written to '<prefix>-00000.csv', '<prefix>-00001.csv' and so on.
+    chunk_rows: int
+        The records per file.
+    fields: tuple[str]
+        The columns. Lists and dicts, like the sections, are written as JSON.
+    paths: list[str]
+        The files written so far.
+    """
+    def __init__(self, prefix, chunk_rows=100000, fields=RECORD_FIELDS):
+        self.prefix = prefix
+        self.chunk_rows = chunk_rows
+        self.fields = fields
+        self.paths = []
+        self._file = None
+        self._writer = None
+        self._rows = 0
+
+    def write(self, record):
+        """
+        Parameters
+        ----------
+        record: dict
+        """
+        if self._file is None or self._rows == self.chunk_rows:
+            self._open_next()
+        self._writer.writerow(_row(record, self.fields))
+        self._rows += 1
+
+    def _open_next(self):
+        self.close()
+        path = '%s-%05i.csv'%(self.prefix, len(self.paths))
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self.fields)
+        self._rows = 0
+        self.paths.append(path)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ParquetSink(object):
+    """
+    Writes records to a Parquet file in row groups of batch_rows records. Needs pyarrow.
+
+    Attributes
+    ----------
+    path: str
+    batch_rows: int
+        The records buffered before writing a row group.
+    fields: tuple[str]
+        The columns. Lists and dicts, like the sections, are written as JSON strings.
+    """
+    def __init__(self, path, batch_rows=10000, fields=RECORD_FIELDS):
+        if pyarrow is None:
+            raise ImportError("Writing Parquet needs pyarrow; use a CsvSink without it.")
+        self.path = path
+        self.batch_rows = batch_rows
+        self.fields = fields
+        self._schema = pyarrow.schema([(name, pyarrow.string()) for name in fields])
+        self._writer = pyarrow.parquet.ParquetWriter(path, self._schema)
+        self._columns = [[] for _ in fields]
+
+    def write(self, record):
+        """
+        Parameters
+        ----------
+        record: dict
+        """
+        for column, val in zip(self._columns, _row(record, self.fields)):
+            column.append(val)
+        if len(self._columns[0]) >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        if self._columns[0]:
+            arrays = [pyarrow.array(column, pyarrow.string()) for column in self._columns]
+            self._writer.write_table(pyarrow.Table.from_arrays(arrays, schema=self._schema))
+            self._columns = [[] for _ in self.fields]
+
+    def close(self):
+        if self._writer is not None:
+            self.flush()
+            self._writer.close()
+            self._writer = None
+
+
+def columnar_sink(path, rows=10000, fields=RECORD_FIELDS):
+    """
+    Get a ParquetSink for a '.parquet' path when pyarrow is installed, otherwise a CsvSink
+    writing files prefixed by the path without its extension.
+
+    Parameters
+    ----------
+    path: str
+    rows: int, optional
+        The records per row group, or per CSV file. Defaults to 10000.
+    fields: tuple[str], optional
+        The columns. Defaults to RECORD_FIELDS.
+
+    Returns
+    -------
+    CsvSink or ParquetSink
+    """
+    if path.endswith('.parquet') and pyarrow is not None:
+        return ParquetSink(path, rows, fields)
+    return CsvSink(os.path.splitext(path)[0], rows, fields)
+
+
+def write_records(records, sink, metrics=None):
+    """
+    Write records to a sink as they arrive, then close it.
+
+    Parameters
+    ----------
+    records: Iterable[dict]
+    sink: CsvSink or ParquetSink
+    metrics: Metrics, optional
+        Records the time spent writing each record under 'store'. Defaults to None.
+
+    Returns
+    -------
+    int
+        The number of records written.
+    """
+    metrics = metrics if metrics is not None else NO_METRICS
+    count = 0
+    try:
+        for record in records:
+            with metrics.timer('store'):
+                sink.write(record)
+            count += 1
+    finally:
+        sink.close()
+    return count
@@ -0,0 +1,309 @@
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, List, Tuple
+
+#The arg_names that only change the order of the results, not which results there are. The
+#`start` and `limit` of a query aren't among them, since its results are read from its own offset.
+ORDER_ARG_NAMES = frozenset(('sort', ))
+
+#The arg_names whose numeric choices are nested, with a smaller value giving a subset of a larger one.
+NESTED_ARG_NAMES = frozenset(('radius', 'fromage'))
+
+#Non-numeric choices of nested arguments that include every result.
+WIDEST_CHOICES = frozenset(('any', ))
+
+#The choice the site uses for a nested arg_name that a query leaves unset.
+UNSET_CHOICES = {'radius' : 25, 'fromage' : 'any'}
+
+#The record field that holds the value of each arg_name a search page shows for its
+#postings, as `Crawler.search_records` makes them. Only these arguments are narrowed.
+SEARCH_RECORD_FIELDS = {'fromage' : 'age'}
+
+
+@dataclass
+class LocalFilter:
+    """
+    The conditions that recover a query's results from the results of a query containing it.
+
+    Each condition is a (record field, operator, value) with an operator of '==' or '<=',
+    e.g. ('age', '<=', 7) for the days since posting. A record missing a field doesn't
+    pass its condition.
+
+    Attributes
+    ----------
+    conditions: list[tuple[str, str, Any]]
+    """
+    conditions : List[Tuple[str, str, Any]] = field(default_factory=list)
+
+    def __call__(self, record):
+        """
+        Parameters
+        ----------
+        record: dict
+
+        Returns
+        -------
+        bool
+            True if the record passes every condition.
+        """
+        for name, op, val in self.conditions:
+            if name not in record:
+                return False
+            if op == '==':
+                if record[name] != val:
+                    return False
+            elif record[name] is None or record[name] > val:
+                return False
+        return True
+
+    def __bool__(self):
+        return bool(self.conditions)
+
+
+@dataclass
+class FetchPlan:
+    """
+    The queries that need fetching for a batch, and how to recover the rest locally.
+
+    Attributes
+    ----------
+    queries: list[Query]
+        The batch of queries that was planned.
+    fetch: list[Query]
+        The queries that need to be fetched.
+    sources: list[int]
+        For each query in the batch, the index in `fetch` of the query that contains it.
+    filters: list[LocalFilter]
+        For each query in the batch, the filter for the results of its source.
+    """
+    queries : List[Any]
+    fetch : List[Any]
+    sources : List[int]
+    filters : List[LocalFilter]
+
+    @property
+    def requests_saved(self):
+        """
+        int: The number of queries that don't need their own fetch.
+        """
+        return len(self.queries) - len(self.fetch)
+
+    async def crawl(self, crawler):
+        """
+        Fetch the queries in `fetch` and recover the results of every query in the batch.
+
+        Parameters
+        ----------
+        crawler: Crawler
+
+        Returns
+        -------
+        list[list[dict]]
+            The search records of each query in the batch, see `Crawler.search_records`.
+        """
+        fetched = await asyncio.gather(*(crawler.search_records(query) for query in self.fetch))
+        return self.resolve(fetched)
+
+    def resolve(self, fetched):
+        """
+        Recover the results of every query in the batch.
+
+        Parameters
+        ----------
+        fetched: list[Iterable[dict]]
+            The records for each query in `fetch`, in the same order.
+
+        Returns
+        -------
+        list[list[dict]]
+            The records for each query in the batch, in the same order.
+        """
+        fetched = [list(records) for records in fetched]
+        return [[record for record in fetched[source] if local_filter(record)] if local_filter else fetched[source]
+                for source, local_filter in zip(self.sources, self.filters)]
+
+    def __str__(self):
+        return "FetchPlan: %i queries, %i fetches, %i requests saved."%(len(self.queries), len(self.fetch),
+                                                                        self.requests_saved)
+
+
+class SubsumptionPlanner(object):
+    """
+    Finds the queries in a batch whose results are contained in another query's results,
+    using the metadata of their QueryArguments.
+
+    A query contains another of the same class when every argument either has the same
+    value, or is narrowed by the other query:
+
+    * Arguments with `choices` that are unset contain any of their choices.
+    * Nested arguments (`radius`, `fromage`) contain any smaller numeric choice, and a
+      widest choice like 'any' contains every numeric choice. An unset nested argument
+      is the choice the site uses for it, so an unset `fromage` is 'any'.
+    * Ordering arguments (`sort`) are ignored.
+
+    Anything else, including arguments that `require` others, like a company name and id,
+    has to match exactly. That includes the paging arguments `start` and `limit`, since
+    a query's results are read from its own offset. So does any argument the records don't carry a field for, since
+    their results can't be told apart locally: by default only `fromage` is narrowed, on
+    the ages that the search pages show. A job type or radius is never on a record, see
+    `locations.LocationNormalizer.plan` for nearby places.
+
+    Attributes
+    ----------
+    order_arg_names: frozenset[str]
+    nested_arg_names: frozenset[str]
+    unset_choices: dict
+        The choice that an unset nested argument means, by arg_name.
+    record_fields: dict
+        The record field holding the value of each arg_name that can be narrowed.
+
+    Methods
+    -------
+    contains(query, other)
+        Get the filter that recovers other's results from query's, if query contains other.
+    plan(queries)
+        Get the fetch plan for a batch of queries.
+    """
+    def __init__(self, order_arg_names=ORDER_ARG_NAMES, nested_arg_names=NESTED_ARG_NAMES,
+                 record_fields=SEARCH_RECORD_FIELDS, unset_choices=UNSET_CHOICES):
+        """
+        Parameters
+        ----------
+        order_arg_names: Iterable[str], optional
+            The arg_names to ignore. Defaults to ORDER_ARG_NAMES.
+        nested_arg_names: Iterable[str], optional
+            The arg_names with nested choices. Defaults to NESTED_ARG_NAMES.
+        record_fields: dict, optional
+            The record field holding the value of each arg_name that can be narrowed.
+            Defaults to SEARCH_RECORD_FIELDS.
+        unset_choices: dict, optional
+            The choice that an unset nested argument means, by arg_name. Defaults to
+            UNSET_CHOICES.
+        """
+        self.order_arg_names = frozenset(order_arg_names)
+        self.nested_arg_names = frozenset(nested_arg_names)
+        self.record_fields = dict(record_fields)
+        self.unset_choices = dict(unset_choices)
+
+    def _kind(self, arg):
+        """
+        Get how an argument can be narrowed: 'order', 'nested', 'choice' or 'exact'.
+        """
+        if arg.arg_name in self.order_arg_names:
+            return 'order'
+        if arg.requires or not arg.mutable or not arg.choices or arg.arg_name not in self.record_fields:
+            return 'exact'
+        if arg.arg_name in self.nested_arg_names:
+            return 'nested'
+        return 'choice'
+
+    def _exact_key(self, query):
+        """
+        Get the values that have to match exactly for two queries to contain one another.
+        """
+        return (type(query), query.base_url) + tuple(query.arg_value(name) for name, arg in query._args.items()
+                                                     if self._kind(arg) == 'exact')
+
+    def contains(self, query, other):
+        """
+        Parameters
+        ----------
+        query: Query
+        other: Query
+
+        Returns
+        -------
+        LocalFilter
+            The filter that recovers other's results from query's results, which is empty
+            if they're the same, or None if query doesn't contain other.
+        """
+        if self._exact_key(query) != self._exact_key(other):
+            return None
+        conditions = []
+        for name, arg in query._args.items():
+            kind = self._kind(arg)
+            if kind in ('order', 'exact'):
+                continue
+            val, other_val = query.arg_value(name), other.arg_value(name)
+            if kind == 'nested':
+                unset = self.unset_choices.get(arg.arg_name)
+                val = unset if val is None else val
+                other_val = unset if other_val is None else other_val
+            if val == other_val:
+                continue
+            if kind == 'choice':
+                if val is not None:
+                    return None
+                conditions.append((self.record_fields[arg.arg_name], '==', other_val))
+            else:
+                if not _is_number(other_val) or not (val in WIDEST_CHOICES or (_is_number(val) and other_val <= val)):
+                    return None
+                conditions.append((self.record_fields[arg.arg_name], '<=', other_val))
+        return LocalFilter(conditions)
+
+    def plan(self, queries):
+        """
+        Get the fetch plan for a batch of queries.
+
+        Only the queries that aren't contained in any other query are fetched, and every
+        other query is recovered from one of those with a local filter.
+
+        Parameters
+        ----------
+        queries: Iterable[Query]
+
+        Returns
+        -------
+        FetchPlan
+        """
+        queries = list(queries)
+        groups = OrderedDict()
+        for index, query in enumerate(queries):
+            groups.setdefault(self._exact_key(query), []).append(index)
+
+        roots = {}
+        filters = [None]*len(queries)
+        for indexes in groups.values():
+            group_roots = []
+            for index in indexes:
+                query = queries[index]
+                #Any root that the new query contains is demoted under it.
+                for root in list(group_roots):
+                    if self.contains(query, queries[root]) is not None and self.contains(queries[root], query) is None:
+                        group_roots.remove(root)
+                if not any(self.contains(queries[root], query) is not None for root in group_roots):
+                    group_roots.append(index)
+            for index in indexes:
+                for root in group_roots:
+                    local_filter = self.contains(queries[root], queries[index])
+                    if local_filter is not None:
+                        roots[index] = root
+                        filters[index] = local_filter
+                        break
+
+        fetch_indexes = list(OrderedDict.fromkeys(roots[index] for index in range(len(queries))))
+        positions = {root : pos for pos, root in enumerate(fetch_indexes)}
+        return FetchPlan(queries, [queries[root] for root in fetch_indexes],
+                         [positions[roots[index]] for index in range(len(queries))], filters)
+
+
+def _is_number(val):
+    return isinstance(val, (int, float)) and not isinstance(val, bool)
+
+
+def plan(queries, **kwargs):
+    """
+    Get the fetch plan for a batch of queries with a SubsumptionPlanner.
+
+    Parameters
+    ----------
+    queries: Iterable[Query]
+    kwargs:
+        Any keyword arguments for the SubsumptionPlanner.
+
+    Returns
+    -------
+    FetchPlan
+    """
+    return SubsumptionPlanner(**kwargs).plan(queries)
@@ -1,7 +1,8 @@
 from typing import Any, Optional, Iterable
-from dataclasses import dataclass
-from collections import defaultdict, OrderedDict
-from urllib.parse import urlparse, urlencode
+from collections import OrderedDict
+from itertools import product
+from weakref import WeakValueDictionary
+from urllib.parse import urlparse, urlsplit, urlunsplit, parse_qsl, quote_plus
 
 class QueryException(Exception):
     """
@@ -101,10 +102,9 @@ class QueryRequirementError(QueryException, ValueError):
             full_str.append(single_fmt%(arg_name, reqs_str))
         return '\n'.join(full_str)
     
-@dataclass
-class QueryArgument:
+class QueryArgument(object):
     """
-    A dataclass for handling the data associated with a single query arguement.
+    A class for handling the data associated with a single query arguement.
     
     Attributes
     ----------
@@ -114,6 +114,9 @@ class QueryArgument:
         The type that the value should be.
     required: bool, optional
         Whether or not the value is required for a query. Defaults to False.
+    value: Any, optional
+        The default value for the argument. Each query keeps its own values, starting
+        from this default. Defaults to None.
     mutable: bool, optional
         Wheter or not the value is mutable for a query. Defaults to True.
     fmt: str, optional
@@ -138,32 +141,78 @@ class QueryArgument:
     
     Methods
     -------
+    is_empty_value(val)
+        Whether a value is None for an argument that isn't required.
+    valid_value(val)
+        Whether a value is valid for the argument.
+    encode(val)
+        Format a value according to fmt.
+    value_error(val)
+        Get the error message for a value if one exists.
     missing_requirements(other_arg_names)
         Get any required arguments that are missing.
     """
+    __slots__ = ('arg_name', 'type', 'required', 'value', 'mutable', 'fmt', 'choices', 'requires', 'disp_name')
+    
     arg_name : str
-    type : Optional[Any]=Any
-    required : bool=False
-    value : Optional[Any]=None
-    mutable : bool=True
-    fmt : Optional[str]=None
-    choices : Optional[Iterable]=None
-    requires : Optional[Iterable]=None
-    disp_name : Optional[str]=None
+    type : Optional[Any]
+    required : bool
+    value : Optional[Any]
+    mutable : bool
+    fmt : Optional[str]
+    choices : Optional[Iterable]
+    requires : Optional[Iterable]
+    disp_name : Optional[str]
+    
+    def __init__(self, arg_name, type=Any, required=False, value=None, mutable=True, fmt=None, choices=None,
+                 requires=None, disp_name=None):
+        """
+        A single string choice is stored as a one element tuple. The default value is
+        checked against the type, and can be given for an immutable argument.
+        """
+        setattr_ = object.__setattr__
+        setattr_(self, 'arg_name', arg_name)
+        setattr_(self, 'type', type)
+        setattr_(self, 'required', required)
+        setattr_(self, 'mutable', mutable)
+        setattr_(self, 'fmt', fmt)
+        setattr_(self, 'choices', (choices, ) if isinstance(choices, str) else choices)
+        setattr_(self, 'requires', requires)
+        setattr_(self, 'disp_name', disp_name)
+        if value is not None:
+            self._check_type(value)
+        setattr_(self, 'value', value)
+    
+    def _fields(self):
+        return tuple(getattr(self, name) for name in QueryArgument.__slots__)
+    
+    def __repr__(self):
+        return 'QueryArgument(%s)'%', '.join('%s=%r'%(name, val) for name, val in zip(QueryArgument.__slots__,
+                                                                                     self._fields()))
+    
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._fields() == other._fields()
+    
+    __hash__ = None
+    
+    def __reduce__(self):
+        return (QueryArgument, self._fields())
     
     @property
     def is_empty(self):
         """
         bool: True only if the value is None, and the argument is not required.
         """
-        return self.value is None and not self.required
+        return self.is_empty_value(self.value)
             
     @property
     def value_valid(self):
         """
         bool: True if the value is valid.
         """
-        return self._has_value_if_required and self._valid_type and self._valid_choice 
+        return self.valid_value(self.value)
     
     
     @property
@@ -171,7 +220,7 @@ class QueryArgument:
         """
         str: The value properly encoded according to any fmt string if applicable.
         """
-        return self._format_value()
+        return self.encode(self.value)
     
     
     @property
@@ -193,14 +242,70 @@ class QueryArgument:
         """
         str: The error message for the argument if one exists.
         """
+        return self.value_error(self.value)
+    
+    def is_empty_value(self, val):
+        """
+        Parameters
+        ----------
+        val: Any
+            A value for this argument.
+        
+        Returns
+        -------
+        bool
+            True only if the value is None, and the argument is not required.
+        """
+        return val is None and not self.required
+    
+    def valid_value(self, val):
+        """
+        Parameters
+        ----------
+        val: Any
+            A value for this argument.
+        
+        Returns
+        -------
+        bool
+            True only if the value exists if it's required to, the type is correct, and the choice matches.
+        """
+        return self._has_value_if_required(val) and self._valid_type(val) and self._valid_choice(val)
+    
+    def encode(self, val):
+        """
+        Parameters
+        ----------
+        val: Any
+            A value for this argument.
+        
+        Returns
+        -------
+        str
+            The value properly encoded according to any fmt string if applicable.
+        """
+        return self._format_value(val)
+    
+    def value_error(self, val):
+        """
+        Parameters
+        ----------
+        val: Any
+            A value for this argument.
+        
+        Returns
+        -------
+        str
+            The error message for the value if one exists.
+        """
         name = "'%s' (%s)"%(self.arg_name, self.disp_name) if self.disp_name else "'%s'"%self.arg_name
         
-        if not self._has_value_if_required:
+        if not self._has_value_if_required(val):
             return "%s : Missing value for required argument"%name
-        if not self._valid_type:
-            return "%s : Expected %s; got %s"%(name, self.type, type(self.value))
-        if not self._valid_choice:
-            return "%s : Expected an element from %s; got %s"%(name, self.choices, self.value)
+        if not self._valid_type(val):
+            return "%s : Expected %s; got %s"%(name, self.type, type(val))
+        if not self._valid_choice(val):
+            return "%s : Expected an element from %s; got %s"%(name, self.choices, val)
         
         return None
     
@@ -252,44 +357,50 @@ class QueryArgument:
         
         if not self.mutable:
             raise NotImplementedError("Tried to mutate an immutable argument value.")
-        if self.type != Any:
-            if not isinstance(val, self.type):
-                raise TypeError('Expected the value to be of type %s; got %s'%(self.type, type(val)))
+        self._check_type(val)
         if self.choices:
-            if isinstance(self.choices, str) and val != self.choices:
-                raise ValueError('Expected the value to be %s; got %s'%(self.choices, val))
             if val not in self.choices:
                 raise ValueError('Expected the value to be from %s; got %s'%(self.choices, val))
     
-    @property
-    def _has_value_if_required(self):
+    def _check_type(self, val):
+        """
+        Raises
+        ------
+        TypeError: If val is of the wrong type.
+        """
+        if self.type != Any:
+            if not isinstance(val, self.type):
+                raise TypeError('Expected the value to be of type %s; got %s'%(self.type, type(val)))
+    
+    def _has_value_if_required(self, val):
         """
         bool: True only if there is a value besied None if the argument is required.
         """
-        return self.value is not None if self.required else True
+        return val is not None if self.required else True
     
-    @property
-    def _valid_type(self):
+    def _valid_type(self, val):
         """
-        bool: True if the existing value matches the expected type.
+        bool: True if the value matches the expected type.
         """
         if self.type == Any:
             return True
-        return isinstance(self.value, self.type) or self.is_empty
+        return isinstance(val, self.type) or self.is_empty_value(val)
     
-    @property
-    def _valid_choice(self):
+    def _valid_choice(self, val):
         """
-        bool: True if the existing value is one of the expected choices.
+        bool: True if the value is one of the expected choices.
         """
         if self.choices:
-            if isinstance(self.choices, str):
-                self.choices = (self.choices, ) or self.is_empty
-            return self.value in self.choices or self.is_empty
+            return val in self.choices or self.is_empty_value(val)
         return True
     
-    def _format_value(self):
+    def _format_value(self, val):
         """
+        Parameters
+        ----------
+        val: Any
+            The value to format.
+        
         Returns
         -------
         str
@@ -300,40 +411,283 @@ class QueryArgument:
         ValueError: If the value couldn't be formattted according to the fmt string.
         """
         if not self.fmt:
-            return str(self.value)
+            return str(val)
         try:
-            formatted = self.fmt%self.value
+            formatted = self.fmt%val
         except TypeError:
-            formatted = self.fmt.format(self.value)
+            formatted = self.fmt.format(val)
 
         if formatted != self.fmt:
             return formatted
         else:
-            command1 = '`self.fmt%%self.value` -> %s%%%s'%(self.fmt, self.value)
-            command2 = '`self.fmt.format(self.value)` -> %s.format(%s)'%(self.fmt, self.value)
+            command1 = '`self.fmt%%val` -> %s%%%s'%(self.fmt, val)
+            command2 = '`self.fmt.format(val)` -> %s.format(%s)'%(self.fmt, val)
             raise ValueError("String formatting error for both commands.\n"\
                              "    %s\n    %s"%(command1, command2))
         return formatted
     
-def register_runtime_property(inst, name, prop):
+class EncodingPlan(object):
     """
-    Adds a property to an instance at run-time by creating a new class for the instance,
-    and adding the property to that new class.
+    The steps for encoding the values of a Query class into url parameters, compiled
+    once per class from its arguments.
     
-    Parameters
+    Arguments sharing an `arg_name` are grouped together. The encoded parameters are
+    keyed in the order of the first non-empty argument of each group, so a query with a
+    minimum salary but no `what` puts its 'q' after its 'l'. Since the requirements of the
+    arguments only depend on the other `arg_name`s, they're also resolved up front.
+    
+    Attributes
     ----------
-    inst: Object
-        The intstance to add our property to.
-    name: str
-        The name of the property.
-    prop: property
-        The property to be added.
+    args: tuple[QueryArgument]
+        The arguments, in the same order as a query's values.
+    groups: tuple[tuple[str, tuple[int]]]
+        The `arg_name`s with the positions of the arguments that are merged under them.
+    missing: dict
+        The missing requirements for each `arg_name`, if there are any.
+    
+    Methods
+    -------
+    separator(base_url)
+        Get the separator between the base url and its parameters.
+    merged(values)
+        Get the parameters with any values that share an arg_name merged by a '+'.
+    encode(values)
+        Get the url encoded parameter string.
     """
-    class_name = inst.__class__.__name__ + 'Child'
-    child_class = type(class_name, (inst.__class__,), {name : prop})
-    inst.__class__ = child_class
-            
- 
+    def __init__(self, args):
+        """
+        Parameters
+        ----------
+        args: OrderedDict
+            The query arguments by name.
+        """
+        self.args = tuple(args.values())
+        groups = OrderedDict()
+        for pos, arg in enumerate(self.args):
+            groups.setdefault(arg.arg_name, []).append(pos)
+        self.groups = tuple((arg_name, tuple(positions)) for arg_name, positions in groups.items())
+        self._keys = tuple(quote_plus(arg_name) + '=' for arg_name in groups)
+        
+        arg_names = list(groups)
+        self.missing = {}
+        for arg in self.args:
+            missing = arg.missing_requirements(arg_names)
+            if missing:
+                self.missing[arg.arg_name] = missing
+        self._separators = {}
+    
+    def separator(self, base_url):
+        """
+        Parameters
+        ----------
+        base_url: str
+        
+        Returns
+        -------
+        str
+            '&' if the base url already has a query string, otherwise '?'.
+        """
+        try:
+            return self._separators[base_url]
+        except KeyError:
+            sep = self._separators[base_url] = '&' if urlparse(base_url).query else '?'
+            return sep
+    
+    def _grouped(self, values):
+        """
+        Get the index of each group with a non-empty argument and its encoded values, in
+        the order of each group's first non-empty argument.
+        """
+        args = self.args
+        grouped = []
+        in_order = True
+        last = -1
+        for index, (_, positions) in enumerate(self.groups):
+            vals = [args[pos].encode(values[pos]) for pos in positions if not args[pos].is_empty_value(values[pos])]
+            if not vals:
+                continue
+            first = positions[0]
+            if len(positions) > 1:
+                first = next(pos for pos in positions if not args[pos].is_empty_value(values[pos]))
+            if first < last:
+                in_order = False
+            last = first
+            grouped.append((first, index, vals))
+        if not in_order:
+            grouped.sort()
+        return grouped
+    
+    def merged(self, values):
+        """
+        Parameters
+        ----------
+        values: list
+            The values of a query, by position.
+        
+        Returns
+        -------
+        list[tuple[str, str]]
+            The arg_names and their merged, encoded values for any non-empty arguments.
+        """
+        groups = self.groups
+        return [(groups[index][0], '+'.join(vals)) for _, index, vals in self._grouped(values)]
+    
+    def encode(self, values):
+        """
+        Parameters
+        ----------
+        values: list
+            The values of a query, by position.
+        
+        Returns
+        -------
+        str
+            The parameters encoded into a url query string.
+        """
+        keys = self._keys
+        return '&'.join(keys[index] + quote_plus('+'.join(vals)) for _, index, vals in self._grouped(values))
+    
+class URLIndex(object):
+    """
+    The reverse of an EncodingPlan, for parsing url parameters back into the values of
+    a Query class. Built once per class.
+    
+    Each `arg_name` maps to the arguments that are merged under it, along with a decoder
+    for each. Arguments with a fmt string are matched by a pattern compiled from it, and
+    arguments with choices look the encoded value up in a table of their choices.
+    
+    Attributes
+    ----------
+    candidates: dict
+        The (name, argument, decoder) of the arguments for each arg_name, in order.
+    
+    Methods
+    -------
+    decode(params, strict=True)
+        Get the values for url parameters by argument name.
+    """
+    def __init__(self, args):
+        """
+        Parameters
+        ----------
+        args: OrderedDict
+            The query arguments by name.
+        """
+        self.candidates = OrderedDict()
+        for name, arg in args.items():
+            self.candidates.setdefault(arg.arg_name, []).append((name, arg, self._decoder(arg)))
+    
+    @staticmethod
+    def _decoder(arg):
+        """
+        Get a function that turns an encoded string back into a value for the argument,
+        or raises ValueError if the string can't be one of its values.
+        """
+        #Only decoding urls needs re, so it isn't imported with the package.
+        import re
+        pattern = None
+        if arg.fmt:
+            literal = re.escape(arg.fmt)
+            for placeholder in (re.escape('{}'), re.escape('%s'), re.escape('%i'), re.escape('%d')):
+                literal = literal.replace(placeholder, '(.+)', 1)
+            pattern = re.compile('^' + literal + '$')
+        choices = {str(choice) : choice for choice in arg.choices} if arg.choices else None
+        
+        def decode(text):
+            if pattern is not None:
+                match = pattern.match(text)
+                if match is None:
+                    raise ValueError("'%s' doesn't match the format %s"%(text, arg.fmt))
+                text = match.group(1)
+            if choices is not None:
+                try:
+                    return choices[text]
+                except KeyError:
+                    raise ValueError("'%s' isn't one of %s"%(text, arg.choices))
+            if arg.type is int:
+                return int(text.replace(',', ''))
+            if arg.type not in (str, Any):
+                return arg.type(text)
+            return text
+        
+        decode.patterned = pattern is not None or choices is not None
+        return decode
+    
+    def _split(self, candidates, text):
+        """
+        Split a value merged from several arguments back into each argument's value.
+        
+        The arguments with a fmt or choices are matched against the parts at either end,
+        and whatever remains goes to the first free text argument.
+        """
+        sep = '+' if '+' in text else ' '
+        parts = text.split(sep)
+        values = {}
+        free = [pos for pos, (_, _, decode) in enumerate(candidates) if not decode.patterned]
+        first_free = free[0] if free else len(candidates)
+        
+        left, right = 0, len(parts)
+        for name, _, decode in candidates[:first_free]:
+            if left < right:
+                try:
+                    values[name] = decode(parts[left])
+                    left += 1
+                except ValueError:
+                    pass
+        for name, _, decode in reversed(candidates[first_free + 1:]):
+            if not decode.patterned:
+                continue
+            if left < right:
+                try:
+                    values[name] = decode(parts[right - 1])
+                    right -= 1
+                except ValueError:
+                    pass
+        if left < right:
+            if not free:
+                raise ValueError("Couldn't match '%s' to any of %s"%(sep.join(parts[left:right]),
+                                                                      [name for name, _, _ in candidates]))
+            name, _, decode = candidates[first_free]
+            values[name] = decode(sep.join(parts[left:right]))
+        return values
+    
+    def decode(self, params, strict=True):
+        """
+        Parameters
+        ----------
+        params: Iterable[tuple[str, str]]
+            The decoded (key, value) pairs of a url query string.
+        strict: bool, optional
+            True to raise on any parameter the class doesn't define, or any value that
+            can't be decoded. Otherwise they're skipped. Defaults to True.
+        
+        Returns
+        -------
+        dict
+            The values by argument name.
+        
+        Raises
+        ------
+        ValueError: If strict and a key isn't defined, or a value can't be decoded.
+        """
+        values = {}
+        for key, text in params:
+            candidates = self.candidates.get(key)
+            if candidates is None:
+                if strict:
+                    raise ValueError("No arg with the arg_name '%s' defined on the query"%key)
+                continue
+            try:
+                if len(candidates) == 1:
+                    name, _, decode = candidates[0]
+                    values[name] = decode(text)
+                else:
+                    values.update(self._split(candidates, text))
+            except ValueError:
+                if strict:
+                    raise
+        return values
+    
 class Query(object):
     """
     An object for interacting with a web query.
@@ -343,21 +697,52 @@ class Query(object):
     base_url : str
         The base url of the query
     params: str
-        The parameters encoding into a url query
+        The parameters encoding into a url query. This is cached until a value changes.
     url: str
-        The encoded request url
+        The encoded request url. This is cached until a value or the base url changes.
         
     Methods
     -------
     make_property(name, docstring=None, mutable=True)
         Get the associated property
+    schema_class(**kwargs)
+        Get the (cached) subclass that defines properties for the given arguments.
     register_args(**kwargs)
         Register the query arguments to the object via properties. The keys
         of the kwargs will determine the name associated with the properties
         on the query object.
+    remove_arg(name)
+        Remove an argument from the query, as `del query.<name>` does.
     arg_value(name)
         Get the value of a given argument by name.
+    set_value(name, val)
+        Check and set the value of a given argument by name.
+    from_url(url, strict=True)
+        Parse a url back into a query of the class.
+    from_urls(urls, strict=True)
+        Lazily parse many urls into queries of the class.
+    copy(**values)
+        Get an independent copy of the query, with any values changed.
+    product(**value_lists)
+        Lazily generate the urls for every combination of the given argument values.
+    
+    Notes
+    -----
+    Subclasses can declare their arguments up front in a `_kwargs` class attribute.
+    The properties for those arguments are then defined once, when the subclass is
+    created, and every instance shares that class.
+    
+    The QueryArguments are only definitions, shared by every query of a class. Each
+    query keeps its own values in a list indexed by the argument's position, so queries
+    can be built and modified independently of each other, including across threads.
     """
+    _kwargs = {}
+    _args = OrderedDict()
+    _positions = {}
+    _defaults = ()
+    _plan = EncodingPlan(OrderedDict())
+    _schema_classes = WeakValueDictionary()
+    
     def __init__(self, base_url : str, **kwargs : QueryArgument):
         """
         Parameters
@@ -368,11 +753,33 @@ class Query(object):
             Any query arguments for the query. These will be associated on
             the query object by the kwarg name.
         """
-        self._args = OrderedDict()
+        self._values = list(self._defaults)
+        self._params = None
+        self._url = None
         
         self.base_url = base_url
         self.register_args(**kwargs)
     
+    def __init_subclass__(cls, **kwargs):
+        """
+        Define the schema and properties for any arguments declared in the subclass's
+        `_kwargs`, without any arguments named in its `_removed`.
+        """
+        super(Query, cls).__init_subclass__(**kwargs)
+        declared = cls.__dict__.get('_kwargs', {})
+        args = OrderedDict(cls._args)
+        for name in cls.__dict__.get('_removed', ()):
+            args.pop(name, None)
+        for name, arg in declared.items():
+            args[name] = arg
+            mutable = getattr(arg, 'mutable', True)
+            setattr(cls, name, Query.make_property(name, arg.doc, mutable))
+        
+        cls._args = args
+        cls._positions = {name : pos for pos, name in enumerate(args)}
+        cls._defaults = tuple(arg.value for arg in args.values())
+        cls._plan = EncodingPlan(args)
+    
     @classmethod
     def make_property(cls, name, docstring=None, mutable=True):
         """
@@ -393,10 +800,10 @@ class Query(object):
             return self.arg_value(name)
     
         def setter(self, val):
-            self._args[name].value = val
+            self.set_value(name, val)
         
         def deletter(self):
-            del self._args[name]
+            self.remove_arg(name)
         
         if not mutable:
             setter = None
@@ -408,17 +815,88 @@ class Query(object):
         """
         Register the properties of any query arguments.
         
+        Arguments that aren't already part of the query's class schema will move the
+        query to a (cached) subclass that includes them, with their values starting
+        from the arguments' defaults.
+        
         Parameters
         ----------
         kwargs:
             Any query arguments for the query. These will be associated on
             the query object by the kwarg name.
         """
-        for name, arg in kwargs.items():
-            self._args[name] = arg
-            mutable = getattr(arg, 'mutable', True)
-            arg_prop = Query.make_property(name, arg.doc, mutable)
-            register_runtime_property(self, name, arg_prop)
+        undefined = OrderedDict((name, arg) for name, arg in kwargs.items() if self._args.get(name) is not arg)
+        if not undefined:
+            return
+        values = dict(zip(self._args, self._values))
+        self.__class__ = type(self).schema_class(**undefined)
+        self._values = [values[name] if name in values and name not in undefined else arg.value
+                        for name, arg in self._args.items()]
+        self._params = self._url = None
+    
+    def remove_arg(self, name : str):
+        """
+        Remove an argument from the query, as `del query.<name>` does.
+        
+        The query moves to a (cached) subclass without the argument, so it's no longer
+        encoded, and getting or setting it raises a ValueError until it's registered again.
+        
+        Parameters
+        ----------
+        name: str
+        
+        Raises
+        ------
+        ValueError: If the name does not match a valid arg.
+        """
+        if name not in self._positions:
+            raise ValueError("No arg named '%s' defined on the query"%name)
+        values = dict(zip(self._args, self._values))
+        self.__class__ = type(self)._without_arg(name)
+        self._values = [values[arg_name] for arg_name in self._args]
+        self._params = self._url = None
+    
+    @classmethod
+    def _without_arg(cls, name):
+        """
+        Get the (cached) subclass without an argument.
+        """
+        key = (cls, name)
+        try:
+            return Query._schema_classes[key]
+        except KeyError:
+            schema_cls = type(cls.__name__ + 'Schema', (cls,), {'_kwargs' : {}, '_removed' : (name, )})
+            Query._schema_classes[key] = schema_cls
+            return schema_cls
+    
+    @classmethod
+    def schema_class(cls, **kwargs : QueryArgument):
+        """
+        Get a subclass with properties defined for the given arguments.
+        
+        The subclasses are cached by the argument definitions, so building any number
+        of queries with the same arguments only ever creates a single class. A subclass
+        only stays cached while it's in use, so the cache doesn't grow with every set of
+        arguments that was ever registered.
+        
+        Parameters
+        ----------
+        kwargs:
+            The query arguments that need properties.
+        
+        Returns
+        -------
+        type
+        """
+        key = (cls, tuple((name, id(arg)) for name, arg in kwargs.items()))
+        try:
+            return Query._schema_classes[key]
+        except KeyError:
+            # The class keeps references to the arguments, so the ids in its key stay valid for
+            # as long as the weakly held class is alive.
+            schema_cls = type(cls.__name__ + 'Schema', (cls,), {'_kwargs' : dict(kwargs)})
+            Query._schema_classes[key] = schema_cls
+            return schema_cls
     
     def arg_value(self, name : str):
         """
@@ -433,9 +911,209 @@ class Query(object):
         ValueError: If the name does not match a valid arg.
         """
         try:
-            return self._args[name].value
+            return self._values[self._positions[name]]
+        except KeyError:
+            raise ValueError("No arg named '%s' defined on the query"%name)
+    
+    def set_value(self, name : str, val):
+        """
+        Set the value of an argument by name.
+        
+        Parameters
+        ----------
+        name: str
+            The name of the argument.
+        val: Any
+            The value, should match the argument's type, and choices if applicable.
+        
+        Raises
+        ------
+        ValueError: If the name does not match a valid arg, or val isn't a valid choice.
+        TypeError: If val is of the wrong type.
+        NotImplementedError: If trying to mutate an immutable argument value.
+        """
+        try:
+            pos = self._positions[name]
         except KeyError:
             raise ValueError("No arg named '%s' defined on the query"%name)
+        self._args[name]._check_value(val)
+        self._values[pos] = val
+        self._params = self._url = None
+    
+    @classmethod
+    def _url_index(cls):
+        """
+        Get the URLIndex of the class, building it on first use.
+        """
+        try:
+            return cls.__dict__['_index']
+        except KeyError:
+            cls._index = URLIndex(cls._args)
+            return cls._index
+    
+    @classmethod
+    def from_url(cls, url, strict=True):
+        """
+        Parse a url back into a query of the class.
+        
+        Values that were merged under a shared `arg_name`, like a SimpleIndeedQuery's
+        `what` and `min_salary` under 'q', are split back apart. Immutable arguments are
+        left at their defaults.
+        
+        Parameters
+        ----------
+        url: str
+            The url of a query.
+        strict: bool, optional
+            True to raise on any parameter the class doesn't define or can't decode, or an
+            immutable argument with a different value. Otherwise they're skipped.
+            Defaults to True.
+        
+        Returns
+        -------
+        Query
+            A query with the url's base url and values.
+        
+        Raises
+        ------
+        ValueError: If a parameter can't be decoded, or isn't valid for the class.
+        TypeError: If a decoded value is of the wrong type.
+        """
+        parts = urlsplit(url)
+        values = cls._url_index().decode(parse_qsl(parts.query), strict)
+        
+        query = object.__new__(cls)
+        query._values = list(cls._defaults)
+        query._params = None
+        query.base_url = urlunsplit((parts.scheme, parts.netloc, parts.path, '', ''))
+        for name, val in values.items():
+            arg = cls._args[name]
+            if not arg.mutable:
+                if strict and val != arg.value:
+                    raise ValueError("Expected '%s' to be %s; got %s"%(arg.arg_name, arg.value, val))
+                continue
+            query.set_value(name, val)
+        return query
+    
+    @classmethod
+    def from_urls(cls, urls, strict=True):
+        """
+        Lazily parse many urls into queries of the class.
+        
+        Parameters
+        ----------
+        urls: Iterable[str]
+        strict: bool, optional
+            See `from_url`. Defaults to True.
+        
+        Yields
+        ------
+        Query
+        """
+        for url in urls:
+            yield cls.from_url(url, strict)
+    
+    def copy(self, **values):
+        """
+        Get an independent copy of the query, with any values changed.
+        
+        Parameters
+        ----------
+        values:
+            Any new values for the copy, by argument name.
+        
+        Returns
+        -------
+        Query
+        """
+        query = object.__new__(type(self))
+        query.__dict__.update(self.__dict__)
+        query._values = list(self._values)
+        for name, val in values.items():
+            query.set_value(name, val)
+        return query
+    
+    def product(self, **value_lists):
+        """
+        Lazily generate the urls for every combination of the given argument values.
+        
+        Any argument that isn't given keeps its current value on the query. Each list of
+        values is checked against the argument's type and choices once, and the encoded
+        parameters are built once per combination of the arguments that share an
+        `arg_name`, so each url is only a join of already encoded fragments.
+        
+        The urls are generated in the order of `itertools.product` over the encoded
+        parameters, with the last parameter changing the fastest. Each url is the same as
+        the `url` of a query with that combination of values.
+        
+        Parameters
+        ----------
+        value_lists:
+            An iterable of values for any arguments, by argument name.
+        
+        Yields
+        ------
+        str
+            The full request url for each combination.
+        
+        Raises
+        ------
+        ValueError: If a name does not match a valid arg, or a value isn't a valid choice.
+        TypeError: If a value is of the wrong type.
+        NotImplementedError: If trying to vary an immutable argument value.
+        QueryValueError: If any fixed values are invalid, or a required argument could be None.
+        QueryRequirementError: If any requirements aren't met.
+        """
+        plan = self._plan
+        options = [(val, ) for val in self._values]
+        for name, values in value_lists.items():
+            try:
+                pos = self._positions[name]
+            except KeyError:
+                raise ValueError("No arg named '%s' defined on the query"%name)
+            values = tuple(values)
+            for val in values:
+                self._args[name]._check_value(val)
+            options[pos] = values
+        
+        invalid = [plan.args[pos].value_error(val) for pos, values in enumerate(options)
+                   for val in values if not plan.args[pos].valid_value(val)]
+        if invalid:
+            raise QueryValueError("Invalvid Query Values.", list(OrderedDict.fromkeys(invalid)))
+        self._check_requirements()
+        
+        prefix = self._base_url + plan.separator(self._base_url)
+        args = plan.args
+        #A merged argument that can be empty while a later one in its group isn't moves the
+        #group's key, so those combinations are encoded one by one.
+        if any(len(positions) > 1 and any(args[positions[0]].is_empty_value(val) for val in options[positions[0]])
+               and any(not args[pos].is_empty_value(val) for pos in positions[1:] for val in options[pos])
+               for _, positions in plan.groups):
+            groups = [(positions, list(product(*(options[pos] for pos in positions))))
+                      for _, positions in plan.groups]
+            values = list(self._values)
+            for combination in product(*(group for _, group in groups)):
+                for (positions, _), vals in zip(groups, combination):
+                    for pos, val in zip(positions, vals):
+                        values[pos] = val
+                yield prefix + plan.encode(values)
+            return
+        
+        fragments = []
+        for key, (_, positions) in zip(plan._keys, plan.groups):
+            group = []
+            for vals in product(*(options[pos] for pos in positions)):
+                encoded = [plan.args[pos].encode(val) for pos, val in zip(positions, vals)
+                           if not plan.args[pos].is_empty_value(val)]
+                group.append('&' + key + quote_plus('+'.join(encoded)) if encoded else '')
+            if len(group) == 1 and fragments and len(fragments[-1]) == 1:
+                fragments[-1] = (fragments[-1][0] + group[0], )
+            else:
+                fragments.append(tuple(group))
+        
+        join = ''.join
+        for combination in product(*fragments):
+            yield prefix + join(combination)[1:]
     
     def check_parameters(self):
         """
@@ -444,27 +1122,45 @@ class Query(object):
         self._check_valid()
         self._check_requirements()
     
+    @property
+    def base_url(self):
+        """
+        str: The base url of the query.
+        """
+        return self._base_url
+    
+    @base_url.setter
+    def base_url(self, base_url):
+        self._base_url = base_url
+        self._url = None
+    
     @property
     def params(self):
         """
         str: The parameters encoding into a url query string.
         """
-        self.check_parameters()
-        params = self._merged_params()
-        return urlencode(params)
+        params = self._params
+        if params is None:
+            self.check_parameters()
+            params = self._params = self._plan.encode(self._values)
+        return params
     
     @property
     def url(self):
         """
         str: The full request url.
         """
-        return self.base_url + ('&' if urlparse(self.base_url).query else '?') + self.params
+        url = self._url
+        if url is None:
+            params = self.params
+            url = self._url = self._base_url + self._plan.separator(self._base_url) + params
+        return url
     
     
     def __repr__(self):
         try:
             return "Query for: " + self.url
-        except:
+        except (QueryException, ValueError):
             return "Unset query object."
     
     def _invalid_values(self):
@@ -475,7 +1171,7 @@ class Query(object):
         -------
         list[str]
         """
-        return [arg.error_message for arg in self._args.values() if not arg.value_valid]
+        return [arg.value_error(val) for arg, val in zip(self._args.values(), self._values) if not arg.valid_value(val)]
     
     def _missing_requirements(self):
         """
@@ -485,9 +1181,7 @@ class Query(object):
         -------
         dict
         """
-        arg_names = [arg.arg_name for arg in self._args.values()]
-        missing = {arg.arg_name : arg.missing_requirements(arg_names) for arg in self._args.values() if arg.missing_requirements(arg_names)}
-        return missing
+        return dict(self._plan.missing)
     
     def _check_valid(self):
         """
@@ -533,8 +1227,24 @@ class Query(object):
         -------
         dict
         """
-        merged = defaultdict(list)
-        for arg in self._args.values():
-            if not arg.is_empty:
-                merged[arg.arg_name].append(arg.encoded)
-        return {arg_name : '+'.join(vals) for arg_name, vals in merged.items()}
+        return dict(self._plan.merged(self._values))
+
+
+def find_arg(query, arg_name):
+    """
+    Get the name that a query uses for the argument with an arg_name.
+
+    Parameters
+    ----------
+    query: Query
+    arg_name: str
+
+    Returns
+    -------
+    str
+        The argument's name on the query, or None if the query doesn't have it.
+    """
+    for name, arg in query._args.items():
+        if arg.arg_name == arg_name:
+            return name
+    return None
@@ -0,0 +1,279 @@
+import asyncio
+import random
+from email.utils import parsedate_to_datetime
+from time import monotonic, time
+
+from .transport import TokenBucket
+
+#The statuses that mean a host is overloaded or limiting us, and are worth retrying.
+THROTTLED_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+
+def retry_after(headers, now=None):
+    """
+    Get how long a response asks to wait before retrying.
+
+    Parameters
+    ----------
+    headers: dict
+        The response headers, with lower case names.
+    now: float, optional
+        The current timestamp, for a Retry-After date. Defaults to the current time.
+
+    Returns
+    -------
+    float
+        The seconds to wait, or None if the response doesn't say.
+    """
+    val = headers.get('retry-after')
+    if not val:
+        return None
+    try:
+        return max(0.0, float(val))
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(val)
+    except (TypeError, ValueError):
+        return None
+    if date is None:
+        return None
+    return max(0.0, date.timestamp() - (time() if now is None else now))
+
+
+class AdaptiveRate(TokenBucket):
+    """
+    A token bucket for one host whose rate adapts to how the host responds.
+
+    The rate grows additively while responses are fast and successful, and is cut
+    multiplicatively on a throttled (429/5xx) response, a failed request, or a smoothed
+    latency well over the fastest seen. Until the first cut the rate grows quickly, to find the
+    host's limit without a long ramp. Only responses to requests sent after the last cut
+    can cut it again, so a burst of responses to one overload only counts once. A
+    Retry-After pauses every request to the host until it has passed.
+
+    Attributes
+    ----------
+    rate: float
+        The current requests per second.
+    min_rate: float
+        The lowest the rate is cut to.
+    max_rate: float
+        The highest the rate grows to.
+    increase: float
+        The requests per second added to the rate for each second of successful responses.
+    decrease: float
+        The factor the rate is multiplied by when cut.
+    latency_factor: float
+        How many times the fastest latency seen the smoothed latency can reach before it
+        counts as a sign of overload, or None to ignore latency.
+    latency_floor: float
+        The seconds of smoothed latency that never count as overload, so the jitter of a
+        very fast host doesn't cut its rate.
+    latency: float
+        The smoothed latency of successful responses, or None before the first.
+
+    Methods
+    -------
+    acquire()
+        Wait until a request can be made.
+    record(status, latency, headers=None)
+        Adjust the rate for a response.
+    pause(seconds)
+        Hold every request for a number of seconds.
+    """
+    def __init__(self, rate=2.0, capacity=1.0, min_rate=0.1, max_rate=100.0, increase=1.0, decrease=0.5,
+                 latency_factor=4.0, latency_floor=0.05):
+        """
+        Parameters
+        ----------
+        rate: float, optional
+            The starting requests per second. Defaults to 2.
+        capacity: float, optional
+            The largest burst of requests. Defaults to 1.
+        min_rate: float, optional
+            The lowest the rate is cut to. Defaults to 0.1.
+        max_rate: float, optional
+            The highest the rate grows to. Defaults to 100.
+        increase: float, optional
+            The requests per second added for each second of successful responses. Defaults to 1.
+        decrease: float, optional
+            The factor the rate is multiplied by when cut. Defaults to 0.5.
+        latency_factor: float, optional
+            How many times the fastest latency counts as overload. Defaults to 4.
+        latency_floor: float, optional
+            The seconds of latency that never count as overload. Defaults to 0.05.
+        """
+        super().__init__(rate, capacity)
+        if not 0 < decrease < 1:
+            raise ValueError("Expected a decrease between 0 and 1; got %s"%decrease)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.latency_floor = latency_floor
+        self.latency = None
+        self.min_latency = None
+        self.slow_start = True
+        self._last_cut = float('-inf')
+        self._paused_until = 0.0
+
+    async def acquire(self):
+        while True:
+            wait = self._paused_until - monotonic()
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+        await super().acquire()
+
+    def pause(self, seconds):
+        """
+        Parameters
+        ----------
+        seconds: float
+        """
+        self._paused_until = max(self._paused_until, monotonic() + seconds)
+
+    def record(self, status, latency, headers=None):
+        """
+        Adjust the rate for a response.
+
+        Parameters
+        ----------
+        status: int
+            The http status code, or None if the request failed.
+        latency: float
+            The seconds the request took.
+        headers: dict, optional
+            The response headers, with lower case names. Defaults to None.
+
+        Returns
+        -------
+        bool
+            True if the response was a sign of overload.
+        """
+        now = monotonic()
+        wait = retry_after(headers) if headers else None
+        if wait is not None and (status is None or status in THROTTLED_STATUSES):
+            self.pause(wait)
+
+        slow = False
+        if status is not None and status not in THROTTLED_STATUSES:
+            if self.min_latency is None or latency < self.min_latency:
+                self.min_latency = latency
+            self.latency = latency if self.latency is None else 0.8*self.latency + 0.2*latency
+            slow = (self.latency_factor is not None and
+                    self.latency > max(self.latency_factor*self.min_latency, self.latency_floor))
+        overloaded = status is None or status in THROTTLED_STATUSES or slow
+
+        if overloaded:
+            if now - latency >= self._last_cut:
+                self._refill()
+                self.rate = max(self.min_rate, self.rate*self.decrease)
+                self.slow_start = False
+                self._last_cut = now
+        else:
+            self._refill()
+            step = self.rate*0.5 if self.slow_start else self.increase
+            self.rate = min(self.max_rate, self.rate + step/self.rate)
+        return overloaded
+
+
+class RateController(object):
+    """
+    The AdaptiveRate of each host, shared by everything that fetches from them.
+
+    Passing one controller to several crawlers, or using one crawler for both search
+    pages and postings, keeps a single rate per host however the requests are made.
+
+    Attributes
+    ----------
+    rate: float
+        The starting rate of each host.
+    capacity: float
+        The largest burst of requests for each host.
+    retries: int
+        The most times a throttled or failed request is retried.
+    backoff: float
+        The base seconds of the exponential backoff between retries.
+    max_backoff: float
+        The most seconds between retries, other than a longer Retry-After.
+    options: dict
+        Any other keyword arguments for each AdaptiveRate.
+
+    Methods
+    -------
+    for_host(host)
+        Get the rate of a host.
+    backoff_delay(attempt)
+        Get the seconds to wait before a retry.
+    rates()
+        Get the current rate of each host.
+    """
+    def __init__(self, rate=2.0, capacity=1.0, retries=3, backoff=0.5, max_backoff=30.0, **options):
+        """
+        Parameters
+        ----------
+        rate: float, optional
+            The starting requests per second of each host. Defaults to 2.
+        capacity: float, optional
+            The largest burst of requests for each host. Defaults to 1.
+        retries: int, optional
+            The most times a request is retried. Defaults to 3.
+        backoff: float, optional
+            The base seconds between retries. Defaults to 0.5.
+        max_backoff: float, optional
+            The most seconds between retries. Defaults to 30.
+        options:
+            Any other keyword arguments for each AdaptiveRate.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.options = options
+        self._hosts = {}
+
+    def for_host(self, host):
+        """
+        Parameters
+        ----------
+        host: str
+
+        Returns
+        -------
+        AdaptiveRate
+        """
+        try:
+            return self._hosts[host]
+        except KeyError:
+            limiter = self._hosts[host] = AdaptiveRate(self.rate, self.capacity, **self.options)
+            return limiter
+
+    def backoff_delay(self, attempt):
+        """
+        Get the seconds to wait before a retry, with full jitter so that retries of requests
+        that failed together don't all land together. Any Retry-After is waited out on top
+        of this, by the host's AdaptiveRate.
+
+        Parameters
+        ----------
+        attempt: int
+            The number of the retry, starting from 0.
+
+        Returns
+        -------
+        float
+        """
+        return random.uniform(0, min(self.max_backoff, self.backoff*2**attempt))
+
+    def rates(self):
+        """
+        Returns
+        -------
+        dict
+            The current requests per second of each host.
+        """
+        return {host : limiter.rate for host, limiter in self._hosts.items()}
@@ -0,0 +1,387 @@
+import asyncio
+from collections import deque, Counter
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional
+from urllib.parse import urlsplit
+
+from .crawler import Crawler, Page
+from .query import find_arg
+from .indeed import SimpleIndeedQuery, AdvancedIndeedQuery
+from .parsers import parse_search_page
+from .transport import HTTPTransport
+
+
+@dataclass
+class ParsedPage:
+    """
+    What a source's parser gets from a page of results, for sources without a parser of
+    their own like `parsers.SearchPageParser`.
+
+    Attributes
+    ----------
+    job_keys: list[str]
+        The keys of the postings on the page.
+    has_next_page: bool
+        True if there are more pages.
+    next_cursor: str
+        The cursor for the next page, for cursor paginated sources.
+    """
+    job_keys : List[str] = field(default_factory=list)
+    has_next_page : bool = False
+    next_cursor : Optional[str] = None
+
+
+class OffsetPagination(object):
+    """
+    Pages that are offset by a number of results, like Indeed's `start` and `limit`.
+
+    Attributes
+    ----------
+    arg_name: str
+        The arg_name of the offset.
+    size_arg_name: str
+        The arg_name of the results per page.
+    default_size: int
+        The results per page when the query doesn't set them.
+    """
+    def __init__(self, arg_name='start', size_arg_name='limit', default_size=10):
+        self.arg_name = arg_name
+        self.size_arg_name = size_arg_name
+        self.default_size = default_size
+
+    def check(self, query_cls):
+        """
+        Raises
+        ------
+        ValueError: If the Query class doesn't have the offset argument.
+        """
+        _arg_name(query_cls, self.arg_name)
+
+    def next_query(self, query, parsed):
+        """
+        Parameters
+        ----------
+        query: Query
+            The query of the page.
+        parsed:
+            The parsed page, with `has_next_page` and optionally `page_number`.
+
+        Returns
+        -------
+        Query
+            The query of the next page, or None if this is the last.
+        """
+        if not parsed.has_next_page:
+            return None
+        name = _arg_name(query, self.arg_name)
+        size_name = find_arg(query, self.size_arg_name)
+        size = (query.arg_value(size_name) if size_name is not None else None) or self.default_size
+        start = query.arg_value(name) or 0
+        page_number = getattr(parsed, 'page_number', None)
+        if page_number is not None and (page_number - 1)*size != start:
+            #Past the last page, the site shows the last page again.
+            return None
+        return query.copy(**{name : start + size})
+
+
+class PageNumberPagination(object):
+    """
+    Pages that are numbered, like `?page=2`.
+
+    Attributes
+    ----------
+    arg_name: str
+        The arg_name of the page number.
+    first: int
+        The number of the first page.
+    """
+    def __init__(self, arg_name='page', first=1):
+        self.arg_name = arg_name
+        self.first = first
+
+    def check(self, query_cls):
+        """
+        Raises
+        ------
+        ValueError: If the Query class doesn't have the page number argument.
+        """
+        _arg_name(query_cls, self.arg_name)
+
+    def next_query(self, query, parsed):
+        if not parsed.has_next_page:
+            return None
+        name = _arg_name(query, self.arg_name)
+        number = query.arg_value(name)
+        return query.copy(**{name : (self.first if number is None else number) + 1})
+
+
+class CursorPagination(object):
+    """
+    Pages that link to the next one with an opaque cursor from the page itself.
+
+    Attributes
+    ----------
+    arg_name: str
+        The arg_name of the cursor.
+    """
+    def __init__(self, arg_name='cursor'):
+        self.arg_name = arg_name
+
+    def check(self, query_cls):
+        """
+        Raises
+        ------
+        ValueError: If the Query class doesn't have the cursor argument.
+        """
+        _arg_name(query_cls, self.arg_name)
+
+    def next_query(self, query, parsed):
+        cursor = getattr(parsed, 'next_cursor', None)
+        if not cursor:
+            return None
+        return query.copy(**{_arg_name(query, self.arg_name) : cursor})
+
+
+def _arg_name(query, arg_name):
+    """
+    Get the name a query, or Query class, uses for a pagination's argument.
+    """
+    name = find_arg(query, arg_name)
+    if name is None:
+        cls = query if isinstance(query, type) else type(query)
+        raise ValueError("%s doesn't have an argument with the arg_name '%s' to paginate with"%(cls.__name__, arg_name))
+    return name
+
+
+@dataclass
+class Source:
+    """
+    How to walk the results of one kind of query.
+
+    Attributes
+    ----------
+    parser: callable
+        Parses the content of a page into something with `job_keys` and `has_next_page`,
+        like `parsers.parse_search_page` or a ParsedPage.
+    pagination:
+        Gets the query of the next page, like OffsetPagination.
+    """
+    parser : Callable
+    pagination : Any
+
+
+_sources = {}
+
+
+def register_source(query_cls, parser, pagination):
+    """
+    Set how the Scheduler walks the results of a Query class and its subclasses.
+
+    Parameters
+    ----------
+    query_cls: type
+    parser: callable
+    pagination:
+        OffsetPagination, PageNumberPagination, CursorPagination, or anything else with
+        a `next_query(query, parsed)` method, and optionally a `check(query_cls)`.
+
+    Raises
+    ------
+    ValueError: If the Query class doesn't have the pagination's argument.
+    """
+    _sources[query_cls] = _checked(query_cls, Source(parser, pagination))
+
+
+def _checked(query_cls, source):
+    check = getattr(source.pagination, 'check', None)
+    if check is not None:
+        check(query_cls)
+    return source
+
+
+def source_for(query, sources=None):
+    """
+    Parameters
+    ----------
+    query: Query
+    sources: dict, optional
+        Sources by Query class, that take priority over the registered ones. Defaults to None.
+
+    Returns
+    -------
+    Source
+        The source of the query's class, or of the closest base class that has one.
+
+    Raises
+    ------
+    ValueError: If no source is registered for the query's class.
+    """
+    for cls in type(query).__mro__:
+        if sources and cls in sources:
+            return sources[cls]
+        if cls in _sources:
+            return _sources[cls]
+    raise ValueError("No source is registered for %s"%type(query).__name__)
+
+
+register_source(SimpleIndeedQuery, parse_search_page, OffsetPagination())
+register_source(AdvancedIndeedQuery, parse_search_page, OffsetPagination())
+
+
+class Scheduler(object):
+    """
+    Walks the pages of queries from any number of sites at once, sharing one crawler.
+
+    Each site's queued pages wait in a queue of their own, and free connections are
+    handed out round robin across the sites with work, so a slow site only ever holds
+    its own share of them. No site has more than `max_per_host` requests in flight, and
+    whatever a slow site can't use goes to the others, so every connection stays busy
+    while any site has pages queued.
+
+    A page that can't be fetched, or raises while it's parsed, is yielded with a status
+    of 0 and its `error`, and ends its query without stopping the others.
+
+    Attributes
+    ----------
+    crawler: Crawler
+        Fetches the pages, with its rate limits, retries and metrics.
+    max_per_host: int
+        The most requests in flight to a single host.
+    sources: dict
+        Sources by Query class, on top of the registered ones.
+
+    Methods
+    -------
+    pages(queries)
+        Asynchronously iterate over the pages of every query as they arrive.
+    crawl(queries)
+        Get the job keys from every page of every query.
+    close()
+        Close the crawler.
+    """
+    def __init__(self, crawler=None, max_per_host=4, sources=None):
+        """
+        Parameters
+        ----------
+        crawler: Crawler, optional
+            Defaults to a Crawler over an HTTPTransport that pools `max_per_host`
+            connections for each host, with 20 requests in flight overall.
+        max_per_host: int, optional
+            The most requests in flight to a single host. Defaults to 4.
+        sources: dict, optional
+            Sources by Query class, on top of the registered ones. Defaults to None.
+
+        Raises
+        ------
+        ValueError: If a Query class in sources doesn't have its pagination's argument.
+        """
+        if crawler is None:
+            crawler = Crawler(HTTPTransport(max_per_host, max_workers=20), max_connections=20)
+        self.crawler = crawler
+        self.max_per_host = max_per_host
+        self.sources = {query_cls : _checked(query_cls, source) for query_cls, source in (sources or {}).items()}
+
+    async def _fetch(self, query, source):
+        """
+        Fetch a page, turning anything it raises into a failed page.
+        """
+        try:
+            return await self.crawler.fetch_page(query, source.parser, source.pagination)
+        except Exception as exc:
+            try:
+                url = query.url
+            except Exception:
+                url = None
+            return Page(query, url, 0, error=exc)
+
+    async def _run(self, queries):
+        """
+        Yield the index of the query each page came from, along with the page.
+        """
+        queues = {}
+        hosts = deque()
+        busy = Counter()
+        in_flight = {}
+
+        def enqueue(index, query):
+            source = source_for(query, self.sources)
+            host = urlsplit(query.base_url).netloc
+            if host not in queues:
+                queues[host] = deque()
+                hosts.append(host)
+            queues[host].append((index, query, source))
+
+        def launch():
+            limit = self.crawler.max_connections
+            launched = True
+            while launched and len(in_flight) < limit:
+                launched = False
+                for _ in range(len(hosts)):
+                    host = hosts[0]
+                    hosts.rotate(-1)
+                    if queues[host] and busy[host] < self.max_per_host and len(in_flight) < limit:
+                        index, query, source = queues[host].popleft()
+                        task = asyncio.ensure_future(self._fetch(query, source))
+                        in_flight[task] = (host, index)
+                        busy[host] += 1
+                        launched = True
+
+        for index, query in enumerate(queries):
+            enqueue(index, query)
+        try:
+            while True:
+                launch()
+                if not in_flight:
+                    break
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    host, index = in_flight.pop(task)
+                    busy[host] -= 1
+                    page = task.result()
+                    if page.next_query is not None:
+                        enqueue(index, page.next_query)
+                    yield index, page
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+    async def pages(self, queries):
+        """
+        Asynchronously iterate over the pages of every query, in the order they arrive.
+        The pages of a single query arrive in order.
+
+        Parameters
+        ----------
+        queries: Iterable[Query]
+            Queries of any registered source, from any number of hosts.
+
+        Yields
+        ------
+        Page
+
+        Raises
+        ------
+        ValueError: If a query's class doesn't have a source.
+        """
+        async for _, page in self._run(queries):
+            yield page
+
+    async def crawl(self, queries):
+        """
+        Parameters
+        ----------
+        queries: Iterable[Query]
+
+        Returns
+        -------
+        list[list[str]]
+            The job keys of each query, in the same order as the queries.
+        """
+        queries = list(queries)
+        keys = [[] for _ in queries]
+        async for index, page in self._run(queries):
+            keys[index].extend(page.job_keys)
+        return keys
+
+    async def close(self):
+        await self.crawler.close()
@@ -0,0 +1,300 @@
+import json
+from array import array
+
+from .serialize import encode_array, decode_array
+from .text import tokenize, segments
+
+#What each keyword argument matches, by arg_name: the field, and how its words are combined.
+OPERATORS = {
+    'q' : ('text', 'all'),
+    'as_and' : ('text', 'all'),
+    'as_phr' : ('text', 'phrase'),
+    'as_any' : ('text', 'any'),
+    'as_not' : ('text', 'none'),
+    'as_ttl' : ('title', 'all'),
+    'as_cmp' : ('company', 'phrase'),
+}
+
+FIELDS = ('text', 'title', 'company')
+
+
+class PostingIndex(object):
+    """
+    An in memory inverted index over parsed postings that answers the keyword arguments
+    of a query locally.
+
+    Each field maps a word to the positions it has in each document, so phrases are
+    matched from the postings alone. The 'text' field is the whole posting, and the
+    'title' and 'company' fields are indexed separately for `as_ttl` and `as_cmp`.
+    Positions skip one between the pieces of a posting, so a phrase never matches across
+    the end of one item and the start of the next.
+
+    Records can be added at any time. Adding a job key again replaces its posting; the
+    old document is dropped from results straight away and its postings are cleared out
+    by `compact`.
+
+    Attributes
+    ----------
+    job_keys: list[str]
+        The job key of each document, by document id. Replaced documents are None.
+
+    Methods
+    -------
+    add(record)
+        Index a parsed posting.
+    extend(records)
+        Index parsed postings, like those from `pipeline.parse_records`.
+    search(query)
+        Get the job keys of the postings that match a query's keywords.
+    compact()
+        Drop the postings of replaced documents.
+    save(path)
+    load(path)
+    """
+    def __init__(self):
+        self.job_keys = []
+        self._docs = {}
+        self._postings = {field : {} for field in FIELDS}
+        self._removed = 0
+
+    def __len__(self):
+        return len(self._docs)
+
+    def __contains__(self, job_key):
+        return job_key in self._docs
+
+    def _index(self, field, doc, segments):
+        postings = self._postings[field]
+        position = 0
+        for segment in segments:
+            for word in tokenize(segment):
+                positions = postings.setdefault(word, {}).get(doc)
+                if positions is None:
+                    positions = postings[word][doc] = array('I')
+                positions.append(position)
+                position += 1
+            position += 1
+
+    def add(self, record):
+        """
+        Parameters
+        ----------
+        record: dict
+            A parsed posting with a 'job_key', and any of 'title', 'company_name' and
+            'sections', like the records of `pipeline.parse_records`.
+
+        Returns
+        -------
+        int
+            The document id of the posting.
+        """
+        job_key = record['job_key']
+        old = self._docs.get(job_key)
+        if old is not None:
+            self.job_keys[old] = None
+            self._removed += 1
+        doc = len(self.job_keys)
+        self.job_keys.append(job_key)
+        self._docs[job_key] = doc
+        self._index('text', doc, segments(record))
+        self._index('title', doc, [record.get('title')])
+        self._index('company', doc, [record.get('company_name')])
+        return doc
+
+    def extend(self, records):
+        """
+        Parameters
+        ----------
+        records: Iterable[dict]
+
+        Returns
+        -------
+        int
+            The number of records added.
+        """
+        count = 0
+        for record in records:
+            self.add(record)
+            count += 1
+        return count
+
+    def _docs_with(self, field, word):
+        return self._postings[field].get(word, {})
+
+    def _all_words(self, field, words):
+        """
+        Get the ids of the documents with every word in a field, smallest posting list first.
+        """
+        lists = sorted((self._docs_with(field, word) for word in set(words)), key=len)
+        if not lists:
+            return None
+        docs = set(lists[0])
+        for postings in lists[1:]:
+            docs.intersection_update(postings)
+            if not docs:
+                break
+        return docs
+
+    def _phrase(self, field, words):
+        """
+        Get the ids of the documents with the words in a field one after another.
+        """
+        docs = self._all_words(field, words)
+        if not docs or len(words) == 1:
+            return docs
+        postings = [self._docs_with(field, word) for word in words]
+        matches = set()
+        for doc in docs:
+            #Offset each word's positions back to where the phrase would start.
+            starts = set(postings[0][doc])
+            for offset, word_postings in enumerate(postings[1:], 1):
+                starts.intersection_update(position - offset for position in word_postings[doc])
+                if not starts:
+                    break
+            if starts:
+                matches.add(doc)
+        return matches
+
+    def _any_words(self, field, words):
+        docs = set()
+        for word in set(words):
+            docs.update(self._docs_with(field, word))
+        return docs
+
+    def conditions(self, query):
+        """
+        Get the keyword conditions of a query that the index evaluates.
+
+        Parameters
+        ----------
+        query: Query
+
+        Returns
+        -------
+        list[tuple]
+            (field, operator, words) for each keyword argument with a value, with the
+            operator one of 'all', 'phrase', 'any' or 'none'.
+        """
+        conditions = []
+        for name, arg in query._args.items():
+            operator = OPERATORS.get(arg.arg_name)
+            val = query.arg_value(name)
+            if operator is None or not isinstance(val, str):
+                continue
+            words = tokenize(val)
+            if words:
+                conditions.append(operator + (words,))
+        return conditions
+
+    def search(self, query):
+        """
+        Get the postings that match the keyword arguments of a query: `as_and`, `as_phr`,
+        `as_any`, `as_not`, `as_ttl` and `as_cmp`, with a `q` taken as all of its words.
+
+        Every other argument, like the location or the age, is left to the crawl that
+        found the postings.
+
+        Parameters
+        ----------
+        query: Query
+            Like an AdvancedIndeedQuery or SimpleIndeedQuery.
+
+        Returns
+        -------
+        list[str]
+            The job keys of the matching postings, in the order they were added.
+        """
+        docs = None
+        excluded = set()
+        for field, operator, words in self.conditions(query):
+            if operator == 'none':
+                excluded.update(self._any_words(field, words))
+                continue
+            if operator == 'all':
+                matches = self._all_words(field, words)
+            elif operator == 'phrase':
+                matches = self._phrase(field, words)
+            else:
+                matches = self._any_words(field, words)
+            docs = matches if docs is None else docs & matches
+            if not docs:
+                return []
+        if docs is None:
+            docs = self._docs.values()
+        job_keys = self.job_keys
+        return [job_keys[doc] for doc in sorted(docs) if doc not in excluded and job_keys[doc] is not None]
+
+    def compact(self):
+        """
+        Drop the postings of replaced documents.
+
+        Returns
+        -------
+        int
+            The number of documents dropped.
+        """
+        if not self._removed:
+            return 0
+        job_keys = self.job_keys
+        for postings in self._postings.values():
+            for word in list(postings):
+                docs = postings[word]
+                for doc in [doc for doc in docs if job_keys[doc] is None]:
+                    del docs[doc]
+                if not docs:
+                    del postings[word]
+        removed, self._removed = self._removed, 0
+        return removed
+
+    def save(self, path):
+        """
+        Write the index to a JSON file. The postings of each word are kept as base64
+        encoded arrays of its documents, the number of positions in each, and the
+        positions one after another.
+
+        Parameters
+        ----------
+        path: str
+        """
+        postings = {}
+        for field, words in self._postings.items():
+            postings[field] = field_postings = {}
+            for word, docs in words.items():
+                counts = array('I', [len(positions) for positions in docs.values()])
+                positions = array('I')
+                for doc_positions in docs.values():
+                    positions.extend(doc_positions)
+                field_postings[word] = [encode_array(array('I', docs)), encode_array(counts), encode_array(positions)]
+        state = {'job_keys' : self.job_keys, 'removed' : self._removed, 'postings' : postings}
+        with open(path, 'w', encoding='utf-8') as index_file:
+            json.dump(state, index_file)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read an index written by `save`. More records can be added to it.
+
+        Parameters
+        ----------
+        path: str
+
+        Returns
+        -------
+        PostingIndex
+        """
+        with open(path, encoding='utf-8') as index_file:
+            state = json.load(index_file)
+        index = cls()
+        index.job_keys = state['job_keys']
+        index._removed = state['removed']
+        for field, words in state['postings'].items():
+            field_postings = index._postings[field]
+            for word, (docs, counts, positions) in words.items():
+                positions = decode_array('I', positions)
+                field_postings[word] = word_postings = {}
+                offset = 0
+                for doc, count in zip(decode_array('I', docs), decode_array('I', counts)):
+                    word_postings[doc] = positions[offset:offset + count]
+                    offset += count
+        index._docs = {job_key : doc for doc, job_key in enumerate(index.job_keys) if job_key is not None}
+        return index
@@ -0,0 +1,359 @@
+import base64
+import importlib
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+MAGIC = b'JSQB'
+VERSION = 1
+NULL_INDEX = 0xFFFFFFFF
+NULL_INT = -(1 << 63)
+BASE_URL = '__base_url__'
+
+_header = struct.Struct('<4sBI')
+
+
+def class_path(query_cls):
+    """
+    Get the path a class is stored under, which `load_class` imports it back from.
+
+    Parameters
+    ----------
+    query_cls: type
+
+    Returns
+    -------
+    str
+        The class's module and qualified name, like 'queries.indeed:SimpleIndeedQuery'.
+
+    Raises
+    ------
+    TypeError: If the class can't be imported back from the path, like the schema class
+        of a `Query(base_url, **kwargs)`, which is only created at runtime. Declare the
+        arguments in the `_kwargs` of a module level subclass instead.
+    """
+    path = '%s:%s'%(query_cls.__module__, query_cls.__qualname__)
+    try:
+        found = load_class(path)
+    except (ImportError, AttributeError):
+        found = None
+    if found is not query_cls:
+        raise TypeError("Can't store %s; it can't be imported back from '%s'. Declare its arguments in the "
+                        "_kwargs of a module level Query subclass."%(query_cls.__name__, path))
+    return path
+
+
+def load_class(path):
+    """
+    Import a class from the path `class_path` gives it.
+
+    Parameters
+    ----------
+    path: str
+
+    Returns
+    -------
+    type
+    """
+    module, qualname = path.split(':')
+    obj = importlib.import_module(module)
+    for part in qualname.split('.'):
+        obj = getattr(obj, part)
+    return obj
+
+
+def encode_array(data):
+    """
+    Encode an array as base64 text of its little endian bytes, for saving in JSON.
+
+    Parameters
+    ----------
+    data: array.array
+
+    Returns
+    -------
+    str
+    """
+    if sys.byteorder == 'big':
+        data = array(data.typecode, data)
+        data.byteswap()
+    return base64.b64encode(data.tobytes()).decode('ascii')
+
+
+def decode_array(typecode, text):
+    """
+    Decode an array written by `encode_array`.
+
+    Parameters
+    ----------
+    typecode: str
+    text: str
+
+    Returns
+    -------
+    array.array
+    """
+    data = array(typecode)
+    data.frombytes(base64.b64decode(text))
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data
+
+
+def _column_kind(arg):
+    """
+    Get how an argument's values are stored: 'const', 'choice', 'int' or 'str'.
+    """
+    if not arg.mutable:
+        return 'const'
+    if arg.choices:
+        return 'choice'
+    if arg.type is int:
+        return 'int'
+    return 'str'
+
+
+class _StringTable(object):
+    """
+    Interns strings while saving, each stored once however many rows use it.
+    """
+    def __init__(self):
+        self.indexes = {}
+        self.strings = []
+
+    def index(self, val):
+        if val is None:
+            return NULL_INDEX
+        try:
+            return self.indexes[val]
+        except KeyError:
+            if not isinstance(val, str):
+                raise TypeError("Expected a str to store; got %s"%type(val))
+            index = self.indexes[val] = len(self.strings)
+            self.strings.append(val)
+            return index
+
+    def encode(self):
+        blob = bytearray()
+        offsets = array('I', [0])
+        for string in self.strings:
+            blob += string.encode('utf-8')
+            offsets.append(len(blob))
+        return offsets, bytes(blob)
+
+
+def save(queries, path):
+    """
+    Save a batch of queries of one class in a compact columnar file.
+
+    Arguments with choices are stored as one or two byte codes, ints as 8 bytes, and
+    strings as indexes into a table where each distinct string is stored once. Immutable
+    arguments aren't stored at all. The columns are in the machine's byte order, which
+    the header records, and are swapped when they're loaded on a machine of the other order.
+
+    Parameters
+    ----------
+    queries: Iterable[Query]
+        Queries that are all of the same class.
+    path: str
+
+    Raises
+    ------
+    ValueError: If there aren't any queries, since the class can't be known.
+    TypeError: If the queries aren't all of the same class, the class can't be imported
+        back, see `class_path`, or a value can't be stored.
+    """
+    queries = list(queries)
+    if not queries:
+        raise ValueError("Expected at least one query to save.")
+    query_cls = type(queries[0])
+    if any(type(query) is not query_cls for query in queries):
+        raise TypeError("Expected every query to be a %s"%query_cls.__name__)
+
+    strings = _StringTable()
+    columns = [(BASE_URL, 'str', array('I', (strings.index(query.base_url) for query in queries)))]
+    for pos, (name, arg) in enumerate(query_cls._args.items()):
+        kind = _column_kind(arg)
+        values = [query._values[pos] for query in queries]
+        if kind == 'const':
+            continue
+        if kind == 'choice':
+            codes = {choice : code + 1 for code, choice in enumerate(arg.choices)}
+            data = array('B' if len(codes) < 255 else 'H')
+            try:
+                data.extend(0 if val is None else codes[val] for val in values)
+            except KeyError as error:
+                raise TypeError("Can't store %s for '%s'; it isn't one of %s"%(error, name, arg.choices))
+        elif kind == 'int':
+            data = array('q', (NULL_INT if val is None else val for val in values))
+        else:
+            data = array('I', (strings.index(val) for val in values))
+        columns.append((name, kind, data))
+    offsets, blob = strings.encode()
+    columns.append(('__string_offsets__', 'offsets', offsets))
+    columns.append(('__strings__', 'blob', blob))
+
+    header = {'class' : class_path(query_cls), 'count' : len(queries), 'byteorder' : sys.byteorder, 'columns' : []}
+    body = bytearray()
+    for name, kind, data in columns:
+        body += b'\0'*(-len(body)%8)
+        raw = data.tobytes() if isinstance(data, array) else data
+        header['columns'].append({'name' : name, 'kind' : kind, 'offset' : len(body), 'nbytes' : len(raw),
+                                  'typecode' : data.typecode if isinstance(data, array) else 'B'})
+        body += raw
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    header_bytes += b' '*(-(_header.size + len(header_bytes))%8)
+    with open(path, 'wb') as out:
+        out.write(_header.pack(MAGIC, VERSION, len(header_bytes)))
+        out.write(header_bytes)
+        out.write(body)
+
+
+class QueryBatch(object):
+    """
+    A memory mapped batch of saved queries, materialized lazily one row at a time.
+
+    The columns are read straight out of the mapped file, and a row's strings are only
+    decoded when that row is used. The saved values were valid when they were saved, so
+    they aren't checked again.
+
+    Attributes
+    ----------
+    query_cls: type
+        The class of the saved queries.
+
+    Methods
+    -------
+    column(name)
+        Get the decoded values of one argument for every row.
+    close()
+        Unmap the file.
+    """
+    def __init__(self, path, query_cls=None):
+        """
+        Parameters
+        ----------
+        path: str
+        query_cls: type, optional
+            The class of the saved queries. Defaults to the class recorded in the file.
+        """
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_size = _header.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("%s isn't a version %i query batch"%(path, VERSION))
+        header = json.loads(bytes(self._map[_header.size:_header.size + header_size]))
+        self.query_cls = query_cls if query_cls is not None else load_class(header['class'])
+        self._count = header['count']
+
+        view = memoryview(self._map)[_header.size + header_size:]
+        swap = header.get('byteorder', 'little') != sys.byteorder
+        self._columns = {}
+        for column in header['columns']:
+            data = view[column['offset']:column['offset'] + column['nbytes']]
+            if column['kind'] != 'blob':
+                if swap:
+                    #Written on a machine of the other byte order, so the column is copied to swap it.
+                    data = array(column['typecode'], data.tobytes())
+                    data.byteswap()
+                else:
+                    data = data.cast(column['typecode'])
+            self._columns[column['name']] = (column['kind'], data)
+        self._offsets = self._columns.pop('__string_offsets__')[1]
+        self._blob = self._columns.pop('__strings__')[1]
+        self._strings = {}
+
+        self._decoders = []
+        for pos, (name, arg) in enumerate(self.query_cls._args.items()):
+            if name in self._columns:
+                kind, data = self._columns[name]
+                self._decoders.append((pos, self._decoder(kind, arg), data))
+
+    def _string(self, index):
+        if index == NULL_INDEX:
+            return None
+        try:
+            return self._strings[index]
+        except KeyError:
+            string = self._strings[index] = str(self._blob[self._offsets[index]:self._offsets[index + 1]], 'utf-8')
+            return string
+
+    def _decoder(self, kind, arg):
+        if kind == 'choice':
+            choices = (None, ) + tuple(arg.choices)
+            return choices.__getitem__
+        if kind == 'int':
+            return lambda val: None if val == NULL_INT else val
+        return self._string
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += self._count
+        if not 0 <= row < self._count:
+            raise IndexError("Row %i is out of range for %i queries"%(row, self._count))
+        query_cls = self.query_cls
+        query = object.__new__(query_cls)
+        values = list(query_cls._defaults)
+        for pos, decode, data in self._decoders:
+            values[pos] = decode(data[row])
+        query._values = values
+        query._params = None
+        query.base_url = self._string(self._columns[BASE_URL][1][row])
+        return query
+
+    def __iter__(self):
+        for row in range(self._count):
+            yield self[row]
+
+    def column(self, name):
+        """
+        Parameters
+        ----------
+        name: str
+            The name of an argument of the query class.
+
+        Returns
+        -------
+        list
+        """
+        arg = self.query_cls._args[name]
+        if name not in self._columns:
+            return [arg.value]*self._count
+        kind, data = self._columns[name]
+        return list(map(self._decoder(kind, arg), data))
+
+    def close(self):
+        self._decoders = []
+        self._columns = {}
+        self._offsets = self._blob = None
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load(path, query_cls=None):
+    """
+    Memory map a saved batch of queries.
+
+    Parameters
+    ----------
+    path: str
+    query_cls: type, optional
+        The class of the saved queries. Defaults to the class recorded in the file.
+
+    Returns
+    -------
+    QueryBatch
+    """
+    return QueryBatch(path, query_cls)
@@ -0,0 +1,359 @@
+import json
+import sqlite3
+import threading
+from dataclasses import dataclass
+from hashlib import blake2b
+from time import time
+from typing import Optional
+
+from .pipeline import RECORD_FIELDS
+
+#The fields of a posting record whose content is compared between crawls.
+CONTENT_FIELDS = tuple(name for name in RECORD_FIELDS if name != 'job_key')
+
+ADDED = 'added'
+MODIFIED = 'modified'
+REMOVED = 'removed'
+
+
+@dataclass
+class Change:
+    """
+    A posting that was added, modified or removed in a crawl.
+
+    Attributes
+    ----------
+    kind: str
+        'added', 'modified' or 'removed'.
+    job_key: str
+    record: dict
+        The content of the posting after the change, or None for a removal.
+    crawl: int
+        The number of the crawl that saw the change.
+    at: float
+        The timestamp of the crawl.
+    previous: dict
+        The content of the posting before the change, for a modification or removal
+        from `SnapshotStore.diff`, otherwise None.
+    """
+    kind : str
+    job_key : str
+    record : Optional[dict]
+    crawl : int
+    at : float
+    previous : Optional[dict] = None
+
+
+class SnapshotStore(object):
+    """
+    A SQLite store of the postings of the latest crawl, keyed by job key with a hash of
+    their content, and an append only history of every change between crawls.
+
+    Each crawl's records are compared with the stored hashes as they stream through
+    `diff`, which gets the postings that were added or modified, followed by those
+    that weren't in the crawl. An unchanged posting costs a hash and its share of a
+    batched lookup, and only the changes are written, so the writes and the history
+    grow with the changes rather than the size of each crawl. A crawl's changes are
+    committed together once it's finished, or not at all.
+
+    The history holds the content of every added and modified posting, so the postings
+    as of any earlier crawl or time can be read back.
+
+    Attributes
+    ----------
+    path: str
+        The path of the SQLite file, or ':memory:'.
+    fields: tuple[str]
+        The fields of a record whose content is compared.
+    batch_size: int
+        The records whose stored hashes are looked up at once in a diff.
+
+    Methods
+    -------
+    content_hash(record)
+        Get the hash of a record's content.
+    diff(records, at=None, complete=True)
+        Record a crawl, and get its changes.
+    changes(since=None, until=None, kinds=None)
+        Iterate over the changes recorded between two times.
+    as_of(at=None, crawl=None)
+        Iterate over the postings as they were at a time or crawl.
+    posting_history(job_key)
+        Get every change to a posting.
+    crawls()
+        Get the number, time and change counts of every crawl.
+    close()
+        Close the database.
+    """
+    def __init__(self, path, fields=CONTENT_FIELDS, batch_size=500):
+        """
+        Parameters
+        ----------
+        path: str
+            The path of the SQLite file, or ':memory:'.
+        fields: tuple[str], optional
+            The fields of a record whose content is compared. Defaults to every field of
+            a parsed posting except its job key.
+        batch_size: int, optional
+            The records whose stored hashes are looked up at once in a diff. Defaults to 500.
+        """
+        self.path = path
+        self.fields = tuple(fields)
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._diffing = False
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS postings (job_key TEXT PRIMARY KEY, hash BLOB, seq INTEGER) '
+                         'WITHOUT ROWID')
+        self._db.execute('CREATE TABLE IF NOT EXISTS history ('
+                         'seq INTEGER PRIMARY KEY, crawl INTEGER, at REAL, job_key TEXT, kind TEXT, hash BLOB, '
+                         'record TEXT)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS history_key ON history (job_key, seq)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS history_at ON history (at, seq)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS crawls ('
+                         'crawl INTEGER PRIMARY KEY, at REAL, complete INTEGER, seen INTEGER, added INTEGER, '
+                         'modified INTEGER, removed INTEGER)')
+        #The job keys seen by the crawl being diffed, which never touch the file.
+        self._db.execute('CREATE TEMP TABLE seen (job_key TEXT PRIMARY KEY) WITHOUT ROWID')
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM postings').fetchone()[0]
+
+    def _content(self, record):
+        return json.dumps({name : record.get(name) for name in self.fields}, sort_keys=True, separators=(',', ':'))
+
+    def content_hash(self, record):
+        """
+        Parameters
+        ----------
+        record: dict
+            A parsed posting, like those of `pipeline.parse_records`.
+
+        Returns
+        -------
+        bytes
+            A 16 byte hash of the record's fields, the same for records with equal content
+            whatever the order of their keys.
+        """
+        return blake2b(self._content(record).encode('utf-8'), digest_size=16).digest()
+
+    def _change(self, row):
+        seq, crawl, at, job_key, kind, record = row
+        return Change(kind, job_key, json.loads(record) if record is not None else None, crawl, at)
+
+    def _stored(self, job_keys):
+        """
+        Get the stored hash and history seq of each of a batch of job keys.
+        """
+        stored = {}
+        for start in range(0, len(job_keys), 500):
+            chunk = job_keys[start:start + 500]
+            stored.update((job_key, (digest, seq)) for job_key, digest, seq in self._db.execute(
+                'SELECT job_key, hash, seq FROM postings WHERE job_key IN (%s)'%', '.join('?'*len(chunk)), chunk))
+        return stored
+
+    def _record(self, seq):
+        row = self._db.execute('SELECT record FROM history WHERE seq = ?', (seq, )).fetchone()
+        return json.loads(row[0]) if row is not None and row[0] is not None else None
+
+    def diff(self, records, at=None, complete=True):
+        """
+        Record a crawl, and get its changes.
+
+        The records are compared as they stream through, and the crawl's changes are
+        committed together before they're returned. If the records raise, none of the
+        crawl is recorded. The store is locked for the whole diff, so other threads
+        never read a crawl that's half recorded; the records mustn't be read from the
+        store itself.
+
+        Parameters
+        ----------
+        records: Iterable[dict]
+            The parsed postings of the crawl, each with a 'job_key'.
+        at: float, optional
+            The timestamp of the crawl. Defaults to now.
+        complete: bool, optional
+            True if the crawl covered every posting, so those it didn't see were removed.
+            A partial crawl only adds and modifies postings. Defaults to True.
+
+        Returns
+        -------
+        list[Change]
+            Each added or modified posting in the order of the records, then each
+            removed posting.
+
+        Raises
+        ------
+        RuntimeError: If another diff is in progress.
+        """
+        at = time() if at is None else at
+        db = self._db
+        if self._diffing:
+            raise RuntimeError("Another diff of %s is in progress"%self.path)
+        with self._lock:
+            self._diffing = True
+            db.execute('BEGIN IMMEDIATE')
+            changes = []
+            try:
+                crawl = db.execute('INSERT INTO crawls (at, complete) VALUES (?, ?)', (at, int(complete))).lastrowid
+                counts = {ADDED : 0, MODIFIED : 0, REMOVED : 0}
+                for batch in _batches(records, self.batch_size):
+                    contents = [(record['job_key'], self._content(record)) for record in batch]
+                    db.executemany('INSERT OR IGNORE INTO temp.seen VALUES (?)',
+                                   [(job_key, ) for job_key, _ in contents])
+                    stored = self._stored([job_key for job_key, _ in contents])
+                    for job_key, content in contents:
+                        digest = blake2b(content.encode('utf-8'), digest_size=16).digest()
+                        row = stored.get(job_key)
+                        if row is not None and row[0] == digest:
+                            continue
+                        kind = ADDED if row is None else MODIFIED
+                        previous = self._record(row[1]) if row is not None else None
+                        seq = db.execute('INSERT INTO history (crawl, at, job_key, kind, hash, record) '
+                                         'VALUES (?, ?, ?, ?, ?, ?)',
+                                         (crawl, at, job_key, kind, digest, content)).lastrowid
+                        db.execute('INSERT OR REPLACE INTO postings VALUES (?, ?, ?)', (job_key, digest, seq))
+                        #A job key that repeats in the batch is compared with this version.
+                        stored[job_key] = (digest, seq)
+                        counts[kind] += 1
+                        changes.append(Change(kind, job_key, json.loads(content), crawl, at, previous))
+
+                if complete:
+                    removed = db.execute('SELECT job_key, seq FROM postings '
+                                         'WHERE job_key NOT IN (SELECT job_key FROM temp.seen)').fetchall()
+                    for job_key, seq in removed:
+                        previous = self._record(seq)
+                        db.execute('INSERT INTO history (crawl, at, job_key, kind) VALUES (?, ?, ?, ?)',
+                                   (crawl, at, job_key, REMOVED))
+                        db.execute('DELETE FROM postings WHERE job_key = ?', (job_key, ))
+                        counts[REMOVED] += 1
+                        changes.append(Change(REMOVED, job_key, None, crawl, at, previous))
+
+                seen = db.execute('SELECT COUNT(*) FROM temp.seen').fetchone()[0]
+                db.execute('UPDATE crawls SET seen = ?, added = ?, modified = ?, removed = ? WHERE crawl = ?',
+                           (seen, counts[ADDED], counts[MODIFIED], counts[REMOVED], crawl))
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+            finally:
+                db.execute('DELETE FROM temp.seen')
+                self._diffing = False
+        return changes
+
+    def changes(self, since=None, until=None, kinds=None):
+        """
+        Iterate over the changes recorded between two times, in the order they were made.
+
+        Parameters
+        ----------
+        since: float, optional
+            Only changes after this timestamp. Defaults to None, from the first crawl.
+        until: float, optional
+            Only changes at or before this timestamp. Defaults to None, up to the last crawl.
+        kinds: Iterable[str], optional
+            Only changes of these kinds. Defaults to None, every kind.
+
+        Yields
+        ------
+        Change
+        """
+        conditions, params = [], []
+        if since is not None:
+            conditions.append('at > ?')
+            params.append(since)
+        if until is not None:
+            conditions.append('at <= ?')
+            params.append(until)
+        if kinds is not None:
+            kinds = list(kinds)
+            conditions.append('kind IN (%s)'%', '.join('?'*len(kinds)))
+            params.extend(kinds)
+        sql = 'SELECT seq, crawl, at, job_key, kind, record FROM history'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        with self._lock:
+            rows = self._db.execute(sql + ' ORDER BY seq', params).fetchall()
+        for row in rows:
+            yield self._change(row)
+
+    def as_of(self, at=None, crawl=None):
+        """
+        Iterate over the postings as they were at a time, or after a crawl.
+
+        Parameters
+        ----------
+        at: float, optional
+            The timestamp to read the postings at. Defaults to None.
+        crawl: int, optional
+            The number of the crawl to read the postings after, in place of a timestamp.
+            Defaults to None, which with no timestamp reads the latest postings.
+
+        Yields
+        ------
+        dict
+            The content of each posting with its 'job_key', in job key order.
+        """
+        if crawl is not None:
+            condition, param = 'crawl <= ?', crawl
+        elif at is not None:
+            condition, param = 'at <= ?', at
+        else:
+            condition, param = '1', None
+        sql = ('SELECT history.job_key, history.record FROM history JOIN '
+               '(SELECT job_key, MAX(seq) AS seq FROM history WHERE %s GROUP BY job_key) AS latest '
+               'ON history.seq = latest.seq WHERE history.kind != ? ORDER BY history.job_key'%condition)
+        params = ((param, ) if param is not None else ()) + (REMOVED, )
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        for job_key, record in rows:
+            record = json.loads(record)
+            record['job_key'] = job_key
+            yield record
+
+    def posting_history(self, job_key):
+        """
+        Parameters
+        ----------
+        job_key: str
+
+        Returns
+        -------
+        list[Change]
+            Every change to the posting, oldest first.
+        """
+        with self._lock:
+            rows = self._db.execute('SELECT seq, crawl, at, job_key, kind, record FROM history '
+                                    'WHERE job_key = ? ORDER BY seq', (job_key, )).fetchall()
+        return [self._change(row) for row in rows]
+
+    def crawls(self):
+        """
+        Returns
+        -------
+        list[dict]
+            The 'crawl', 'at', 'complete', 'seen', 'added', 'modified' and 'removed' of
+            every recorded crawl, oldest first.
+        """
+        with self._lock:
+            rows = self._db.execute('SELECT crawl, at, complete, seen, added, modified, removed FROM crawls '
+                                    'ORDER BY crawl').fetchall()
+        names = ('crawl', 'at', 'complete', 'seen', 'added', 'modified', 'removed')
+        return [dict(zip(names, row), complete=bool(row[2])) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def _batches(records, size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,46 @@
+import json
+import re
+
+#Words are runs of letters and digits, keeping a trailing '+' or '#' so 'C++' and 'C#' are words.
+_WORD = re.compile(r"\w[\w+#]*")
+
+
+def tokenize(text):
+    """
+    Split text into lower case words.
+
+    Parameters
+    ----------
+    text: str
+
+    Returns
+    -------
+    list[str]
+    """
+    return _WORD.findall(text.lower()) if text else []
+
+
+def segments(record):
+    """
+    Get the pieces of text of a record's 'text' field: its title, company name and the
+    headings and items of its sections.
+
+    Parameters
+    ----------
+    record: dict
+        A parsed posting, whose 'sections' can be a list or the JSON a CsvSink writes.
+
+    Returns
+    -------
+    list[str]
+        The pieces that aren't empty, in order.
+    """
+    pieces = [record.get('title'), record.get('company_name')]
+    sections = record.get('sections') or []
+    if isinstance(sections, str):
+        #Records read back from a CsvSink keep the sections as JSON.
+        sections = json.loads(sections)
+    for section in sections:
+        pieces.append(section.get('heading'))
+        pieces.extend(section.get('items') or [])
+    return [piece for piece in pieces if piece]
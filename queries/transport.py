@@ -0,0 +1,247 @@
+import asyncio
+import http.client
+from dataclasses import dataclass, field
+from queue import LifoQueue, Empty, Full
+from time import monotonic
+from urllib.parse import urlsplit, urljoin
+from concurrent.futures import ThreadPoolExecutor
+
+
+@dataclass
+class Response:
+    """
+    A fetched http response.
+
+    Attributes
+    ----------
+    url: str
+        The requested url.
+    status: int
+        The http status code.
+    headers: dict
+        The response headers, with lower case names.
+    body: bytes
+        The response content.
+    """
+    url : str
+    status : int
+    headers : dict = field(default_factory=dict)
+    body : bytes = b''
+
+    @property
+    def ok(self):
+        """
+        bool: True if the status code is a 2xx code.
+        """
+        return 200 <= self.status < 300
+
+    @property
+    def text(self):
+        """
+        str: The body decoded as utf-8.
+        """
+        return self.body.decode('utf-8', errors='replace')
+
+
+class Transport(object):
+    """
+    The interface for fetching urls in the crawlers.
+
+    Any object with an async `fetch` and `close` can be used, which lets tests and
+    offline runs swap in something other than the network.
+
+    Methods
+    -------
+    fetch(url, headers=None)
+        Fetch a url.
+    close()
+        Release any resources held by the transport.
+    """
+    async def fetch(self, url, headers=None):
+        """
+        Parameters
+        ----------
+        url: str
+            The url to fetch.
+        headers: dict, optional
+            Any extra request headers. Defaults to None.
+
+        Returns
+        -------
+        Response
+        """
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class HTTPTransport(Transport):
+    """
+    A transport over `http.client` that keeps a bounded pool of keep-alive
+    connections for each host, with the blocking requests run in a thread pool.
+
+    Attributes
+    ----------
+    max_connections: int
+        The most connections kept open for a single host.
+    timeout: float
+        The socket timeout in seconds.
+    headers: dict
+        The headers sent with every request.
+    max_redirects: int
+        The most redirects followed for a single fetch.
+    max_workers: int
+        The most requests in flight at once across every host.
+    """
+    default_headers = {
+        'User-Agent' : 'Mozilla/5.0 (X11; Linux x86_64) JobSearch',
+        'Accept-Encoding' : 'identity',
+    }
+
+    def __init__(self, max_connections=10, timeout=30.0, headers=None, max_redirects=5, max_workers=None):
+        """
+        Parameters
+        ----------
+        max_connections: int, optional
+            The most connections kept open for a single host. Defaults to 10.
+        timeout: float, optional
+            The socket timeout in seconds. Defaults to 30.
+        headers: dict, optional
+            Headers to send with every request on top of the defaults. Defaults to None.
+        max_redirects: int, optional
+            The most redirects followed for a single fetch. Defaults to 5.
+        max_workers: int, optional
+            The most requests in flight at once across every host. Defaults to max_connections.
+        """
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.headers = dict(self.default_headers, **(headers or {}))
+        self.max_redirects = max_redirects
+        self.max_workers = max_workers if max_workers is not None else max_connections
+        self._pools = {}
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+    async def fetch(self, url, headers=None):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.fetch_sync, url, headers)
+
+    def fetch_sync(self, url, headers=None):
+        """
+        Fetch a url, blocking until the response is read.
+
+        Parameters
+        ----------
+        url: str
+            The url to fetch.
+        headers: dict, optional
+            Any extra request headers. Defaults to None.
+
+        Returns
+        -------
+        Response
+        """
+        request_headers = dict(self.headers, **(headers or {}))
+        target = url
+        for _ in range(self.max_redirects + 1):
+            status, response_headers, body = self._request(target, request_headers)
+            location = response_headers.get('location')
+            if status in (301, 302, 303, 307, 308) and location:
+                target = urljoin(target, location)
+                continue
+            break
+        return Response(url, status, response_headers, body)
+
+    async def close(self):
+        for pool in self._pools.values():
+            while True:
+                try:
+                    pool.get_nowait().close()
+                except Empty:
+                    break
+        self._executor.shutdown(wait=False)
+
+    def _request(self, url, headers):
+        """
+        Make a single request on a pooled connection, retrying once on a fresh
+        connection if a reused one was closed by the server.
+        """
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        path = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+        pool = self._pools.setdefault(key, LifoQueue(maxsize=self.max_connections))
+
+        for attempt in range(2):
+            try:
+                conn = pool.get_nowait()
+                reused = True
+            except Empty:
+                conn = self._connect(parts)
+                reused = False
+            try:
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            response_headers = {name.lower() : value for name, value in response.getheaders()}
+            if response.will_close:
+                conn.close()
+            else:
+                try:
+                    pool.put_nowait(conn)
+                except Full:
+                    conn.close()
+            return response.status, response_headers, body
+
+    def _connect(self, parts):
+        if parts.scheme == 'https':
+            return http.client.HTTPSConnection(parts.netloc, timeout=self.timeout)
+        return http.client.HTTPConnection(parts.netloc, timeout=self.timeout)
+
+
+class TokenBucket(object):
+    """
+    An asyncio token bucket for limiting the rate of requests.
+
+    Attributes
+    ----------
+    rate: float
+        The tokens added per second.
+    capacity: float
+        The most tokens the bucket can hold, which is the largest burst allowed.
+    """
+    def __init__(self, rate, capacity=1.0):
+        """
+        Parameters
+        ----------
+        rate: float
+            The tokens added per second.
+        capacity: float, optional
+            The most tokens the bucket can hold. Defaults to 1.
+        """
+        if rate <= 0:
+            raise ValueError("Expected a positive rate; got %s"%rate)
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = monotonic()
+
+    def _refill(self):
+        now = monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated)*self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """
+        Wait until a token is available and take it.
+        """
+        while True:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens)/self.rate)
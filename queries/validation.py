@@ -0,0 +1,189 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+from .query import QueryValueError, QueryRequirementError
+
+
+@dataclass
+class BatchReport:
+    """
+    The result of validating a batch of query values.
+
+    Attributes
+    ----------
+    num_rows: int
+        The number of rows validated.
+    errors: dict
+        The errors for each invalid row, by row index. Each is a list of a QueryValueError
+        and/or a QueryRequirementError, the same errors a Query raises for those values.
+    """
+    num_rows : int
+    errors : Dict[int, List[Exception]] = field(default_factory=dict)
+
+    @property
+    def valid(self):
+        """
+        bool: True if every row is valid.
+        """
+        return not self.errors
+
+    @property
+    def valid_rows(self):
+        """
+        list[bool]: True for each valid row.
+        """
+        return [row not in self.errors for row in range(self.num_rows)]
+
+
+class _ColumnCheck(object):
+    """
+    The precomputed checks for one argument's column of values.
+    """
+    __slots__ = ('name', 'arg', 'type', 'table', 'accepts_none', 'fixed')
+
+    def __init__(self, name, arg):
+        self.name = name
+        self.arg = arg
+        self.type = None if arg.type is Any else arg.type
+        self.accepts_none = not arg.required
+        self.fixed = not arg.mutable
+        self.table = None
+        if arg.choices:
+            try:
+                self.table = frozenset(arg.choices)
+            except TypeError:
+                self.table = None
+
+    def bad_rows(self, column):
+        """
+        Get the rows of a column with invalid values, in one pass over the column.
+        """
+        tp, table, accepts_none, arg = self.type, self.table, self.accepts_none, self.arg
+        bad = []
+        for row, val in enumerate(column):
+            if val is None:
+                if not accepts_none:
+                    bad.append(row)
+                continue
+            if self.fixed and val != arg.value:
+                bad.append(row)
+                continue
+            if tp is not None and not isinstance(val, tp):
+                bad.append(row)
+                continue
+            if table is not None:
+                try:
+                    if val in table:
+                        continue
+                except TypeError:
+                    pass
+                bad.append(row)
+            elif arg.choices and val not in arg.choices:
+                bad.append(row)
+        return bad
+
+    def message(self, val):
+        """
+        Get the same error message that the argument gives for an invalid value.
+        """
+        if self.fixed and val is not None and val != self.arg.value:
+            name = "'%s' (%s)"%(self.arg.arg_name, self.arg.disp_name) if self.arg.disp_name else "'%s'"%self.arg.arg_name
+            return "%s : Expected the immutable value %s; got %s"%(name, self.arg.value, val)
+        return self.arg.value_error(val)
+
+
+class BatchValidator(object):
+    """
+    Validates whole columns of values for a Query class at once, instead of building and
+    checking a query object per row.
+
+    The checks for each argument are compiled once, with the choices as frozenset tables,
+    and each column is checked in a single pass. Only the invalid rows build error messages,
+    which match the ones a Query raises.
+
+    Attributes
+    ----------
+    query_cls: type
+        The Query class whose arguments the values are for.
+
+    Methods
+    -------
+    validate(columns)
+        Validate columns of values by argument name.
+    validate_records(records)
+        Validate rows of values by argument name.
+    """
+    def __init__(self, query_cls):
+        """
+        Parameters
+        ----------
+        query_cls: type
+            A Query class with a schema, e.g. SimpleIndeedQuery.
+        """
+        self.query_cls = query_cls
+        self._checks = {name : _ColumnCheck(name, arg) for name, arg in query_cls._args.items()}
+        missing = query_cls._plan.missing
+        self._requirement_error = QueryRequirementError("Missing required querty arguements.", missing) if missing else None
+
+    def validate(self, columns):
+        """
+        Parameters
+        ----------
+        columns: dict
+            A sequence of values for each argument, by argument name. Every sequence should
+            have the same length. Arguments without a column use their default value.
+
+        Returns
+        -------
+        BatchReport
+
+        Raises
+        ------
+        ValueError: If a column's name isn't a valid arg, or the columns differ in length.
+        """
+        lengths = {len(column) for column in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError("Expected columns of the same length; got lengths %s"%sorted(lengths))
+        num_rows = lengths.pop() if lengths else 0
+        for name in columns:
+            if name not in self._checks:
+                raise ValueError("No arg named '%s' defined on the query"%name)
+
+        messages = {}
+        for name, check in self._checks.items():
+            if name in columns:
+                column = columns[name]
+                for row in check.bad_rows(column):
+                    messages.setdefault(row, []).append(check.message(column[row]))
+            elif num_rows and check.bad_rows((check.arg.value, )):
+                message = check.message(check.arg.value)
+                for row in range(num_rows):
+                    messages.setdefault(row, []).append(message)
+
+        report = BatchReport(num_rows)
+        for row in sorted(messages):
+            report.errors[row] = [QueryValueError("Invalvid Query Values.", messages[row])]
+        if self._requirement_error is not None:
+            for row in range(num_rows):
+                report.errors.setdefault(row, []).append(self._requirement_error)
+        return report
+
+    def validate_records(self, records):
+        """
+        Parameters
+        ----------
+        records: Iterable[dict]
+            The values of each row by argument name. Missing values use their defaults.
+
+        Returns
+        -------
+        BatchReport
+        """
+        records = list(records)
+        names = set()
+        for record in records:
+            names.update(record)
+        columns = {name : [record.get(name, self.query_cls._args[name].value) if name in self._checks else None
+                           for record in records]
+                   for name in names}
+        return self.validate(columns)
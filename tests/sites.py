@@ -0,0 +1,117 @@
+"""
+Fake sites for the tests, served through a Transport so nothing touches the network.
+"""
+import asyncio
+import random
+from urllib.parse import urlsplit, parse_qsl
+
+from queries.locations import LocationNormalizer, DEFAULT_RADIUS, distance
+from queries.transport import Response, Transport
+
+JOB_TYPES = ('fulltime', 'parttime', 'contract', 'internship', 'temporary', 'commission')
+LEVELS = ('entry_level', 'mid_level', 'senior_level')
+STEP = 10
+
+
+class PopulationSite(Transport):
+    """
+    Serves search pages over a fixed population of postings, filtered by `jt`, `explvl`,
+    `radius` and `fromage` the way Indeed does, with each card's age in days.
+
+    Attributes
+    ----------
+    postings: list[tuple]
+        The job key, job type, experience level, distance and age in whole days of each posting.
+    fetches: list[str]
+        Every url fetched, in order.
+    """
+    def __init__(self, number, seed=0):
+        rand = random.Random(seed)
+        self.postings = [('%016x'%index, rand.choice(JOB_TYPES), rand.choice(LEVELS), rand.uniform(0, 100),
+                          rand.randint(0, 30)) for index in range(number)]
+        self.fetches = []
+
+    def matches(self, params):
+        """
+        Get the job keys of the postings a search's parameters match, in the order served.
+        """
+        radius = int(params.get('radius', 25))
+        age = params.get('fromage', 'any')
+        age = float('inf') if age == 'any' else int(age)
+        return [key for key, job_type, level, distance, days in self.postings
+                if params.get('jt', job_type) == job_type and params.get('explvl', level) == level
+                and distance <= radius and days <= age]
+
+    def page(self, url, keys, start):
+        ages = {key : days for key, _, _, _, days in self.postings}
+        page = start//STEP + 1
+        cards = ''.join('<div class="jobsearch-SerpJobCard" data-jk="%s"><span class="date">%s</span></div>'%(
+            key, '%i days ago'%ages[key] if ages[key] else 'Today') for key in keys[start:start + STEP])
+        next_link = '<span class="np">Next</span>' if start + STEP < len(keys) else ''
+        body = ('<html><body><div id="searchCountPages">Page %i of %i jobs</div>%s'
+                '<div class="pagination"><b>%i</b>%s</div></body></html>')%(page, len(keys), cards, page, next_link)
+        return Response(url, 200, {}, body.encode('utf-8'))
+
+    async def fetch(self, url, headers=None):
+        self.fetches.append(url)
+        await asyncio.sleep(0)
+        params = dict(parse_qsl(urlsplit(url).query))
+        return self.page(url, self.matches(params), int(params.get('start', 0)))
+
+
+class LocationSite(Transport):
+    """
+    Serves search pages over postings at places, filtered by the distance from `l`
+    within `radius` the way Indeed does, with each card's location. Postings at a place
+    that isn't a point, like 'Remote', match every search.
+
+    Attributes
+    ----------
+    postings: list[tuple]
+        The job key and location of each posting.
+    fetches: list[str]
+        Every url fetched, in order.
+    """
+    def __init__(self, locations, number, normalizer=None):
+        self.normalizer = normalizer or LocationNormalizer()
+        self.postings = [('%016x'%index, locations[index%len(locations)]) for index in range(number)]
+        self.fetches = []
+
+    def matches(self, params):
+        """
+        Get the postings a search's parameters match, in the order served.
+        """
+        center = self.normalizer.lookup(params['l'])
+        radius = int(params.get('radius', DEFAULT_RADIUS))
+        postings = []
+        for key, location in self.postings:
+            place = self.normalizer.lookup(location)
+            if (place.latitude is None or not place.region
+                    or distance(center.latitude, center.longitude, place.latitude, place.longitude) <= radius):
+                postings.append((key, location))
+        return postings
+
+    async def fetch(self, url, headers=None):
+        self.fetches.append(url)
+        await asyncio.sleep(0)
+        params = dict(parse_qsl(urlsplit(url).query))
+        postings = self.matches(params)
+        start = int(params.get('start', 0))
+        page = start//STEP + 1
+        cards = ''.join('<div class="jobsearch-SerpJobCard" data-jk="%s"><span class="location">%s</span></div>'%(
+            key, location) for key, location in postings[start:start + STEP])
+        next_link = '<span class="np">Next</span>' if start + STEP < len(postings) else ''
+        body = ('<html><body>%s<div class="pagination"><b>%i</b>%s</div></body></html>')%(cards, page, next_link)
+        return Response(url, 200, {}, body.encode('utf-8'))
+
+
+def posting_page(title, company='Acme Data', location='New York, NY', items=('Python and SQL', )):
+    """
+    Get the html of a job posting with a header, a section of items and a company apply link.
+    """
+    return ('<html><body><div class="jobsearch-DesktopStickyContainer">'
+            '<h3 class="jobsearch-JobInfoHeader-title">%s</h3>'
+            '<div class="jobsearch-JobInfoHeader-subtitle"><div><a href="/cmp">%s</a></div><div>%s</div></div>'
+            '</div><div id="jobDescriptionText"><p><b>Requirements</b></p><ul>%s</ul></div>'
+            '<div id="applyButtonLinkContainer"><a href="https://example.com/apply">Apply</a></div>'
+            '</body></html>')%(title, company, location, ''.join('<li>%s</li>'%item for item in items))
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from benchmarks import suite
+
+
+@pytest.mark.parametrize('label', list(suite.CLASSES))
+def test_every_scenario_runs(label):
+    query_cls, values, grid = suite.CLASSES[label]
+    scenarios = list(suite.scenarios(query_cls, values, grid))
+    assert [name for name, _, _ in scenarios] == ['construct', 'setter churn', 'url cached', 'url after set',
+                                                  'grid expansion', 'error path', 'repr invalid']
+    for name, func, per_call in scenarios:
+        result = func()
+        if name == 'grid expansion':
+            assert len(result) == per_call == len(set(result))
+        elif name == 'error path':
+            assert 'Missing value for required argument' in result
+    assert suite.memory_per_query(query_cls, values, number=200) > 0
+
+
+def test_the_best_of_each_run_is_kept():
+    values = {'fast' : iter([3.0, 1.0, 2.0]), 'memory' : iter([100.0, 90.0, 95.0])}
+    measures = {'fast' : (lambda: next(values['fast']), 'us'), 'memory' : (lambda: next(values['memory']), 'bytes')}
+    assert suite.run(measures, runs=3) == {'fast' : {'value' : 1.0, 'unit' : 'us'},
+                                           'memory' : {'value' : 90.0, 'unit' : 'bytes'}}
+    assert list(suite.run(measures, runs=0)) == []
+
+
+def test_regressions_use_the_tolerance_of_their_unit():
+    baseline = {'a' : {'value' : 1.0, 'unit' : 'us'}, 'b' : {'value' : 100.0, 'unit' : 'bytes'},
+                'zero' : {'value' : 0.0, 'unit' : 'us'}}
+    results = {'a' : {'value' : 1.1, 'unit' : 'us'}, 'b' : {'value' : 110.0, 'unit' : 'bytes'},
+               'zero' : {'value' : 5.0, 'unit' : 'us'}, 'new' : {'value' : 5.0, 'unit' : 'us'}}
+    assert suite.regressed(results, baseline, 0.15, 0.05) == ['b']
+    assert suite.regressed(results, baseline, 0.05, 0.15) == ['a']
+
+
+def test_save_then_compare(tmp_path, monkeypatch, capsys):
+    speed = {'value' : 1.0}
+    monkeypatch.setattr(suite, 'measurements', lambda: {'simple construct' : (lambda: speed['value'], 'us')})
+    path = str(tmp_path/'baseline.json')
+    suite.main(['--save', path, '--runs', '1'])
+    with open(path) as saved:
+        assert json.load(saved)['results'] == {'simple construct' : {'value' : 1.0, 'unit' : 'us'}}
+
+    speed['value'] = 1.1
+    suite.main(['--compare', path, '--runs', '1'])
+    assert 'ok' in capsys.readouterr().out
+    speed['value'] = 2.0
+    with pytest.raises(SystemExit) as exit_info:
+        suite.main(['--compare', path, '--runs', '1'])
+    assert exit_info.value.code == 1
+    assert 'Regressed: simple construct' in capsys.readouterr().out
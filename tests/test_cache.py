@@ -0,0 +1,195 @@
+import asyncio
+import threading
+
+import pytest
+
+from queries import SimpleIndeedQuery
+from queries import cache as cache_module
+from queries.cache import ResponseCache, CachingTransport, CacheMiss, canonical_url
+from queries.transport import Response, Transport
+
+
+class CountingSite(Transport):
+    def __init__(self):
+        self.fetches = 0
+
+    async def fetch(self, url, headers=None):
+        self.fetches += 1
+        return Response(url, 200, {}, b'x'*100)
+
+
+class ValidatingSite(Transport):
+    """
+    Serves a body with an ETag and Last-Modified, and a 304 to requests that send them
+    back, unless the body has changed since.
+    """
+    def __init__(self):
+        self.body = b'first'
+        self.requests = []
+
+    async def fetch(self, url, headers=None):
+        headers = dict(headers or {})
+        self.requests.append(headers)
+        etag = '"%s"'%self.body.decode('utf-8')
+        if headers.get('If-None-Match') == etag:
+            return Response(url, 304, {}, b'')
+        return Response(url, 200, {'etag' : etag, 'last-modified' : 'Wed, 21 Oct 2015 07:28:00 GMT'}, self.body)
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def fetch_all(transport, urls):
+    async def run():
+        try:
+            return [await transport.fetch(url) for url in urls]
+        finally:
+            await transport.close()
+    return asyncio.run(run())
+
+
+class ThreadRecordingCache(ResponseCache):
+    def get(self, url):
+        self.threads.add(threading.get_ident())
+        return super().get(url)
+
+
+def test_hits_dont_write_until_the_batch_is_full():
+    cache = ResponseCache(':memory:', access_batch=10)
+    urls = ['https://example.com/%i'%i for i in range(10)]
+    for url in urls:
+        cache.put(url, Response(url, 200, {}, url.encode('utf-8')))
+    changes = cache._db.total_changes
+    for _ in range(3):
+        for url in urls[:9]:
+            assert cache.get(url)[0].body == url.encode('utf-8')
+    assert cache._db.total_changes == changes
+    cache.get(urls[9])
+    assert cache._db.total_changes == changes + 10
+    cache.close()
+
+
+def test_eviction_sees_pending_access_times():
+    cache = ResponseCache(':memory:', max_bytes=250)
+    for name in 'abc':
+        cache.put('https://example.com/' + name, Response('https://example.com/' + name, 200, {}, b'x'*100))
+    #'a' was evicted; reading 'b' makes 'c' the least recently used.
+    assert cache.get('https://example.com/a')[0] is None
+    assert cache.get('https://example.com/b')[0] is not None
+    cache.put('https://example.com/d', Response('https://example.com/d', 200, {}, b'x'*100))
+    assert cache.get('https://example.com/b')[0] is not None
+    assert cache.get('https://example.com/c')[0] is None
+    cache.close()
+
+
+def test_caching_transport_reads_the_cache_off_the_event_loop():
+    cache = ThreadRecordingCache(':memory:')
+    cache.threads = set()
+    site = CountingSite()
+
+    async def run():
+        transport = CachingTransport(site, cache)
+        try:
+            for _ in range(3):
+                await asyncio.gather(*(transport.fetch('https://example.com/%i'%i) for i in range(5)))
+            return transport.hits, transport.misses
+        finally:
+            await transport.close()
+    assert asyncio.run(run()) == (10, 5)
+    assert site.fetches == 5
+    assert threading.get_ident() not in cache.threads
+
+
+def test_canonical_url():
+    assert canonical_url('https://WWW.Example.com/jobs?q=a&l=b&start=0') == 'https://example.com/jobs?l=b&q=a'
+    assert canonical_url('https://example.com/jobs?start=10&q=a') == 'https://example.com/jobs?q=a&start=10'
+    assert canonical_url('https://example.com?start=') == 'https://example.com/'
+    query = SimpleIndeedQuery(what='nurse', where='Austin, TX', start=0)
+    assert canonical_url(query) == canonical_url(query.url)
+    assert 'start' not in canonical_url(query)
+    assert canonical_url(query.copy(start=10)) != canonical_url(query)
+
+
+def test_responses_go_stale_after_the_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module, 'time', clock)
+    cache = ResponseCache(':memory:', ttl=60)
+    cache.put('https://example.com/a', Response('https://example.com/a', 200, {}, b'a'))
+    clock.now += 59
+    assert cache.get('https://example.com/a')[1]
+    clock.now += 2
+    response, fresh = cache.get('https://example.com/a')
+    assert response.body == b'a' and not fresh
+    cache.refresh('https://example.com/a')
+    assert cache.get('https://example.com/a')[1]
+    cache.close()
+
+
+def test_stale_responses_are_revalidated(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module, 'time', clock)
+    site = ValidatingSite()
+    cache = ResponseCache(':memory:', ttl=60)
+    url = 'https://example.com/jobs'
+
+    clock.now += 120
+    transport = CachingTransport(site, cache)
+    assert [response.body for response in fetch_all(transport, [url, url])] == [b'first']*2
+    assert len(site.requests) == 1 and 'If-None-Match' not in site.requests[0]
+
+    #Stale, and unchanged on the site: the 304 keeps the stored response and makes it fresh.
+    clock.now += 120
+    transport = CachingTransport(site, cache)
+    assert [response.body for response in fetch_all(transport, [url, url])] == [b'first']*2
+    assert site.requests[1] == {'If-None-Match' : '"first"', 'If-Modified-Since' : 'Wed, 21 Oct 2015 07:28:00 GMT'}
+    assert len(site.requests) == 2 and (transport.hits, transport.misses) == (2, 0)
+
+    #Stale, and changed on the site: the new response replaces the stored one.
+    clock.now += 120
+    site.body = b'second'
+    transport = CachingTransport(site, cache)
+    assert fetch_all(transport, [url])[0].body == b'second'
+    assert transport.misses == 1
+    assert cache.get(url)[0].body == b'second'
+    cache.close()
+
+
+def test_offline_mode_only_uses_the_cache(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module, 'time', clock)
+    cache = ResponseCache(':memory:', ttl=60)
+    cache.put('https://example.com/a', Response('https://example.com/a', 200, {}, b'a'))
+    clock.now += 120
+    transport = CachingTransport(None, cache, offline=True)
+    assert fetch_all(transport, ['https://www.example.com/a'])[0].body == b'a'
+    with pytest.raises(CacheMiss):
+        fetch_all(CachingTransport(None, cache, offline=True), ['https://example.com/b'])
+    with pytest.raises(ValueError):
+        CachingTransport(None, cache)
+    cache.close()
+
+
+def test_the_least_recently_used_are_evicted_first(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module, 'time', clock)
+    cache = ResponseCache(':memory:', max_bytes=300)
+    urls = ['https://example.com/' + name for name in 'abc']
+    for url in urls:
+        clock.now += 1
+        cache.put(url, Response(url, 200, {}, b'x'*100))
+    for url in (urls[0], urls[2], urls[1]):
+        clock.now += 1
+        cache.get(url)
+    clock.now += 1
+    cache.put('https://example.com/d', Response('https://example.com/d', 200, {}, b'x'*150))
+    #'a' and then 'c' were used least recently.
+    assert [cache.get(url)[0] is not None for url in urls] == [False, True, False]
+    assert cache.size == 250 and len(cache) == 2
+    cache.delete(urls[1])
+    assert cache.size == 150
+    cache.close()
@@ -0,0 +1,125 @@
+import asyncio
+from time import monotonic
+from urllib.parse import urlsplit, parse_qsl
+
+import pytest
+
+from queries import SimpleIndeedQuery
+from queries.crawler import Crawler
+from queries.dedup import SeenIndex
+from queries.transport import Response, Transport, TokenBucket
+
+from .sites import PopulationSite, STEP
+
+
+class PostingSite(Transport):
+    """
+    Serves a posting page for any job key, with the key as its body.
+    """
+    def __init__(self):
+        self.fetches = []
+
+    async def fetch(self, url, headers=None):
+        self.fetches.append(url)
+        await asyncio.sleep(0)
+        return Response(url, 200, {}, dict(parse_qsl(urlsplit(url).query))['jk'].encode('utf-8'))
+
+
+def fetch_postings(site, keys, seen):
+    async def run():
+        crawler = Crawler(site, rate=1e6, burst=1e6)
+        try:
+            return await crawler.fetch_postings(keys, seen, parse=bytes.decode)
+        finally:
+            await crawler.close()
+    return asyncio.run(run())
+
+
+def test_fetched_postings_are_kept_for_the_next_run(tmp_path):
+    path = str(tmp_path/'seen.sqlite')
+    site = PostingSite()
+    keys = ['%04x'%index for index in range(20)]
+    first = SeenIndex(path, capacity=1000)
+    assert fetch_postings(site, keys + keys[:5], first) == {key : key for key in keys}
+
+    #A second process opening the index while the first is still running.
+    second = SeenIndex(path, capacity=1000)
+    assert len(second) == 20
+    assert fetch_postings(site, keys + ['new'], second) == {'new' : 'new'}
+    assert len(site.fetches) == 21
+    first.close()
+    second.close()
+
+
+class SlowSite(PopulationSite):
+    """
+    Takes a while over each page, counting the pages in flight.
+    """
+    def __init__(self, number):
+        super().__init__(number)
+        self.in_flight = 0
+        self.most_in_flight = 0
+
+    async def fetch(self, url, headers=None):
+        self.in_flight += 1
+        self.most_in_flight = max(self.most_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.005)
+            return await super().fetch(url, headers)
+        finally:
+            self.in_flight -= 1
+
+
+def job_keys(site, query, **kwargs):
+    async def run():
+        crawler = Crawler(site, **dict({'rate' : 1e6, 'burst' : 1e6}, **kwargs))
+        try:
+            return await crawler.job_keys(query)
+        finally:
+            await crawler.close()
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize('start', [0, 5, 20])
+def test_pages_are_walked_from_the_querys_start(start):
+    site = PopulationSite(230)
+    matches = site.matches({})
+    query = SimpleIndeedQuery(what='nurse', where='Austin, TX', start=start)
+    assert job_keys(site, query, window=1) == matches[start:]
+    assert len(site.fetches) == -(-(len(matches) - start)//STEP)
+    assert query.start == start
+
+
+def test_pages_ahead_are_prefetched_up_to_the_window():
+    site = SlowSite(400)
+    pages = -(-len(site.matches({}))//STEP)
+    query = SimpleIndeedQuery(what='nurse', where='Austin, TX')
+    assert job_keys(site, query, window=3) == site.matches({})
+    assert site.most_in_flight == 3
+    #The last page is found while the pages after it are already in flight.
+    assert pages <= len(site.fetches) <= pages + 2
+
+
+def test_requests_to_a_host_keep_to_the_rate():
+    site = PopulationSite(240)
+    query = SimpleIndeedQuery(what='nurse', where='Austin, TX')
+    begin = monotonic()
+    assert job_keys(site, query, rate=40, burst=1, window=6) == site.matches({})
+    assert monotonic() - begin >= 5/40
+    assert job_keys(PopulationSite(240), query, rate=1e6, burst=10, window=6) == site.matches({})
+
+
+def test_token_bucket_allows_a_burst_then_the_rate():
+    async def run():
+        bucket = TokenBucket(50, capacity=4)
+        times = []
+        begin = monotonic()
+        for _ in range(8):
+            await bucket.acquire()
+            times.append(monotonic() - begin)
+        return times
+    times = asyncio.run(run())
+    assert times[3] < 0.01
+    assert times[7] >= 4/50*0.9
+    with pytest.raises(ValueError):
+        TokenBucket(0)
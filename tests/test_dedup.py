@@ -0,0 +1,104 @@
+import os
+import random
+import subprocess
+import sys
+from array import array
+from hashlib import blake2b
+
+from queries import dedup
+from queries.dedup import NearDuplicateIndex, canonical_records
+
+WORDS = ('python sql data pipelines team customers build design develop maintain services cloud platform '
+         'experience years strong communication skills analytics reporting dashboards stakeholders').split()
+
+
+def postings(number, seed=0):
+    """
+    Get postings where every third one is a repost of the one before it, with a word
+    changed, under a new job key.
+    """
+    rand = random.Random(seed)
+    records = []
+    for index in range(number):
+        if index%3 == 2:
+            items = list(records[-1]['sections'][0]['items'])
+            words = items[0].split()
+            words[0] = rand.choice(WORDS)
+            items[0] = ' '.join(words)
+            record = dict(records[-1], sections=[{'heading' : 'About', 'items' : items}])
+        else:
+            items = [' '.join(rand.choices(WORDS, k=12)) for _ in range(8)]
+            record = {'title' : 'Engineer %i'%index, 'company_name' : 'Company %i'%index,
+                      'sections' : [{'heading' : 'About', 'items' : items}]}
+        records.append(dict(record, job_key='%04x'%index))
+    return records
+
+
+def test_reposts_are_clustered_across_merges(monkeypatch):
+    monkeypatch.setattr(dedup, 'MERGE_SIZE', 16)
+    records = postings(150)
+    index = NearDuplicateIndex(0.7)
+    kept = [record['job_key'] for record in canonical_records(records, index)]
+    assert kept == [record['job_key'] for i, record in enumerate(records) if i%3 != 2]
+    #Every posting has one bucket in each band, merged into the arrays or still pending.
+    assert index._pending_docs < 16
+    assert all(len(keys) + index._pending_docs == len(records) for keys in index._bucket_keys)
+
+
+def test_repeated_job_keys_are_skipped():
+    records = postings(30)
+    index = NearDuplicateIndex(0.7)
+    first = list(canonical_records(records, index))
+    assert list(canonical_records(records[:6] + records[:6], index)) == []
+    assert len(first) == 20 and len(index) == 30
+
+
+def test_save_and_load_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(dedup, 'MERGE_SIZE', 16)
+    records = postings(90)
+    index = NearDuplicateIndex(0.7)
+    for record in records[:60]:
+        index.add(record)
+    path = str(tmp_path/'index.json')
+    index.save(path)
+    loaded = NearDuplicateIndex.load(path)
+    assert loaded.job_keys == index.job_keys
+    assert loaded.clusters() == index.clusters()
+    assert loaded._signatures == index._signatures
+    for record in records[60:]:
+        assert loaded.add(record) == index.add(record)
+    assert loaded.clusters() == index.clusters()
+    with open(path, encoding='utf-8') as saved:
+        assert saved.read(1) == '{'
+
+
+def test_default_index_round_trip(tmp_path):
+    records = postings(60)
+    index = NearDuplicateIndex()
+    assert index.bands*index.rows == index.num_perm
+    for record in records[:40]:
+        index.add(record)
+    path = str(tmp_path/'index.json')
+    index.save(path)
+    loaded = NearDuplicateIndex.load(path)
+    assert (loaded.bands, loaded.rows) == (index.bands, index.rows)
+    assert loaded._bucket_keys == index._bucket_keys
+    for record in records[40:]:
+        assert loaded.add(record) == index.add(record)
+    assert loaded.clusters() == index.clusters()
+
+
+def test_band_keys_are_digests():
+    index = NearDuplicateIndex(num_perm=8, bands=2)
+    signature = array('Q', range(8))
+    first = blake2b((0).to_bytes(8, 'little') + (1).to_bytes(8, 'little') + (2).to_bytes(8, 'little')
+                    + (3).to_bytes(8, 'little'), digest_size=8).digest()
+    assert index._band_keys(signature)[0] == int.from_bytes(first, 'little', signed=True)
+    assert len(set(index._band_keys(signature))) == 2
+
+
+def test_dedup_doesnt_import_the_search_index():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = 'import sys; sys.path.insert(0, %r); import queries.dedup; print("queries.search" in sys.modules)'%root
+    assert subprocess.run([sys.executable, '-c', script], capture_output=True, text=True,
+                          check=True).stdout.strip() == 'False'
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import time
+
+import pytest
+
+from queries import SimpleIndeedQuery, Query, QueryArgument
+from queries.crawler import Crawler
+from queries.frontier import Frontier, FrontierCrawler, FAILED
+from queries.parsers import parse_search_page
+from queries.transport import Response
+
+from .sites import PopulationSite
+
+
+class BrokenSite(PopulationSite):
+    """
+    Resets the connection for every page of one query, and serves pages the parser
+    can't handle for another.
+    """
+    async def fetch(self, url, headers=None):
+        if 'q=reset' in url:
+            self.fetches.append(url)
+            raise ConnectionResetError("Connection reset by peer")
+        response = await super().fetch(url, headers)
+        if 'q=garbled' in url:
+            response.body = b'<html><div class="pagination"><b>x</b></div>'
+        return response
+
+
+class TakenOverSite(PopulationSite):
+    """
+    Holds each page until its lease runs out, lets another worker take the task over and
+    finish it, then answers the stale worker with a 503.
+    """
+    def __init__(self, number, other):
+        super().__init__(number)
+        self.other = other
+
+    async def fetch(self, url, headers=None):
+        self.fetches.append(url)
+        await asyncio.sleep(0.05)
+        for task in self.other.claim():
+            self.other.complete(task, 'taken over')
+        return Response(url, 503, {}, b'')
+
+
+def garbled_parser(body):
+    parsed = parse_search_page(body)
+    if not parsed.job_keys:
+        raise ValueError("Unexpected page")
+    return parsed
+
+
+def test_completions_after_a_lost_lease_are_ignored(tmp_path):
+    path = str(tmp_path/'frontier.sqlite')
+    slow = Frontier(path, owner='slow', lease=0.01)
+    fast = Frontier(path, owner='fast')
+    slow.add_queries([SimpleIndeedQuery(what='python', where='Austin, TX')])
+    task, = slow.claim()
+    time.sleep(0.05)
+    taken, = fast.claim()
+    assert taken.id == task.id
+
+    slow.complete(task, 'stale', job_keys=['a'])
+    assert (slow.completed, slow.lost) == (0, 1)
+    assert fast.counts()['page']['claimed'] == 1 and 'posting' not in fast.counts()
+
+    fast.complete(taken, 'fresh', job_keys=['b'])
+    assert (fast.completed, fast.lost) == (1, 0)
+    assert list(fast.results('page')) == [(task.key, 'fresh')]
+    assert fast.counts()['posting']['pending'] == 1
+    slow.close()
+    fast.close()
+
+
+def test_a_stale_worker_finishing_after_a_takeover_isnt_counted(tmp_path):
+    path = str(tmp_path/'frontier.sqlite')
+    slow = Frontier(path, owner='slow', lease=0.01)
+    fast = Frontier(path, owner='fast')
+    slow.add_queries([SimpleIndeedQuery(what=what, where='Austin, TX') for what in ('python', 'sql')])
+    site = TakenOverSite(40, fast)
+
+    async def run():
+        crawler = Crawler(site, rate=1e6, burst=1e6)
+        try:
+            return await FrontierCrawler(crawler, slow, postings=False, poll=0.01).run()
+        finally:
+            await crawler.close()
+    assert asyncio.run(run()) == 0
+    assert (slow.completed, slow.lost) == (0, 2)
+    assert fast.completed == 2 and fast.counts()['page']['done'] == 2
+    slow.close()
+    fast.close()
+
+
+def test_only_transport_errors_are_retried(tmp_path, caplog):
+    path = str(tmp_path/'frontier.sqlite')
+    frontier = Frontier(path, max_attempts=3)
+    frontier.add_queries([SimpleIndeedQuery(what=what, where='Austin, TX') for what in ('ok', 'reset', 'garbled')])
+    site = BrokenSite(40)
+
+    async def run():
+        crawler = Crawler(site, rate=1e6, burst=1e6, parser=garbled_parser)
+        try:
+            return await FrontierCrawler(crawler, frontier, postings=False, poll=0.01).run()
+        finally:
+            await crawler.close()
+    with caplog.at_level(logging.WARNING, logger='queries.frontier'):
+        completed = asyncio.run(run())
+
+    assert completed == len(site.matches({}))//10 + 1
+    assert frontier.counts()['page']['failed'] == 2
+    assert sum('q=reset' in url for url in site.fetches) == 3
+    assert sum('q=garbled' in url for url in site.fetches) == 1
+    statuses = dict(frontier._db.execute('SELECT url, status FROM tasks').fetchall())
+    assert [status for url, status in statuses.items() if 'q=garbled' in url] == [FAILED]
+    assert any(record.levelno == logging.ERROR and record.exc_info for record in caplog.records)
+    frontier.close()
+
+
+def test_queries_that_cant_be_recovered_are_rejected(tmp_path):
+    frontier = Frontier(str(tmp_path/'frontier.sqlite'))
+    runtime = Query('https://example.com/jobs', q=QueryArgument('q', str), start=QueryArgument('start', int))
+    with pytest.raises(TypeError, match='module level'):
+        frontier.add_queries([SimpleIndeedQuery(what='python', where='Austin, TX'), runtime])
+    assert frontier.counts() == {}
+    frontier.close()
@@ -0,0 +1,76 @@
+import asyncio
+
+from queries import AdvancedIndeedQuery
+from queries.crawler import Crawler
+from queries.incremental import IncrementalCrawler, WatermarkStore, DAY
+from queries.transport import Response
+
+from .sites import PopulationSite, STEP
+
+NOW = 1.7e9
+
+
+class DatedSite(PopulationSite):
+    """
+    Serves the postings newest first, as a search sorted by date does, and fails the
+    pages at the offsets in `failing`.
+    """
+    def __init__(self, number):
+        super().__init__(number)
+        self.postings.sort(key=lambda posting: posting[4])
+        self.failing = set()
+
+    def post(self, number):
+        """
+        Put new postings from today at the top of the results.
+        """
+        new = [('new%013x'%(len(self.postings) + index), 'fulltime', 'mid_level', 1.0, 0) for index in range(number)]
+        self.postings[:0] = new
+        return [posting[0] for posting in new]
+
+    async def fetch(self, url, headers=None):
+        response = await super().fetch(url, headers)
+        if any('start=%i'%start in url for start in self.failing):
+            return Response(url, 500, {}, b'')
+        return response
+
+
+def run(site, store, query, now):
+    async def crawl():
+        crawler = Crawler(site, rate=1e6, burst=1e6, window=1)
+        try:
+            return await IncrementalCrawler(crawler, store).new_job_keys(query, now)
+        finally:
+            await crawler.close()
+    return asyncio.run(crawl())
+
+
+def test_later_runs_stop_at_the_watermark():
+    site, store = DatedSite(60), WatermarkStore(':memory:')
+    query = AdvancedIndeedQuery(all_words='nurse', where='Austin, TX', start=30)
+    assert run(site, store, query, NOW) == site.matches({})
+    assert all('sort=date' in url and 'start=30' not in url for url in site.fetches)
+
+    new_keys = site.post(3)
+    del site.fetches[:]
+    assert run(site, store, query, NOW + DAY) == new_keys
+    assert len(site.fetches) == 1 and 'fromage=3' in site.fetches[0]
+    watermark = store.get(query)
+    assert watermark.newest_key == new_keys[0] and watermark.last_run == NOW + DAY
+    assert run(site, store, query, NOW + 2*DAY) == []
+
+
+def test_watermark_is_held_when_a_page_fails():
+    site, store = DatedSite(60), WatermarkStore(':memory:')
+    query = AdvancedIndeedQuery(all_words='nurse', where='Austin, TX')
+    run(site, store, query, NOW)
+    before = store.get(query)
+
+    new_keys = site.post(15)
+    site.failing.add(STEP)
+    assert run(site, store, query, NOW + DAY) == new_keys[:STEP]
+    assert store.get(query) == before
+
+    site.failing.clear()
+    assert run(site, store, query, NOW + DAY) == new_keys
+    assert store.get(query).newest_key == new_keys[0]
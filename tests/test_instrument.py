@@ -0,0 +1,93 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from queries import SimpleIndeedQuery
+from queries.crawler import Crawler
+from queries.instrument import Histogram, Metrics, NO_METRICS, SamplingProfiler, profile
+
+from .sites import PopulationSite
+
+
+def test_percentiles_are_within_a_bucket():
+    hist = Histogram()
+    values = [index*1e-4 for index in range(1, 1001)]
+    for val in values:
+        hist.record(val)
+    assert (hist.count, hist.min, hist.max) == (1000, 1e-4, 0.1)
+    assert hist.total == pytest.approx(sum(values))
+    ratio = 2**(1/hist.resolution)
+    for pct in (1, 50, 90, 99, 100):
+        exact = values[int(len(values)*pct/100) - 1]
+        assert exact <= hist.percentile(pct) <= exact*ratio
+    assert sum(count for _, count in hist.buckets()) == 1000
+    assert Histogram().percentile(50) is None
+
+
+def test_merged_histograms_add_up():
+    first, second = Histogram(), Histogram()
+    for val in (0.001, 0.002):
+        first.record(val)
+    for val in (0.0005, 0.5):
+        second.record(val)
+    first.merge(second)
+    assert (first.count, first.min, first.max) == (4, 0.0005, 0.5)
+    with pytest.raises(ValueError):
+        first.merge(Histogram(resolution=4))
+
+
+def test_crawl_stages_are_timed_and_counted():
+    site = PopulationSite(200)
+    metrics = Metrics()
+
+    async def run():
+        crawler = Crawler(site, rate=1e6, burst=1e6, metrics=metrics)
+        try:
+            return await crawler.job_keys(SimpleIndeedQuery(what='nurse', where='Austin, TX'))
+        finally:
+            await crawler.close()
+    assert asyncio.run(run()) == site.matches({})
+    fetches = len(site.fetches)
+    for stage in ('encode', 'throttle', 'fetch', 'parse'):
+        assert metrics.histograms[stage].count == fetches
+    assert metrics.counters == {'status 200' : fetches}
+
+    exported = json.loads(json.dumps(metrics.export()))
+    assert exported['histograms']['fetch']['count'] == fetches
+    assert exported['counters'] == {'status 200' : fetches}
+    lines = metrics.summary().splitlines()
+    assert [line.split()[0] for line in lines[1:5]] == ['encode', 'throttle', 'fetch', 'parse']
+    assert lines[-1] == 'status 200: %i'%fetches
+
+
+def test_null_metrics_record_nothing():
+    with NO_METRICS.timer('fetch'):
+        pass
+    NO_METRICS.observe('fetch', 1.0)
+    NO_METRICS.count('retries')
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_profiler_writes_collapsed_stacks(tmp_path):
+    path = str(tmp_path/'profile.folded')
+    with profile(path, interval=0.001) as profiler:
+        busy(0.1)
+    with open(path, encoding='utf-8') as folded:
+        lines = folded.read().splitlines()
+    assert sum(int(line.rsplit(' ', 1)[1]) for line in lines) == sum(profiler.samples.values()) > 0
+    assert any(line.startswith('MainThread;') and ';busy (test_instrument.py:' in line for line in lines)
+
+    with profile(None) as profiler:
+        assert profiler is None
+    profiler = SamplingProfiler(path)
+    profiler.start()
+    with pytest.raises(RuntimeError):
+        profiler.start()
+    profiler.stop()
@@ -0,0 +1,108 @@
+import asyncio
+
+from queries import SimpleIndeedQuery
+from queries.crawler import Crawler
+from queries.locations import LocationNormalizer, DistanceFilter, distance
+
+from .sites import LocationSite
+
+#Where the postings are, including places the gazetteer can't put at a point.
+LOCATIONS = ['New York, NY', 'NYC', 'Jersey City, NJ', 'Newark, NJ', 'Brooklyn, NY', 'Hoboken, NJ', 'Remote',
+             'New York', 'Philadelphia, PA', 'Stamford, CT', 'new york, ny 10001', '']
+
+
+def matches(normalizer, postings, query):
+    """
+    Get the job keys a search around a query's place matches, keeping the postings it
+    can't place at a point.
+    """
+    center = normalizer.lookup(query.where)
+    keys = []
+    for key, location in postings:
+        place = normalizer.lookup(location)
+        if (place is None or place.latitude is None or not place.region
+                or distance(center.latitude, center.longitude, place.latitude, place.longitude) <= query.radius):
+            keys.append(key)
+    return keys
+
+
+def test_collapsed_plan_matches_uncollapsed_queries():
+    normalizer = LocationNormalizer()
+    postings = [('%016x'%index, LOCATIONS[index%len(LOCATIONS)]) for index in range(120)]
+    queries = [SimpleIndeedQuery(what='data engineer', where=where, radius=radius)
+               for where, radius in (('New York, NY', 50), ('NYC', 10), ('Jersey City, NJ', 5), ('Newark, NJ', 15),
+                                     ('new york city, new york', 25), ('Philadelphia, PA', 25))]
+    fetch_plan = normalizer.plan(queries)
+    assert len(fetch_plan.fetch) == 2
+
+    fetched = [[{'job_key' : key, 'location' : location} for key, location in postings
+                if key in set(matches(normalizer, postings, query))] for query in fetch_plan.fetch]
+    resolved = fetch_plan.resolve(fetched)
+    for query, records, local_filter in zip(queries, resolved, fetch_plan.filters):
+        expected = matches(normalizer, postings, query)
+        if isinstance(local_filter, DistanceFilter):
+            #Postings that can't be located might be outside the narrower circle.
+            located = {key for key, location in postings if normalizer.lookup(location) is not None}
+            expected = [key for key in expected if key in located]
+        assert [record['job_key'] for record in records] == expected
+    keys = {record['job_key'] for record in resolved[2]}
+    assert {key for key, location in postings if location == 'Remote'} <= keys
+    assert not keys & {key for key, location in postings if location in ('Brooklyn, NY', 'Hoboken, NJ', '')}
+
+
+def test_regions_are_only_merged_on_the_same_url():
+    normalizer = LocationNormalizer()
+    queries = [SimpleIndeedQuery(what='nurse', where='California'),
+               SimpleIndeedQuery(what='nurse', where='california', radius=10),
+               SimpleIndeedQuery(what='nurse', where='CA')]
+    fetch_plan = normalizer.plan(queries)
+    assert [query.where for query in fetch_plan.fetch] == ['California', 'California']
+    assert fetch_plan.sources == [0, 1, 0]
+    assert not any(fetch_plan.filters)
+    records = [{'job_key' : 'a', 'location' : 'Los Angeles, CA'}]
+    assert fetch_plan.resolve([records, records]) == [records]*3
+
+
+def test_queries_at_other_offsets_are_fetched_on_their_own():
+    normalizer = LocationNormalizer()
+    queries = [SimpleIndeedQuery(what='nurse', where='New York, NY', radius=50),
+               SimpleIndeedQuery(what='nurse', where='New York, NY', radius=25, start=10),
+               SimpleIndeedQuery(what='nurse', where='New York, NY', radius=25)]
+    fetch_plan = normalizer.plan(queries)
+    assert fetch_plan.fetch == queries[:2]
+    assert fetch_plan.sources == [0, 1, 0]
+    assert not fetch_plan.filters[1] and fetch_plan.filters[2]
+
+
+def test_records_without_a_location_are_dropped_from_narrowed_queries():
+    normalizer = LocationNormalizer()
+    fetch_plan = normalizer.plan([SimpleIndeedQuery(what='nurse', where='New York, NY', radius=50),
+                                  SimpleIndeedQuery(what='nurse', where='Newark, NJ', radius=5)])
+    records = [{'job_key' : 'a', 'age' : 1.0}, {'job_key' : 'b', 'location' : None},
+               {'job_key' : 'c', 'location' : 'Newark, NJ'}, {'job_key' : 'd', 'location' : 'Remote'}]
+    assert [[record['job_key'] for record in records] for records in fetch_plan.resolve([records])] == [
+        ['a', 'b', 'c', 'd'], ['c', 'd']]
+
+
+def test_crawled_plan_matches_crawling_each_query():
+    normalizer = LocationNormalizer()
+    site = LocationSite(['New York, NY', 'Newark, NJ', 'Jersey City, NJ', 'Remote', 'Philadelphia, PA',
+                         'New Jersey'], 70, normalizer)
+    queries = [SimpleIndeedQuery(what='nurse', where='New York, NY', radius=50),
+               SimpleIndeedQuery(what='nurse', where='Newark, NJ', radius=5),
+               SimpleIndeedQuery(what='nurse', where='Jersey City, NJ', radius=10)]
+
+    async def run(crawl):
+        crawler = Crawler(site, rate=1e6, burst=1e6)
+        try:
+            return await crawl(crawler)
+        finally:
+            await crawler.close()
+
+    fetch_plan = normalizer.plan(queries)
+    assert len(fetch_plan.fetch) == 1
+    planned = asyncio.run(run(fetch_plan.crawl))
+    assert all('/jobs?' in url and 'radius=50' in url for url in site.fetches)
+    direct = asyncio.run(run(lambda crawler: asyncio.gather(*(crawler.search_records(query) for query in queries))))
+    assert planned == list(direct)
+    assert 0 < len(planned[1]) < len(planned[0])
@@ -0,0 +1,61 @@
+import pickle
+import os
+import subprocess
+import sys
+
+import pytest
+
+import queries
+from queries import QueryArgument
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = '''
+import sys
+import queries
+loaded = sorted(name for name in sys.modules if name.startswith('queries.'))
+query = queries.SimpleIndeedQuery(what='python', where='New York')
+heavy = [name for name in ('dataclasses', 'inspect', 'ast') if name in sys.modules]
+print(loaded, 'queries.indeed' in sys.modules, query.url, heavy)
+'''
+
+
+def test_import_loads_nothing_until_first_use():
+    #Without site, so nothing but the package decides what's imported.
+    out = subprocess.run([sys.executable, '-S', '-c', 'import sys; sys.path.insert(0, %r)\n'%ROOT + SCRIPT],
+                         capture_output=True, text=True, check=True).stdout.split()
+    assert out == ['[]', 'True', 'https://indeed.com/jobs?q=python&l=New+York&start=0', '[]']
+
+
+def test_lazy_names():
+    assert set(queries.__all__) <= set(dir(queries))
+    assert queries.SimpleIndeedQuery is queries.indeed.SimpleIndeedQuery
+    with pytest.raises(AttributeError):
+        queries.NoSuchQuery
+
+
+def test_query_argument_has_slots_and_field_equality():
+    arg = QueryArgument('jt', str, choices='fulltime', value='fulltime', disp_name='Job Type')
+    assert not hasattr(arg, '__dict__')
+    with pytest.raises(AttributeError):
+        arg.other = 1
+    assert arg.choices == ('fulltime', )
+    assert arg == QueryArgument('jt', str, choices=('fulltime', ), value='fulltime', disp_name='Job Type')
+    assert arg != QueryArgument('jt', str, choices=('fulltime', ), disp_name='Job Type')
+    with pytest.raises(TypeError):
+        hash(arg)
+    assert repr(arg).startswith("QueryArgument(arg_name='jt', type=<class 'str'>, required=False, value='fulltime'")
+    assert pickle.loads(pickle.dumps(arg)) == arg
+
+
+def test_query_argument_values_are_checked():
+    with pytest.raises(TypeError):
+        QueryArgument('radius', int, value='5')
+    fixed = QueryArgument('psf', str, required=True, value='advsrch', mutable=False)
+    assert fixed.value == 'advsrch'
+    with pytest.raises(NotImplementedError):
+        fixed.value = 'other'
+    arg = QueryArgument('radius', int, choices=(5, 10))
+    arg.value = 10
+    with pytest.raises(ValueError):
+        arg.value = 7
@@ -0,0 +1,81 @@
+import pytest
+
+from queries.parsers import (parse_age, parse_search_page, parse_posting_header, parse_posting, parse_pages,
+                             parse_files)
+
+POSTING = (
+    '<html><head><title>Job</title></head><body>'
+    '<div class="jobsearch-DesktopStickyContainer">'
+    '<h3 class="icl-u-xs-mb--xs jobsearch-JobInfoHeader-title">Python Developer &amp; Analyst</h3>'
+    '<div class="jobsearch-InlineCompanyRating jobsearch-JobInfoHeader-subtitle">'
+    '<div class="icl-u-lg-mr--sm"><a href="/cmp/Acme">Acme Data</a></div>'
+    '<div class="jobsearch-CompanyReview"><span>4.1</span></div>'
+    '<div>New York, NY 10001</div>'
+    '</div></div>'
+    '<div id="jobDescriptionText">We build things.<p><b>Requirements:</b></p>'
+    '<ul><li>Python   and SQL</li><li>Five years</li></ul>'
+    '<p><strong>Benefits</strong></p><p>Dental</p><br>Remote  friendly</div>'
+    '%s</body></html>')
+
+COMPANY_APPLY = '<div id="applyButtonLinkContainer"><a href="https://example.com/apply/1">Apply</a></div>'
+INDEED_APPLY = '<div id="indeedApplyButtonContainer"><button>Apply now</button></div>'
+
+SEARCH_PAGE = (
+    '<html><body><div id="searchCountPages">Page 2 of 1,234 jobs</div>'
+    '<div class="jobsearch-SerpJobCard unifiedRow result" data-jk="aaa">'
+    '<span class="location accessible-contrast-color-location">New York,  NY</span>'
+    '<span class="date">Just posted</span></div>'
+    '<div class="jobsearch-SerpJobCard result" data-jk="bbb"><div class="location">Remote</div>'
+    '<div><span class="date">3 days ago</span></div></div>'
+    '<div class="jobsearch-SerpJobCard result" data-jk="ccc"></div>'
+    '<div class="result" data-jk="not-a-card"></div>'
+    '<div class="pagination"><a>1</a><b>2</b><a><span class="pn"><span class="np">Next</span></span></a></div>'
+    '</body></html>')
+
+
+@pytest.mark.parametrize('text, days', [('Just posted', 0.0), ('Today', 0.0), ('30+ days ago', 30.0),
+                                        ('1 day ago', 1.0), ('6 hours ago', 0.25), ('Sponsored', None)])
+def test_card_dates_are_read_as_days(text, days):
+    assert parse_age(text) == days
+
+
+def test_search_page():
+    parsed = parse_search_page(SEARCH_PAGE.encode('utf-8'))
+    assert parsed.job_keys == ['aaa', 'bbb', 'ccc']
+    assert parsed.job_ages == [0.0, 3.0, None]
+    assert parsed.job_locations == ['New York, NY', 'Remote', None]
+    assert (parsed.page_number, parsed.has_next_page, parsed.total_count) == (2, True, 1234)
+
+    last = parse_search_page('<div class="pagination"><b>9</b></div>')
+    assert (last.job_keys, last.page_number, last.has_next_page, last.total_count) == ([], 9, False, None)
+
+
+def test_posting_header():
+    assert parse_posting_header((POSTING%'').encode('utf-8')) == {
+        'title' : 'Python Developer & Analyst', 'company_name' : 'Acme Data', 'location' : 'New York, NY 10001'}
+    assert parse_posting_header('<html><body><h3>No header</h3></body></html>') is None
+
+
+@pytest.mark.parametrize('apply, apply_type, apply_url', [
+    ('', None, None), (COMPANY_APPLY, 'company', 'https://example.com/apply/1'), (INDEED_APPLY, 'indeed', None)])
+def test_posting(apply, apply_type, apply_url):
+    record = parse_posting(POSTING%apply)
+    assert record['title'] == 'Python Developer & Analyst' and record['location'] == 'New York, NY 10001'
+    assert record['sections'] == [{'heading' : None, 'items' : ['We build things.']},
+                                  {'heading' : 'Requirements', 'items' : ['Python and SQL', 'Five years']},
+                                  {'heading' : 'Benefits', 'items' : ['Dental', 'Remote friendly']}]
+    assert (record['apply_type'], record['apply_url']) == (apply_type, apply_url)
+
+
+def test_pages_are_parsed_across_processes_in_order(tmp_path):
+    pages = [(POSTING%'').replace('Acme Data', 'Company %i'%index) for index in range(40)] + ['<html></html>']
+    expected = [parse_posting_header(page) for page in pages]
+    assert parse_pages(pages, max_workers=2, chunksize=3) == expected
+
+    paths = []
+    for index, page in enumerate(pages):
+        path = tmp_path/('%02i.html'%index)
+        path.write_text(page, encoding='utf-8')
+        paths.append(str(path))
+    assert parse_files(paths, parse=parse_posting, max_workers=2) == [parse_posting(page) for page in pages]
+    assert expected[-1] is None and expected[7]['company_name'] == 'Company 7'
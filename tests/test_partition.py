@@ -0,0 +1,102 @@
+import asyncio
+
+from queries import SimpleIndeedQuery, AdvancedIndeedQuery
+from queries.crawler import Crawler
+from queries.partition import Partitioner
+from queries.transport import Response
+
+from .sites import PopulationSite
+
+
+class FailingSite(PopulationSite):
+    """
+    Fails every search for contract jobs.
+    """
+    async def fetch(self, url, headers=None):
+        if 'jt=contract' in url:
+            self.fetches.append(url)
+            return Response(url, 503, {}, b'')
+        return await super().fetch(url, headers)
+
+
+class LaterPageFailingSite(PopulationSite):
+    """
+    Fails the second page of the searches for part time jobs.
+    """
+    async def fetch(self, url, headers=None):
+        if 'jt=parttime' in url and 'start=10' in url:
+            self.fetches.append(url)
+            return Response(url, 503, {}, b'')
+        return await super().fetch(url, headers)
+
+
+def partition(site, query, cap):
+    async def run():
+        crawler = Crawler(site, rate=1e6, burst=1e6, window=1)
+        try:
+            return await Partitioner(crawler, cap=cap).partition(query)
+        finally:
+            await crawler.close()
+    return asyncio.run(run())
+
+
+def test_a_query_within_the_cap_is_walked_as_usual():
+    site = PopulationSite(200)
+    part = partition(site, SimpleIndeedQuery(what='nurse', where='Austin, TX'), cap=1000)
+    assert part.status == 'complete' and not part.children
+    assert part.job_keys == site.matches({})
+    assert part.fetches == len(site.fetches)
+
+
+def test_disjoint_splits_cover_every_result():
+    site = PopulationSite(2000)
+    query = SimpleIndeedQuery(what='nurse', where='Austin, TX')
+    part = partition(site, query, cap=60)
+    assert [child.split_on for child in part.children] == ['job_type']*6
+    assert all(grandchild.split_on == 'experience' for child in part.children for grandchild in child.children)
+    assert sorted(part.all_job_keys()) == sorted(site.matches({}))
+    stats = part.coverage()
+    assert stats['reported'] == stats['found'] == len(site.matches({}))
+    assert (stats['truncated'], stats['failed'], stats['residual']) == (0, 0, 0)
+    assert stats['fetches'] == len(site.fetches)
+    assert query.job_type is None
+    assert part.report().splitlines()[0].startswith('found %i of %i'%(stats['found'], stats['reported']))
+
+
+def test_nested_arguments_narrow_what_still_overflows():
+    site = PopulationSite(3000)
+    query = AdvancedIndeedQuery(all_words='nurse', where='Austin, TX')
+    part = partition(site, query, cap=20)
+    stats = part.coverage()
+    assert stats['truncated'] > 0 and stats['found'] < stats['reported']
+    assert set(part.all_job_keys()) <= set(site.matches({}))
+    narrowed = [each for each in part.walk() if each.split_on in ('radius', 'age')]
+    assert narrowed and all(each.query.arg_value(each.split_on) in (15, 10, 5, 0, 7, 3, 1) for each in narrowed)
+    #Every partition holds the results of its query, and only those.
+    for each in part.walk():
+        params = {'jt' : each.query.job_type, 'explvl' : each.query.experience,
+                  'radius' : each.query.radius or 25, 'fromage' : each.query.age or 'any'}
+        assert set(each.job_keys) <= set(site.matches({name : val for name, val in params.items() if val}))
+
+
+def test_failed_partitions_are_reported():
+    site = FailingSite(2000)
+    part = partition(site, SimpleIndeedQuery(what='nurse', where='Austin, TX'), cap=60)
+    failed = [each for each in part.walk() if each.status == 'failed']
+    assert [each.query.job_type for each in failed] == ['contract']
+    assert part.coverage()['failed'] == 1
+    #Only the contract jobs on the first page of the split query are found.
+    missing = set(site.matches({})) - set(part.all_job_keys())
+    assert missing and missing <= set(site.matches({'jt' : 'contract'})) - set(part.job_keys)
+
+
+def test_partitions_with_a_failed_later_page_are_reported():
+    site = LaterPageFailingSite(2000)
+    part = partition(site, SimpleIndeedQuery(what='nurse', where='Austin, TX'), cap=60)
+    failed = [each for each in part.walk() if each.status == 'failed']
+    assert failed and all(each.query.job_type == 'parttime' for each in failed)
+    assert part.coverage()['failed'] == len(failed)
+    for each in failed:
+        params = {'jt' : 'parttime', 'explvl' : each.query.experience}
+        assert each.job_keys == site.matches({name : val for name, val in params.items() if val})[:10]
+    assert all(each.status != 'failed' for each in part.walk() if each.query.job_type != 'parttime')
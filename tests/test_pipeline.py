@@ -0,0 +1,103 @@
+import csv
+import json
+
+import pytest
+
+from queries import pipeline
+from queries.cache import ResponseCache
+from queries.indeed import posting_url
+from queries.instrument import Metrics
+from queries.pipeline import (parse_records, pages_from_files, pages_from_cache, CsvSink, columnar_sink,
+                              write_records, RECORD_FIELDS)
+from queries.transport import Response
+
+from .sites import posting_page
+
+
+def pages(number):
+    """
+    Get the job key and content of posting pages, with every fifth one missing its header.
+    """
+    return [('%04x'%index, (posting_page('Engineer %i, "level" %i'%(index, index%3)) if index%5 else
+                            '<html><body>Expired</body></html>').encode('utf-8'))
+            for index in range(number)]
+
+
+class CountingPages(object):
+    def __init__(self, pages):
+        self.pages = pages
+        self.read = 0
+
+    def __iter__(self):
+        for page in self.pages:
+            self.read += 1
+            yield page
+
+
+@pytest.mark.parametrize('processes', [0, 2])
+def test_records_keep_the_order_of_the_pages(processes):
+    metrics = Metrics()
+    records = list(parse_records(pages(50), processes=processes, chunksize=4, metrics=metrics))
+    assert [record['job_key'] for record in records] == ['%04x'%index for index in range(50) if index%5]
+    assert records[0]['title'] == 'Engineer 1, "level" 1' and records[0]['apply_type'] == 'company'
+    assert metrics.histogram('parse wait' if processes else 'parse').count == (13 if processes else 50)
+
+
+def test_pages_are_read_as_the_records_are_used():
+    source = CountingPages(pages(200))
+    records = parse_records(source, processes=1, chunksize=4)
+    next(records)
+    #A couple of chunks per process are in flight ahead of the one being read.
+    assert source.read <= 3*4
+    assert len(list(records)) == 159
+    assert source.read == 200
+
+
+def test_pages_from_files_and_the_cache(tmp_path):
+    stored = pages(6)
+    for key, page in stored:
+        (tmp_path/(key + '.html')).write_bytes(page)
+    assert list(pages_from_files(sorted(str(path) for path in tmp_path.iterdir()))) == stored
+
+    cache = ResponseCache(':memory:')
+    for key, page in stored[:4]:
+        cache.put(posting_url(key), Response(posting_url(key), 200 if key != '0002' else 404, {}, page))
+    keys = [key for key, _ in stored]
+    assert list(pages_from_cache(cache, keys)) == [stored[0], stored[1], stored[3]]
+    cache.close()
+
+
+def test_csv_sink_starts_a_file_every_chunk(tmp_path):
+    records = list(parse_records(pages(30)))
+    sink = columnar_sink(str(tmp_path/'postings.csv'), rows=10)
+    assert isinstance(sink, CsvSink)
+    assert write_records(records, sink) == 24
+    assert [path.rsplit('-', 1)[1] for path in sink.paths] == ['00000.csv', '00001.csv', '00002.csv']
+
+    rows = []
+    for path in sink.paths:
+        with open(path, newline='', encoding='utf-8') as saved:
+            reader = csv.reader(saved)
+            assert tuple(next(reader)) == RECORD_FIELDS
+            rows.extend(reader)
+    assert [row[0] for row in rows] == [record['job_key'] for record in records]
+    assert [json.loads(row[-1]) for row in rows] == [record['sections'] for record in records]
+    assert rows[0][1] == 'Engineer 1, "level" 1'
+
+
+def test_parquet_sink_round_trips(tmp_path):
+    pyarrow = pytest.importorskip('pyarrow')
+    import pyarrow.parquet
+    records = list(parse_records(pages(30)))
+    sink = columnar_sink(str(tmp_path/'postings.parquet'), rows=7)
+    assert isinstance(sink, pipeline.ParquetSink)
+    write_records(records, sink)
+    table = pyarrow.parquet.read_table(str(tmp_path/'postings.parquet'))
+    assert table.column('job_key').to_pylist() == [record['job_key'] for record in records]
+
+
+def test_parquet_sink_needs_pyarrow(tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline, 'pyarrow', None)
+    with pytest.raises(ImportError):
+        pipeline.ParquetSink(str(tmp_path/'postings.parquet'))
+    assert isinstance(columnar_sink(str(tmp_path/'postings.parquet')), CsvSink)
@@ -0,0 +1,84 @@
+import asyncio
+
+from queries import AdvancedIndeedQuery
+from queries.crawler import Crawler
+from queries.planner import SubsumptionPlanner, plan
+
+from .sites import PopulationSite
+
+
+def crawl_plan(site, queries):
+    async def run():
+        crawler = Crawler(site, rate=1e6, burst=1e6)
+        try:
+            return await plan(queries).crawl(crawler)
+        finally:
+            await crawler.close()
+    return asyncio.run(run())
+
+
+def test_subsumed_age_returns_parents_matching_postings():
+    site = PopulationSite(300)
+    queries = [AdvancedIndeedQuery(all_words='engineer', where='Austin, TX', age=age) for age in ('any', 15, 7, 1)]
+    assert plan(queries).fetch == queries[:1]
+    results = crawl_plan(site, queries)
+    assert all('fromage=any' in url for url in site.fetches)
+    for query, records in zip(queries, results):
+        assert [record['job_key'] for record in records] == site.matches({'fromage' : query.age})
+        assert records
+
+
+def test_fields_records_dont_carry_are_fetched():
+    queries = [AdvancedIndeedQuery(all_words='engineer', where='Austin, TX'),
+               AdvancedIndeedQuery(all_words='engineer', where='Austin, TX', job_type='contract'),
+               AdvancedIndeedQuery(all_words='engineer', where='Austin, TX', radius=10),
+               AdvancedIndeedQuery(all_words='engineer', where='Austin, TX', limit=50)]
+    fetch_plan = plan(queries)
+    assert fetch_plan.fetch == queries
+    assert fetch_plan.sources == [0, 1, 2, 3]
+
+    site = PopulationSite(300)
+    results = crawl_plan(site, queries)
+    assert [record['job_key'] for record in results[1]] == site.matches({'jt' : 'contract'})
+    assert [record['job_key'] for record in results[2]] == site.matches({'radius' : 10})
+
+
+def test_queries_at_other_offsets_are_fetched_from_their_own_offset():
+    queries = [AdvancedIndeedQuery(all_words='engineer', where='Austin, TX', start=start) for start in (0, 10, 0)]
+    fetch_plan = plan(queries)
+    assert fetch_plan.fetch == queries[:2]
+    assert fetch_plan.sources == [0, 1, 0]
+
+    site = PopulationSite(300)
+    results = crawl_plan(site, queries)
+    matches = site.matches({})
+    assert [record['job_key'] for record in results[0]] == matches
+    assert [record['job_key'] for record in results[1]] == matches[10:]
+    assert results[2] == results[0]
+
+
+def test_declared_record_fields_are_narrowed():
+    planner = SubsumptionPlanner(record_fields={'fromage' : 'age', 'jt' : 'job_type'})
+    wide = AdvancedIndeedQuery(all_words='engineer', where='Austin, TX', age='any')
+    narrow = AdvancedIndeedQuery(all_words='engineer', where='Austin, TX', job_type='contract', age=3)
+    local_filter = planner.contains(wide, narrow)
+    assert sorted(local_filter.conditions) == [('age', '<=', 3), ('job_type', '==', 'contract')]
+    assert local_filter({'job_type' : 'contract', 'age' : 2.0})
+    assert not local_filter({'job_type' : 'contract'})
+    assert planner.contains(narrow, wide) is None
+
+
+def test_an_unset_age_is_the_widest_choice():
+    queries = [AdvancedIndeedQuery(all_words='engineer', where='Austin, TX', age=7),
+               AdvancedIndeedQuery(all_words='engineer', where='Austin, TX'),
+               AdvancedIndeedQuery(all_words='engineer', where='Austin, TX', age='any')]
+    fetch_plan = plan(queries)
+    assert fetch_plan.fetch == queries[1:2]
+    assert fetch_plan.sources == [0, 0, 0]
+    assert not fetch_plan.filters[2]
+
+    site = PopulationSite(300)
+    results = crawl_plan(site, queries)
+    assert not any('fromage' in url for url in site.fetches)
+    for query, records in zip(queries, results):
+        assert [record['job_key'] for record in records] == site.matches({'fromage' : query.age or 'any'})
@@ -0,0 +1,175 @@
+import gc
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
+
+import pytest
+
+from queries import Query, QueryArgument, SimpleIndeedQuery, AdvancedIndeedQuery
+from queries.query import QueryValueError
+
+#Words with the characters urls escape, and the '+' that merged arguments are joined with.
+#A word like '$100' is left out, since in 'q' it can't be told from a minimum salary.
+WORDS = ('python', 'C++', 'data', 'engineer', 'C#', '.NET', 'senior', 'remote', 'a+b', 'R&D', '50%')
+
+
+def build(index):
+    query = SimpleIndeedQuery(what='engineer %i'%index, where='City %i, ST'%index, radius=(5, 10, 25)[index%3],
+                              start=index*10)
+    advanced = AdvancedIndeedQuery(all_words='data %i'%index, where='Town %i'%index, limit=(10, 20, 50)[index%3])
+    return index, query, advanced
+
+
+def test_queries_built_across_threads_keep_their_own_values():
+    barrier = threading.Barrier(8)
+
+    def build_after_barrier(index):
+        if index < 8:
+            barrier.wait()
+        return build(index)
+
+    with ThreadPoolExecutor(8) as pool:
+        built = list(pool.map(build_after_barrier, range(2000)))
+
+    for index, query, advanced in built:
+        assert query.what == 'engineer %i'%index
+        assert query.where == 'City %i, ST'%index
+        assert query.radius == (5, 10, 25)[index%3]
+        assert query.start == index*10
+        assert advanced.all_words == 'data %i'%index
+        assert advanced.where == 'Town %i'%index
+        assert advanced.limit == (10, 20, 50)[index%3]
+        assert query.url == build(index)[1].url
+
+
+def test_queries_modified_across_threads_dont_share_values():
+    queries = [SimpleIndeedQuery(what='engineer', where='Austin, TX') for _ in range(64)]
+
+    def modify(index):
+        for step in range(200):
+            queries[index].start = step*10
+            queries[index].radius = (5, 10, 25)[index%3]
+            assert queries[index].start == step*10
+        return queries[index].url
+
+    with ThreadPoolExecutor(8) as pool:
+        urls = list(pool.map(modify, range(len(queries))))
+
+    for index, (query, url) in enumerate(zip(queries, urls)):
+        assert query.start == 1990 and query.radius == (5, 10, 25)[index%3]
+        assert url == SimpleIndeedQuery(what='engineer', where='Austin, TX', start=1990,
+                                        radius=(5, 10, 25)[index%3]).url
+
+
+def random_values(query_cls, rng):
+    """
+    Get random values for a random subset of the mutable arguments of a query class.
+    """
+    values = {}
+    for name, arg in query_cls._args.items():
+        if not arg.mutable or rng.random() < 0.4:
+            continue
+        if arg.choices:
+            values[name] = rng.choice(arg.choices)
+        elif arg.type is int:
+            values[name] = rng.randrange(0, 200000, 10)
+        else:
+            values[name] = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 3)))
+    values['where'] = 'City %i, ST'%rng.randrange(1000)
+    return values
+
+
+@pytest.mark.parametrize('query_cls', [SimpleIndeedQuery, AdvancedIndeedQuery])
+@pytest.mark.parametrize('seed', range(5))
+def test_from_url_round_trips(query_cls, seed):
+    rng = random.Random(seed)
+    queries = [query_cls(**random_values(query_cls, rng)) for _ in range(400)]
+    for query in queries:
+        parsed = query_cls.from_url(query.url)
+        assert parsed._values == query._values, query.url
+        assert parsed.url == query.url
+    assert [parsed.url for parsed in query_cls.from_urls(query.url for query in queries)] == \
+        [query.url for query in queries]
+
+
+def test_from_url_splits_merged_arguments():
+    query = SimpleIndeedQuery(what='senior C++', min_salary=120000, where='Austin, TX')
+    parsed = SimpleIndeedQuery.from_url(query.url)
+    assert (parsed.what, parsed.min_salary, parsed.where) == ('senior C++', 120000, 'Austin, TX')
+
+
+def test_schema_classes_are_shared_while_in_use_and_then_dropped():
+    arg = QueryArgument('q', str)
+    query = Query('https://example.com/search', what=arg)
+    assert type(Query('https://example.com/search', what=arg)) is type(query)
+
+    before = len(Query._schema_classes)
+    for index in range(200):
+        Query('https://example.com/search', **{'arg_%i'%index : QueryArgument('a%i'%index, str)})
+    gc.collect()
+    assert len(Query._schema_classes) <= before
+    assert type(Query('https://example.com/search', what=arg)) is type(query)
+
+
+def test_deleting_a_property_removes_the_argument():
+    query = SimpleIndeedQuery(what='nurse', where='Austin, TX', radius=10)
+    other = query.copy()
+    del query.radius
+    assert 'radius' not in query.url and 'radius' not in query._args
+    with pytest.raises(ValueError):
+        query.radius
+    with pytest.raises(ValueError):
+        query.radius = 5
+    assert (query.what, query.where) == ('nurse', 'Austin, TX')
+    assert other.radius == 10 and 'radius=10' in other.url
+    assert 'radius' in SimpleIndeedQuery._args
+
+    second = SimpleIndeedQuery(what='nurse', where='Austin, TX')
+    del second.radius
+    assert type(second) is type(query)
+    assert second.url == query.url
+
+    query.register_args(radius=SimpleIndeedQuery._args['radius'])
+    assert query.radius is None
+    query.radius = 5
+    assert 'radius=5' in query.url
+
+
+def test_keys_follow_the_first_argument_with_a_value():
+    query = SimpleIndeedQuery(min_salary=483, where='Austin, TX')
+    assert query.url == 'https://indeed.com/jobs?l=Austin%2C+TX&q=%24483&start=0'
+    query.what = 'nurse'
+    assert query.url == 'https://indeed.com/jobs?q=nurse%2B%24483&l=Austin%2C+TX&start=0'
+    assert SimpleIndeedQuery.from_url(query.url).url == query.url
+
+
+@pytest.mark.parametrize('fixed, value_lists', [
+    ({'what' : 'nurse'}, {'where' : ['Austin, TX', 'Boston, MA'], 'radius' : [None, 5, 25], 'start' : [0, 10]}),
+    ({'min_salary' : 50000}, {'what' : [None, 'C++ developer'], 'job_type' : [None, 'contract']}),
+    ({}, {'what' : ['nurse', None], 'min_salary' : [None, 80000], 'experience' : ['entry_level', None]}),
+])
+def test_product_urls_match_each_querys_url(fixed, value_lists):
+    query = SimpleIndeedQuery(where='Austin, TX', **fixed)
+    urls = list(query.product(**value_lists))
+    expected = []
+    for vals in product(*value_lists.values()):
+        values = dict(fixed, where='Austin, TX')
+        values.update(zip(value_lists, vals))
+        expected.append(SimpleIndeedQuery(**values).url)
+    assert sorted(urls) == sorted(expected)
+    assert len(urls) == len(set(urls))
+    assert query.url == SimpleIndeedQuery(where='Austin, TX', **fixed).url
+
+
+def test_product_checks_values_up_front():
+    query = SimpleIndeedQuery(where='Austin, TX')
+    with pytest.raises(ValueError):
+        next(query.product(radius=[5, 7]))
+    with pytest.raises(ValueError):
+        next(query.product(distance=[5]))
+    with pytest.raises(TypeError):
+        next(query.product(start=['ten']))
+    with pytest.raises(QueryValueError):
+        next(query.product(where=['Austin, TX', None]))
+    assert next(query.product(radius=iter([5, 10]))) == SimpleIndeedQuery(where='Austin, TX', radius=5).url
@@ -0,0 +1,89 @@
+import pytest
+
+from queries import ratecontrol, transport
+from queries.ratecontrol import AdaptiveRate, RateController, retry_after
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratecontrol, 'monotonic', clock)
+    monkeypatch.setattr(transport, 'monotonic', clock)
+    return clock
+
+
+def drive(limiter, clock, respond, seconds):
+    """
+    Send requests at the limiter's rate for a number of simulated seconds, recording the
+    response `respond` gives for each rate, and get the rate after each request.
+    """
+    rates = []
+    end = clock.now + seconds
+    while clock.now < end:
+        clock.now += 1/limiter.rate
+        status, latency = respond(limiter.rate)
+        limiter.record(status, latency)
+        rates.append(limiter.rate)
+    return rates
+
+
+def test_rate_backs_off_on_429s_and_settles_under_the_limit(clock):
+    limiter = AdaptiveRate(rate=1.0, max_rate=1000.0, latency_factor=None)
+    rates = drive(limiter, clock, lambda rate: (429 if rate > 20 else 200, 0.01), 120)
+    assert not limiter.slow_start
+    assert max(rates) < 40
+    settled = rates[len(rates)//2:]
+    assert min(settled) >= 20*limiter.decrease*0.9
+    assert sum(settled)/len(settled) <= 20
+
+
+def test_rate_backs_off_when_latency_climbs_and_recovers(clock):
+    limiter = AdaptiveRate(rate=1.0, max_rate=1000.0)
+    #The host slows down once it's sent more than 30 requests a second.
+    rates = drive(limiter, clock, lambda rate: (200, 0.02 if rate <= 30 else 0.2), 60)
+    assert max(rates) < 60 and rates[-1] < 45
+
+    #An outage cuts the rate, and it climbs back once the host recovers.
+    before = limiter.rate
+    drive(limiter, clock, lambda rate: (None, 0.5), 5)
+    assert limiter.rate < before/2
+    clock.now += 1
+    rates = drive(limiter, clock, lambda rate: (200, 0.02), 60)
+    assert rates[-1] > before
+
+
+def test_a_burst_of_429s_only_cuts_once(clock):
+    limiter = AdaptiveRate(rate=16.0)
+    for _ in range(5):
+        assert limiter.record(429, 0.5)
+    assert limiter.rate == 8.0
+    clock.now += 1
+    assert limiter.record(503, 0.1)
+    assert limiter.rate == 4.0
+
+
+def test_retry_after_pauses_the_host(clock):
+    limiter = AdaptiveRate(rate=10.0)
+    limiter.record(429, 0.1, {'retry-after' : '3'})
+    assert limiter._paused_until == clock.now + 3
+    limiter.record(200, 0.1, {'retry-after' : '10'})
+    assert limiter._paused_until == clock.now + 3
+    assert retry_after({'retry-after' : 'Wed, 21 Oct 2015 07:28:05 GMT'}, now=1445412480) == 5
+    assert retry_after({'retry-after' : 'soon'}) is None
+
+
+def test_controller_keeps_one_rate_per_host():
+    controller = RateController(rate=5.0, retries=2, backoff=0.5, max_backoff=4.0, min_rate=1.0)
+    assert controller.for_host('indeed.com') is controller.for_host('indeed.com')
+    assert controller.for_host('indeed.com').min_rate == 1.0
+    controller.for_host('example.com').record(429, 0.1)
+    assert controller.rates() == {'indeed.com' : 5.0, 'example.com' : 2.5}
+    assert all(0 <= controller.backoff_delay(attempt) <= 4.0 for attempt in range(10))
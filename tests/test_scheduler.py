@@ -0,0 +1,155 @@
+import asyncio
+import json
+from collections import Counter
+from urllib.parse import urlsplit, parse_qsl
+
+import pytest
+
+from queries import Query, QueryArgument, SimpleIndeedQuery
+from queries.crawler import Crawler
+from queries.scheduler import Scheduler, Source, ParsedPage, PageNumberPagination, CursorPagination
+from queries.transport import Response, Transport
+
+from .sites import PopulationSite
+
+PER_PAGE = 10
+
+
+class BoardQuery(Query):
+    _kwargs = {
+        'keywords' : QueryArgument('q', str, required=True),
+        'page' : QueryArgument('page', int, value=1),
+    }
+
+    def __init__(self, base_url, **kwargs):
+        super().__init__(base_url)
+        for key, val in kwargs.items():
+            self.set_value(key, val)
+
+
+class FeedQuery(Query):
+    _kwargs = {
+        'search' : QueryArgument('search', str, required=True),
+        'cursor' : QueryArgument('cursor', str),
+    }
+
+    def __init__(self, base_url, **kwargs):
+        super().__init__(base_url)
+        for key, val in kwargs.items():
+            self.set_value(key, val)
+
+
+def parse_board(body):
+    data = json.loads(body)
+    return ParsedPage(data['jobs'], data['page'] < data['pages'])
+
+
+def parse_feed(body):
+    data = json.loads(body)
+    return ParsedPage(data['items'], next_cursor=data.get('next'))
+
+
+SOURCES = {
+    BoardQuery : Source(parse_board, PageNumberPagination('page')),
+    FeedQuery : Source(parse_feed, CursorPagination('cursor')),
+}
+
+
+def board_keys(params):
+    return ['%s-%02i'%(params['q'], index) for index in range(45)]
+
+
+def feed_keys(params):
+    return ['%s-%02i'%(params['search'], index) for index in range(33)]
+
+
+class Sites(Transport):
+    """
+    Three job boards behind one transport, with a host that always fails, counting the
+    requests in flight to each host.
+    """
+    def __init__(self):
+        self.indeed = PopulationSite(120)
+        self.in_flight = Counter()
+        self.most_in_flight = Counter()
+
+    async def fetch(self, url, headers=None):
+        host = urlsplit(url).netloc
+        params = dict(parse_qsl(urlsplit(url).query))
+        self.in_flight[host] += 1
+        self.most_in_flight[host] = max(self.most_in_flight[host], self.in_flight[host])
+        try:
+            await asyncio.sleep(0.001)
+            if host == 'down.example.com':
+                raise ConnectionResetError("Connection reset by peer")
+            if host == 'indeed.com':
+                return await self.indeed.fetch(url)
+            if host == 'board.example.com':
+                keys, page = board_keys(params), int(params['page'])
+                pages = -(-len(keys)//PER_PAGE)
+                body = {'jobs' : keys[(page - 1)*PER_PAGE:page*PER_PAGE], 'page' : page, 'pages' : pages}
+            else:
+                keys, start = feed_keys(params), int(params.get('cursor', 0))
+                body = {'items' : keys[start:start + PER_PAGE]}
+                if start + PER_PAGE < len(keys):
+                    body['next'] = str(start + PER_PAGE)
+            return Response(url, 200, {}, json.dumps(body).encode('utf-8'))
+        finally:
+            self.in_flight[host] -= 1
+
+
+def run_crawl(queries, max_per_host=2):
+    sites = Sites()
+
+    async def run():
+        scheduler = Scheduler(Crawler(sites, rate=1e6, burst=1e6, max_connections=5), max_per_host, SOURCES)
+        pages = []
+        try:
+            async for page in scheduler.pages(queries):
+                pages.append(page)
+        finally:
+            await scheduler.close()
+        return pages
+    return sites, asyncio.run(run())
+
+
+def test_every_source_is_walked_and_a_failing_host_doesnt_stop_the_rest():
+    queries = [SimpleIndeedQuery(what='data', where='Austin, TX'),
+               BoardQuery('https://board.example.com/search', keywords='python'),
+               BoardQuery('https://board.example.com/search', keywords='rust'),
+               FeedQuery('https://feed.example.com/items', search='sql'),
+               BoardQuery('https://down.example.com/search', keywords='python')]
+    sites, pages = run_crawl(queries)
+
+    failed = [page for page in pages if page.status != 200]
+    assert len(failed) == 1
+    assert failed[0].status == 0 and isinstance(failed[0].error, ConnectionResetError)
+    assert failed[0].query.base_url == 'https://down.example.com/search'
+
+    found = {}
+    for page in pages:
+        found.setdefault(urlsplit(page.query.base_url).netloc, {}).setdefault(
+            page.query.arg_value(list(page.query._args)[0]), []).extend(page.job_keys)
+    assert found['indeed.com'] == {'data' : sites.indeed.matches({})}
+    assert found['board.example.com'] == {word : board_keys({'q' : word}) for word in ('python', 'rust')}
+    assert found['feed.example.com'] == {'sql' : feed_keys({'search' : 'sql'})}
+    assert max(sites.most_in_flight.values()) <= 2
+
+
+def test_crawl_keeps_each_querys_pages_in_order():
+    queries = [BoardQuery('https://board.example.com/search', keywords=word) for word in ('a', 'b', 'c')]
+
+    async def run():
+        scheduler = Scheduler(Crawler(Sites(), rate=1e6, burst=1e6), 2, SOURCES)
+        try:
+            return await scheduler.crawl(queries)
+        finally:
+            await scheduler.close()
+    assert asyncio.run(run()) == [board_keys({'q' : word}) for word in ('a', 'b', 'c')]
+
+
+def test_pagination_without_its_argument_is_rejected():
+    with pytest.raises(ValueError):
+        Scheduler(Crawler(Sites()), sources={FeedQuery : Source(parse_feed, PageNumberPagination('page'))})
+    with pytest.raises(ValueError):
+        Scheduler(Crawler(Sites()), sources={BoardQuery : Source(parse_board, CursorPagination('cursor'))})
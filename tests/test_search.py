@@ -0,0 +1,69 @@
+import json
+
+from queries import AdvancedIndeedQuery, SimpleIndeedQuery
+from queries.search import PostingIndex
+
+RECORDS = [
+    {'job_key' : 'a', 'title' : 'Senior Python Engineer', 'company_name' : 'Acme Data',
+     'sections' : [{'heading' : 'About', 'items' : ['Build data pipelines in Python and SQL', 'Remote friendly']}]},
+    {'job_key' : 'b', 'title' : 'C++ Developer', 'company_name' : 'Widget Works',
+     'sections' : [{'heading' : 'Requirements', 'items' : ['Modern C++ and Python', 'Data structures']}]},
+    {'job_key' : 'c', 'title' : 'Data Analyst', 'company_name' : 'Acme Data',
+     #The sections as a CsvSink writes them.
+     'sections' : json.dumps([{'heading' : 'Duties', 'items' : ['Reporting and dashboards', 'SQL pipelines']}])},
+    {'job_key' : 'd', 'title' : 'Nurse', 'company_name' : 'General Hospital',
+     'sections' : [{'heading' : 'About', 'items' : ['Data entry', 'Pipelines of patients']}]},
+]
+
+
+def build():
+    index = PostingIndex()
+    index.extend(RECORDS)
+    return index
+
+
+def test_keyword_arguments_are_answered_locally():
+    index = build()
+    assert index.search(SimpleIndeedQuery(what='python', where='Austin, TX')) == ['a', 'b']
+    assert index.search(AdvancedIndeedQuery(all_words='data sql', where='Austin, TX')) == ['a', 'c']
+    assert index.search(AdvancedIndeedQuery(any_words='c++ nurse', where='Austin, TX')) == ['b', 'd']
+    assert index.search(AdvancedIndeedQuery(all_words='data', none_words='python', where='Austin, TX')) == ['c', 'd']
+    assert index.search(AdvancedIndeedQuery(title_words='data', where='Austin, TX')) == ['c']
+    assert index.search(AdvancedIndeedQuery(from_company='acme data', where='Austin, TX')) == ['a', 'c']
+    assert index.search(AdvancedIndeedQuery(where='Austin, TX')) == ['a', 'b', 'c', 'd']
+
+
+def test_phrases_dont_match_across_items():
+    index = build()
+    assert index.search(AdvancedIndeedQuery(exact_phrase='data pipelines', where='Austin, TX')) == ['a']
+    #'... SQL' ends one item of 'a' and 'Remote friendly' starts the next.
+    assert index.search(AdvancedIndeedQuery(exact_phrase='sql remote', where='Austin, TX')) == []
+
+
+def test_replaced_postings_are_dropped():
+    index = build()
+    index.add(dict(RECORDS[0], job_key='b'))
+    assert len(index) == 4 and index.job_keys[1] is None
+    assert index.search(SimpleIndeedQuery(what='c++', where='Austin, TX')) == []
+    assert index.search(SimpleIndeedQuery(what='python', where='Austin, TX')) == ['a', 'b']
+    assert index.compact() == 1
+    assert index.search(SimpleIndeedQuery(what='python', where='Austin, TX')) == ['a', 'b']
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = build()
+    index.add(dict(RECORDS[3], title='Data Nurse'))
+    path = str(tmp_path/'index.json')
+    index.save(path)
+    with open(path, encoding='utf-8') as saved:
+        assert saved.read(1) == '{'
+    loaded = PostingIndex.load(path)
+    assert loaded.job_keys == index.job_keys and len(loaded) == len(index)
+    assert loaded._postings == index._postings
+    queries = [SimpleIndeedQuery(what='data', where='Austin, TX'),
+               AdvancedIndeedQuery(exact_phrase='data pipelines', where='Austin, TX'),
+               AdvancedIndeedQuery(title_words='nurse', where='Austin, TX')]
+    assert [loaded.search(query) for query in queries] == [index.search(query) for query in queries]
+    loaded.add({'job_key' : 'e', 'title' : 'Data Engineer'})
+    assert loaded.search(AdvancedIndeedQuery(title_words='data', where='Austin, TX')) == ['c', 'd', 'e']
+    assert loaded.compact() == 1
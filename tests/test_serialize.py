@@ -0,0 +1,69 @@
+import json
+import sys
+from array import array
+
+import pytest
+
+from queries import SimpleIndeedQuery, AdvancedIndeedQuery, Query, QueryArgument
+from queries import serialize
+
+
+def sample():
+    return [SimpleIndeedQuery(what='engineer %i'%i, where='City %i'%(i%7), radius=(None, 5, 25)[i%3],
+                              min_salary=i*1000 if i%2 else None, start=i*10) for i in range(50)]
+
+
+def as_other_byte_order(path):
+    """
+    Rewrite a saved batch as a machine of the other byte order would have written it.
+    """
+    with open(path, 'rb') as saved:
+        raw = saved.read()
+    _, version, header_size = serialize._header.unpack_from(raw)
+    start = serialize._header.size
+    header = json.loads(raw[start:start + header_size])
+    body = bytearray(raw[start + header_size:])
+    for column in header['columns']:
+        if column['kind'] != 'blob':
+            data = array(column['typecode'], bytes(body[column['offset']:column['offset'] + column['nbytes']]))
+            data.byteswap()
+            body[column['offset']:column['offset'] + column['nbytes']] = data.tobytes()
+    header['byteorder'] = 'big' if sys.byteorder == 'little' else 'little'
+    header_bytes = json.dumps(header).encode('utf-8')
+    header_bytes += b' '*(-(start + len(header_bytes))%8)
+    with open(path, 'wb') as out:
+        out.write(serialize._header.pack(serialize.MAGIC, version, len(header_bytes)))
+        out.write(header_bytes)
+        out.write(body)
+
+
+@pytest.mark.parametrize('foreign', [False, True])
+def test_round_trip(tmp_path, foreign):
+    queries = sample()
+    path = str(tmp_path/'batch.jsqb')
+    serialize.save(queries, path)
+    if foreign:
+        as_other_byte_order(path)
+    with serialize.load(path) as batch:
+        assert batch.query_cls is SimpleIndeedQuery
+        assert [query.url for query in batch] == [query.url for query in queries]
+        assert batch.column('min_salary') == [query.min_salary for query in queries]
+
+
+def test_save_rejects_empty_and_mixed_batches(tmp_path):
+    with pytest.raises(ValueError):
+        serialize.save([], str(tmp_path/'empty.jsqb'))
+    with pytest.raises(TypeError):
+        serialize.save([SimpleIndeedQuery(where='Austin, TX'), AdvancedIndeedQuery(where='Austin, TX')],
+                       str(tmp_path/'mixed.jsqb'))
+
+
+def test_runtime_schema_classes_are_rejected(tmp_path):
+    query = Query('https://example.com/jobs', q=QueryArgument('q', str))
+    with pytest.raises(TypeError, match='module level'):
+        serialize.class_path(type(query))
+    path = tmp_path/'runtime.jsqb'
+    with pytest.raises(TypeError):
+        serialize.save([query], str(path))
+    assert not path.exists()
+    assert serialize.class_path(SimpleIndeedQuery) == 'queries.indeed:SimpleIndeedQuery'
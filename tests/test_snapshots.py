@@ -0,0 +1,91 @@
+import threading
+
+import pytest
+
+from queries.snapshots import SnapshotStore, ADDED, MODIFIED, REMOVED
+
+DAY = 24*60*60
+START = 1.6e9
+
+
+def posting(key, title='Engineer', location='Austin, TX'):
+    return {'job_key' : key, 'title' : title, 'company_name' : 'Acme', 'location' : location,
+            'sections' : [{'heading' : 'About', 'items' : ['Build things']}]}
+
+
+def summary(changes):
+    return [(change.kind, change.job_key) for change in changes]
+
+
+def test_added_modified_and_removed_postings():
+    store = SnapshotStore(':memory:', batch_size=2)
+    first = [posting(key) for key in 'abcd']
+    assert summary(store.diff(first, at=START)) == [(ADDED, key) for key in 'abcd']
+    assert store.diff(reversed(first), at=START + DAY) == []
+
+    second = [posting('a'), posting('b', title='Senior Engineer'), posting('d'), posting('e')]
+    changes = store.diff(second, at=START + 2*DAY)
+    assert summary(changes) == [(MODIFIED, 'b'), (ADDED, 'e'), (REMOVED, 'c')]
+    assert changes[0].record['title'] == 'Senior Engineer' and changes[0].previous['title'] == 'Engineer'
+    assert changes[2].record is None and changes[2].previous['title'] == 'Engineer'
+    assert len(store) == 4
+    assert [(crawl['seen'], crawl['added'], crawl['modified'], crawl['removed']) for crawl in store.crawls()] == \
+        [(4, 4, 0, 0), (4, 0, 0, 0), (4, 1, 1, 1)]
+    assert summary(store.changes(since=START)) == summary(changes)
+    assert summary(store.posting_history('b')) == [(ADDED, 'b'), (MODIFIED, 'b')]
+
+
+def test_partial_crawls_dont_remove_postings():
+    store = SnapshotStore(':memory:')
+    store.diff([posting(key) for key in 'abc'], at=START)
+    changes = store.diff([posting('b', location='Remote'), posting('d')], at=START + DAY, complete=False)
+    assert summary(changes) == [(MODIFIED, 'b'), (ADDED, 'd')]
+    assert len(store) == 4
+    assert store.crawls()[-1]['complete'] is False
+
+
+def test_postings_as_of_a_crawl_or_time():
+    store = SnapshotStore(':memory:')
+    store.diff([posting('a'), posting('b')], at=START)
+    store.diff([posting('a', title='Lead'), posting('c')], at=START + DAY)
+    store.diff([posting('c')], at=START + 2*DAY)
+
+    def titles(postings):
+        return [(record['job_key'], record['title']) for record in postings]
+    assert titles(store.as_of(crawl=1)) == [('a', 'Engineer'), ('b', 'Engineer')]
+    assert titles(store.as_of(at=START + DAY + 1)) == [('a', 'Lead'), ('c', 'Engineer')]
+    assert titles(store.as_of()) == [('c', 'Engineer')]
+    assert titles(store.as_of(at=START - 1)) == []
+
+
+def test_a_failed_crawl_is_rolled_back():
+    store = SnapshotStore(':memory:')
+    store.diff([posting('a'), posting('b')], at=START)
+
+    def records():
+        yield posting('a', title='Lead')
+        yield posting('c')
+        raise ConnectionResetError("Connection reset by peer")
+    with pytest.raises(ConnectionResetError):
+        store.diff(records(), at=START + DAY)
+    assert len(store) == 2 and len(store.crawls()) == 1
+    assert [record['title'] for record in store.as_of()] == ['Engineer', 'Engineer']
+    assert summary(store.diff([posting('a'), posting('c')], at=START + DAY)) == [(ADDED, 'c'), (REMOVED, 'b')]
+
+
+def test_reads_from_other_threads_wait_for_the_diff():
+    store = SnapshotStore(':memory:')
+    store.diff([posting('a')], at=START)
+    read = []
+    reader = threading.Thread(target=lambda: read.append((len(store), summary(store.changes()))))
+
+    def records():
+        yield posting('b')
+        reader.start()
+        reader.join(0.1)
+        #Reading now would see the crawl half recorded.
+        assert read == []
+        yield posting('c')
+    store.diff(records(), at=START + DAY, complete=False)
+    reader.join()
+    assert read == [(3, [(ADDED, 'a'), (ADDED, 'b'), (ADDED, 'c')])]
@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+from queries import Query, QueryArgument, SimpleIndeedQuery, AdvancedIndeedQuery
+from queries.query import QueryValueError, QueryRequirementError
+from queries.validation import BatchValidator
+
+
+def random_rows(query_cls, number, seed=0):
+    """
+    Get rows of values for a query class, about a third of them with a bad value.
+    """
+    rand = random.Random(seed)
+    rows = []
+    for index in range(number):
+        row = {'where' : rand.choice(['Austin, TX', 'Remote', None]), 'start' : rand.choice([0, 10, None])}
+        row['radius'] = rand.choice([None, 5, 25, 7, '25'])
+        row['job_type'] = rand.choice([None, 'contract', 'gig'])
+        row['min_salary'] = rand.choice([None, 50000, 5.5e4])
+        if query_cls is AdvancedIndeedQuery:
+            row['age'] = rand.choice(['any', 3, 2])
+        rows.append(row)
+    return rows
+
+
+def query_errors(query_cls, row):
+    """
+    Get the error messages of a row from a query built for it, or None if it can't be built.
+    """
+    try:
+        query = query_cls(**row)
+    except (TypeError, ValueError):
+        return None
+    try:
+        query.check_parameters()
+    except QueryValueError as error:
+        return error.payload
+    return []
+
+
+@pytest.mark.parametrize('query_cls', [SimpleIndeedQuery, AdvancedIndeedQuery])
+def test_batch_matches_the_errors_of_each_query(query_cls):
+    rows = random_rows(query_cls, 300)
+    report = BatchValidator(query_cls).validate_records(rows)
+    assert report.num_rows == 300 and not report.valid
+    for row, values in enumerate(rows):
+        errors = query_errors(query_cls, values)
+        if errors is None:
+            assert row in report.errors
+        elif errors:
+            error, = report.errors[row]
+            assert isinstance(error, QueryValueError) and error.payload == errors
+        else:
+            assert row not in report.errors
+    assert report.valid_rows == [row not in report.errors for row in range(300)]
+
+
+def test_columns_are_checked_together():
+    validator = BatchValidator(SimpleIndeedQuery)
+    report = validator.validate({'where' : ['Austin, TX', 'Remote'], 'radius' : [5, 10]})
+    assert report.valid and report.valid_rows == [True, True]
+    #Without a 'where' column every row gets the default, which is missing.
+    assert sorted(validator.validate({'radius' : [5, 10]}).errors) == [0, 1]
+    assert validator.validate({}).num_rows == 0
+    with pytest.raises(ValueError):
+        validator.validate({'where' : ['Austin, TX'], 'radius' : [5, 10]})
+    with pytest.raises(ValueError):
+        validator.validate({'distance' : [5]})
+
+
+def test_immutable_values_and_missing_requirements():
+    report = BatchValidator(AdvancedIndeedQuery).validate({'where' : ['Austin, TX'] * 2, 'psf' : ['advsrch', 'x']})
+    assert list(report.errors) == [1]
+    assert 'immutable' in report.errors[1][0].payload[0]
+
+    query_cls = type(Query('https://example.com/search', company=QueryArgument('rbc', str, requires='jcid')))
+    report = BatchValidator(query_cls).validate({'company' : ['Acme', None]})
+    assert [type(error) for error in report.errors[0]] == [QueryRequirementError]
+    assert sorted(report.errors) == [0, 1]